@@ -0,0 +1,139 @@
+"""
+Opt-in CPU acceleration for the PyTorch models.
+
+Without CUDA, Whisper and the pyannote pipeline run in plain fp32. This
+module provides two faster CPU modes, selected with ``CPU_ACCEL`` or
+``selected["cpu_accel"]`` in ``ai.config.json``:
+
+``int8``
+    Dynamic int8 quantisation (``torch.ao.quantization.quantize_dynamic``)
+    of linear and LSTM layers. Weights are quantised once at load time,
+    activations per call.
+``bf16``
+    bfloat16 autocast around inference. Only enabled on CPUs that
+    advertise native bf16 support (AVX512-BF16 or AMX); elsewhere it
+    would be slower than fp32, so the mode falls back to ``off``.
+
+Both modes run inference under ``torch.inference_mode``; the torch thread
+pool is sized by :mod:`apps.ai.tuning`. The
+default is ``off``; the modes trade a little accuracy for speed, which
+``python -m apps.ai.bench.cpu_accel`` measures.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+from typing import Any, Iterator, Optional
+
+ACCEL_MODES: tuple[str, ...] = ("off", "int8", "bf16")
+
+_BF16_CPU_FLAGS = ("avx512_bf16", "amx_bf16")
+
+
+def cpu_supports_bf16() -> bool:
+    """Return ``True`` when the CPU has native bfloat16 instructions."""
+    from .bootstrap.probe import cpu_simd_flags
+
+    return any(flag in cpu_simd_flags() for flag in _BF16_CPU_FLAGS)
+
+
+def accel_mode(config: Optional[Any] = None) -> str:
+    """Resolve the CPU acceleration mode for this process.
+
+    Returns ``"off"`` when CUDA is available, since the modes only apply
+    to CPU inference.
+    """
+    selected = getattr(config, "selected_models", {}) if config is not None else {}
+    mode = (os.getenv("CPU_ACCEL") or selected.get("cpu_accel") or "off").strip().lower()
+    if mode not in ACCEL_MODES:
+        print(f"[Accel] Invalid CPU acceleration mode '{mode}'; using 'off'.")
+        return "off"
+    if mode == "off":
+        return mode
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            return "off"
+    except ImportError:
+        return "off"
+    if mode == "bf16" and not cpu_supports_bf16():
+        print("[Accel] CPU has no native bf16 support; using 'off'.")
+        return "off"
+    return mode
+
+
+def configure_threads(threads: Optional[int] = None) -> int:
+    """Set the torch intra-op thread count (default: :func:`apps.ai.tuning.torch_threads`)."""
+    import torch
+
+    from .tuning import torch_threads
+
+    threads = threads or torch_threads()
+    torch.set_num_threads(threads)
+    return threads
+
+
+def quantize_dynamic_inplace(module: Any) -> Any:
+    """Quantise the linear and LSTM layers of ``module`` to int8 in place.
+
+    Subclasses of ``nn.Linear`` (Whisper defines one that only casts the
+    weight dtype) are first turned back into plain ``nn.Linear`` so the
+    quantiser recognises them.
+    """
+    import torch
+    from torch import nn
+
+    for child in module.modules():
+        if isinstance(child, nn.Linear) and type(child) is not nn.Linear:
+            child.__class__ = nn.Linear
+    return torch.ao.quantization.quantize_dynamic(
+        module, {nn.Linear, nn.LSTM}, dtype=torch.qint8, inplace=True
+    )
+
+
+def prepare_whisper(model: Any, mode: str) -> Any:
+    """Apply ``mode`` to a CPU openai-whisper model."""
+    if mode == "int8":
+        quantize_dynamic_inplace(model)
+        print("[Accel] Quantised Whisper linear layers to int8.")
+    return model
+
+
+def prepare_pyannote(pipeline: Any, mode: str) -> Any:
+    """Apply ``mode`` to the models inside a CPU pyannote pipeline.
+
+    The pipeline keeps its segmentation and embedding networks either as
+    attributes or wrapped in inference helpers (``.model`` /
+    ``.model_``); both are quantised in place.
+    """
+    if mode != "int8":
+        return pipeline
+    from torch import nn
+
+    quantised = 0
+    seen: set[int] = set()
+    for value in vars(pipeline).values():
+        for candidate in (value, getattr(value, "model", None), getattr(value, "model_", None)):
+            if isinstance(candidate, nn.Module) and id(candidate) not in seen:
+                seen.add(id(candidate))
+                quantize_dynamic_inplace(candidate)
+                quantised += 1
+    print(f"[Accel] Quantised {quantised} pyannote model(s) to int8.")
+    return pipeline
+
+
+@contextlib.contextmanager
+def inference_context(mode: str) -> Iterator[None]:
+    """Run the enclosed inference under ``inference_mode`` (and bf16 autocast)."""
+    if mode == "off":
+        yield
+        return
+    import torch
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(torch.inference_mode())
+        if mode == "bf16":
+            stack.enter_context(torch.autocast("cpu", dtype=torch.bfloat16))
+        yield
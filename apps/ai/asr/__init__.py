@@ -0,0 +1,30 @@
+"""
+Speech recognition backends.
+
+:class:`STTStage` talks to an :class:`AsrBackend` instead of a specific
+library, so the engine can be switched in ``ai.config.json``
+(``selected["asr_backend"]``) without touching the stage:
+
+``openai-whisper``
+    The reference PyTorch implementation (default).
+``faster-whisper``
+    CTranslate2 implementation; int8 on CPU and float16 on CUDA unless
+    ``selected["asr_compute_type"]`` says otherwise.
+
+Every backend returns the same result schema, so the stage's timestamp
+mapping does not depend on the engine.
+"""
+
+from __future__ import annotations
+
+from .base import AsrBackend, AsrResult, BACKEND_NAMES, DEFAULT_BACKEND, SAMPLE_RATE, decode_audio, load_backend
+
+__all__ = [
+    "AsrBackend",
+    "AsrResult",
+    "BACKEND_NAMES",
+    "DEFAULT_BACKEND",
+    "SAMPLE_RATE",
+    "decode_audio",
+    "load_backend",
+]
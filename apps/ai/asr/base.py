@@ -0,0 +1,125 @@
+"""
+Backend interface and factory.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+# ``{"language": str | None, "segments": [{"start", "end", "text"}, ...]}``
+# with segment times in seconds relative to the audio passed in.
+AsrResult = Dict[str, Any]
+
+BACKEND_NAMES: tuple[str, ...] = ("openai-whisper", "faster-whisper")
+DEFAULT_BACKEND = BACKEND_NAMES[0]
+SAMPLE_RATE = 16000
+
+
+class AsrBackend:
+    """A loaded speech recognition model.
+
+    Attributes
+    ----------
+    name : str
+        Backend identifier (one of :data:`BACKEND_NAMES`).
+    model_size : str
+        Model size name or checkpoint path the backend was loaded from.
+    device : str
+        ``"cuda"`` or ``"cpu"``.
+    accel : str
+        CPU acceleration mode applied to the model (see
+        :mod:`apps.ai.accel`); ``"off"`` when none was applied.
+    """
+
+    name: str = "base"
+
+    def __init__(self, model_size: str, device: str) -> None:
+        self.model_size = model_size
+        self.device = device
+        self.accel = "off"
+
+    def transcribe(self, audio: Any, language: Optional[str] = None, **options: Any) -> AsrResult:
+        """Transcribe a file path or a 16 kHz mono float32 array.
+
+        ``options`` are decoding options shared by both engines
+        (``beam_size``, ``temperature``, ``condition_on_previous_text``;
+        see :meth:`apps.ai.profiles.Profile.decoding_options`).
+        """
+        raise NotImplementedError
+
+    def to_cpu(self) -> None:
+        """Move the model to CPU, e.g. after a CUDA failure."""
+        raise NotImplementedError
+
+    def release(self) -> None:
+        """Drop references to the underlying model."""
+
+    @staticmethod
+    def _segments(raw: List[Any]) -> List[Dict[str, Any]]:
+        """Normalise engine segments (dicts or objects) to the shared schema."""
+        segments: List[Dict[str, Any]] = []
+        for seg in raw:
+            fields = seg if isinstance(seg, dict) else vars(seg) if hasattr(seg, "__dict__") else seg._asdict()
+            segments.append({
+                "start": float(fields.get("start") or 0.0),
+                "end": float(fields.get("end") or 0.0),
+                "text": str(fields.get("text") or ""),
+            })
+        return segments
+
+
+def load_backend(
+    name: str,
+    model_size: str,
+    device: str,
+    *,
+    compute_type: Optional[str] = None,
+    threads: int = 0,
+    cpu_accel: str = "off",
+) -> AsrBackend:
+    """Load ``model_size`` with the backend called ``name``.
+
+    Parameters
+    ----------
+    name : str
+        One of :data:`BACKEND_NAMES`.
+    model_size : str
+        Model size name or checkpoint path.
+    device : str
+        ``"cuda"`` or ``"cpu"``.
+    compute_type : Optional[str]
+        CTranslate2 compute type for ``faster-whisper``; ignored by
+        ``openai-whisper``.
+    threads : int
+        CPU threads for ``faster-whisper`` (``0`` lets CTranslate2 decide).
+    cpu_accel : str
+        :mod:`apps.ai.accel` mode for ``openai-whisper`` on CPU.
+        ``faster-whisper`` ignores it; its int8 path is ``compute_type``.
+
+    Raises
+    ------
+    ValueError
+        If ``name`` is not a known backend.
+    ImportError
+        If the backend's package is not installed.
+    """
+    if name == "openai-whisper":
+        from .openai_whisper import OpenAIWhisperBackend
+
+        return OpenAIWhisperBackend(model_size, device, cpu_accel=cpu_accel)
+    if name == "faster-whisper":
+        from .faster_whisper import FasterWhisperBackend
+
+        return FasterWhisperBackend(model_size, device, compute_type=compute_type, threads=threads)
+    raise ValueError(f"Unknown ASR backend '{name}'. Expected one of {', '.join(BACKEND_NAMES)}.")
+
+
+def decode_audio(name: str, path: str) -> Any:
+    """Decode ``path`` to 16 kHz mono float32 the way backend ``name`` would."""
+    if name == "faster-whisper":
+        from faster_whisper import decode_audio as _decode
+
+        return _decode(path, sampling_rate=SAMPLE_RATE)
+    import whisper
+
+    return whisper.load_audio(path)
@@ -0,0 +1,67 @@
+"""
+faster-whisper (CTranslate2) backend.
+
+CTranslate2 runs Whisper with int8 weights on CPU, which is several
+times faster than the fp32 PyTorch model at a small accuracy cost.
+Decoding is greedy (``beam_size=1``) to match ``whisper.transcribe``'s
+defaults used by the openai-whisper backend, unless the processing
+profile asks for beam search.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from .base import AsrBackend, AsrResult
+
+
+def default_compute_type(device: str) -> str:
+    return "float16" if device == "cuda" else "int8"
+
+
+class FasterWhisperBackend(AsrBackend):
+    name = "faster-whisper"
+
+    def __init__(
+        self,
+        model_size: str,
+        device: str,
+        *,
+        compute_type: Optional[str] = None,
+        threads: int = 0,
+    ) -> None:
+        super().__init__(model_size, device)
+        self.compute_type = compute_type or default_compute_type(device)
+        self.threads = threads
+        self.model = self._load(device, self.compute_type)
+
+    def _load(self, device: str, compute_type: str) -> Any:
+        from faster_whisper import WhisperModel
+
+        return WhisperModel(
+            self.model_size,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=self.threads,
+        )
+
+    def transcribe(self, audio: Any, language: Optional[str] = None, **options: Any) -> AsrResult:
+        if not isinstance(audio, str) and hasattr(audio, "__fspath__"):
+            audio = str(audio)
+        options.setdefault("beam_size", 1)
+        if "temperature" in options:
+            options["temperature"] = list(options["temperature"])
+        segments, info = self.model.transcribe(audio, language=language, **options)
+        # ``segments`` is a lazy generator; decoding happens while iterating.
+        return {
+            "language": getattr(info, "language", language),
+            "segments": self._segments(list(segments)),
+        }
+
+    def to_cpu(self) -> None:
+        self.compute_type = default_compute_type("cpu")
+        self.model = self._load("cpu", self.compute_type)
+        self.device = "cpu"
+
+    def release(self) -> None:
+        self.model = None
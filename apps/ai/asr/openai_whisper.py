@@ -0,0 +1,44 @@
+"""
+openai-whisper backend.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from ..accel import inference_context, prepare_whisper
+from .base import AsrBackend, AsrResult
+
+
+class OpenAIWhisperBackend(AsrBackend):
+    name = "openai-whisper"
+
+    def __init__(self, model_size: str, device: str, *, cpu_accel: str = "off") -> None:
+        import whisper
+
+        super().__init__(model_size, device)
+        self.model = whisper.load_model(model_size, device=device)
+        if device == "cpu" and cpu_accel != "off":
+            prepare_whisper(self.model, cpu_accel)
+            self.accel = cpu_accel
+
+    def transcribe(self, audio: Any, language: Optional[str] = None, **options: Any) -> AsrResult:
+        if not isinstance(audio, str) and hasattr(audio, "__fspath__"):
+            audio = str(audio)
+        with inference_context(self.accel):
+            result = self.model.transcribe(audio, language=language, fp16=self.device == "cuda", **options)
+        return {
+            "language": result.get("language"),
+            "segments": self._segments(result.get("segments") or []),
+        }
+
+    def to_cpu(self) -> None:
+        self.model.to("cpu")
+        self.device = "cpu"
+
+    def release(self) -> None:
+        try:
+            self.model.to("cpu")
+        except Exception:
+            pass
+        self.model = None
@@ -0,0 +1,318 @@
+"""
+Batch runner for bulk offline processing.
+
+:func:`apps.ai.main.ai_main` handles one file per invocation and pays
+for bootstrap, configuration loading and model loads every time. This
+runner processes a whole archive in one process:
+
+- inputs are files, directories (searched recursively for audio and
+  video files), glob patterns or a manifest (``--manifest``) listing
+  one path per line, or one JSON object per line with ``path`` and
+  optional ``run_id`` and ``korean_only``;
+- bootstrap and configuration happen once, the models are preloaded
+  (:mod:`apps.ai.preload`) and stay warm under the memory budget
+  (:mod:`apps.ai.residency`) for every file;
+- ``--parallel`` files run at a time; the stage gates
+  (:mod:`apps.ai.pipeline.gates`) pipeline them so the GPU and CPU stay
+  busy without being oversubscribed;
+- each file's artefacts go to ``apps/ai/output/<run_id>`` as for a
+  single run, with ``run_id = <prefix>-<file stem>``. The prefix
+  defaults to ``batch-<manifest stem>`` with a manifest and to
+  ``batch-<timestamp>`` otherwise; ``--skip-existing`` resumes an
+  interrupted backfill and therefore needs a manifest or ``--prefix``.
+  It skips only runs whose summary came from the LLM, so files that
+  fell back to the raw transcript are processed again;
+- a throughput report (audio hours per wall-clock hour, per-stage run
+  and wait totals) is printed at the end and written as JSON with
+  ``--output``.
+
+Usage
+-----
+.. code-block:: bash
+
+   python -m apps.ai.batch /archive/2023 "/archive/2024/**/*.m4a" --parallel 3 --prefix archive
+   python -m apps.ai.batch --manifest backfill.txt --korean-only --skip-existing --output report.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .bootstrap.manager import ensure_models_ready
+from .config import Config
+from .io import storage
+from .main import full_pipeline_stages
+from .pipeline.base import StageContext
+from .pipeline.gates import gates_report
+from .pipeline.orchestrator import PipelineOrchestrator
+from .profiles import PROFILE_NAMES, apply_profile
+from .resources import Resources
+
+MEDIA_SUFFIXES: tuple[str, ...] = (
+    ".wav", ".flac", ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".webm", ".mp4", ".mkv", ".mov",
+)
+DEFAULT_PARALLELISM = 2
+
+
+def _is_media(path: Path) -> bool:
+    return path.is_file() and path.suffix.lower() in MEDIA_SUFFIXES
+
+
+def _expand(pattern: str, base: Path) -> List[Path]:
+    """Files named by ``pattern``: a file, a directory or a glob."""
+    path = Path(pattern).expanduser()
+    if not path.is_absolute():
+        path = base / path
+    if any(char in pattern for char in "*?["):
+        return sorted(Path(match) for match in glob.glob(str(path), recursive=True) if _is_media(Path(match)))
+    if path.is_dir():
+        return sorted(candidate for candidate in path.rglob("*") if _is_media(candidate))
+    if path.is_file():
+        return [path]
+    print(f"[Batch] No such file or directory: {path}")
+    return []
+
+
+def read_manifest(manifest: Path) -> List[Dict[str, Any]]:
+    """Entries of a manifest; relative paths are resolved against its directory.
+
+    Blank lines and lines starting with ``#`` are skipped. A line that
+    starts with ``{`` is a JSON object with ``path`` and optional
+    ``run_id`` and ``korean_only``; any other line is a path or glob.
+    """
+    entries: List[Dict[str, Any]] = []
+    for number, line in enumerate(manifest.read_text(encoding="utf-8").splitlines(), start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{"):
+            try:
+                item = json.loads(line)
+                paths = _expand(str(item["path"]), manifest.parent)
+            except (ValueError, KeyError) as exc:
+                print(f"[Batch] Skipping manifest line {number}: {exc}")
+                continue
+            for path in paths:
+                entries.append({**item, "path": path})
+        else:
+            entries.extend({"path": path} for path in _expand(line, manifest.parent))
+    return entries
+
+
+def collect_inputs(inputs: List[str], manifest: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Entries for ``inputs`` and the manifest, without duplicate paths."""
+    entries: List[Dict[str, Any]] = []
+    for pattern in inputs:
+        entries.extend({"path": path} for path in _expand(pattern, Path.cwd()))
+    if manifest is not None:
+        entries.extend(read_manifest(manifest))
+    unique: Dict[Path, Dict[str, Any]] = {}
+    for entry in entries:
+        unique.setdefault(Path(entry["path"]).resolve(), entry)
+    return list(unique.values())
+
+
+def assign_run_ids(entries: List[Dict[str, Any]], prefix: str) -> None:
+    """Give every entry a unique ``run_id`` (``<prefix>-<stem>`` unless set)."""
+    taken: Dict[str, int] = {}
+    for entry in entries:
+        base = storage.normalise_run_identifier(str(entry.get("run_id") or f"{prefix}-{Path(entry['path']).stem}"))
+        count = taken.get(base, 0)
+        taken[base] = count + 1
+        entry["run_id"] = base if count == 0 else f"{base}-{count + 1}"
+
+
+def _audio_seconds(context: StageContext) -> float:
+    # The normaliser's chunks as stored by the orchestrator (dicts, before VAD trimming).
+    chunks = context.data.get("normalize_result") or []
+    return max((float(chunk["end"]) for chunk in chunks), default=0.0)
+
+
+def default_prefix(manifest: Optional[Path]) -> str:
+    """Run id prefix when ``--prefix`` is not given.
+
+    A manifest gives a prefix that is the same on every run, so
+    ``--skip-existing`` can find the output of an earlier one.
+    """
+    if manifest is not None:
+        return f"batch-{manifest.stem}"
+    return f"batch-{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def process_entry(config: Config, entry: Dict[str, Any], korean_only: bool) -> Dict[str, Any]:
+    """Run the full pipeline on one entry and return its report row."""
+    run_id = entry["run_id"]
+    context = StageContext(
+        run_id=run_id,
+        config=config,
+        resources=Resources(config),
+        base_dir=storage.resolve_run_directory(config.runs_dir, run_id),
+        input_file=Path(entry["path"]),
+        is_korean_only=bool(entry.get("korean_only", korean_only)),
+    )
+    started = time.perf_counter()
+    row: Dict[str, Any] = {"path": str(entry["path"]), "run_id": run_id}
+    try:
+        results = PipelineOrchestrator(full_pipeline_stages()).run(context)
+        row["success"] = bool(results) and all(result.success for result in results)
+        if not row["success"]:
+            failed = next((result for result in results if not result.success), None)
+            row["error"] = (failed.message or f"stage '{failed.name}' failed") if failed else "no stages ran"
+    except Exception as exc:
+        print(f"[Batch] {run_id} failed: {exc}")
+        row.update(success=False, error=str(exc))
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    row["audio_seconds"] = round(_audio_seconds(context), 3)
+    row["stages"] = context.data.get("stage_timings") or {}
+    return row
+
+
+def throughput_report(rows: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    """Aggregate the per-file rows of a batch."""
+    audio_seconds = sum(row.get("audio_seconds", 0.0) for row in rows if row.get("success"))
+    stages: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        for name, timing in (row.get("stages") or {}).items():
+            total = stages.setdefault(name, {"resource": timing.get("resource"), "runs": 0, "seconds": 0.0, "wait_seconds": 0.0})
+            total["runs"] += 1
+            total["seconds"] += float(timing.get("seconds", 0.0))
+            total["wait_seconds"] += float(timing.get("wait_seconds", 0.0))
+    for total in stages.values():
+        total["seconds"] = round(total["seconds"], 2)
+        total["wait_seconds"] = round(total["wait_seconds"], 2)
+        total["audio_hours_per_hour"] = round(audio_seconds / total["seconds"], 2) if total["seconds"] else None
+    return {
+        "files": len(rows),
+        "succeeded": sum(1 for row in rows if row.get("success")),
+        "failed": [{"path": row["path"], "error": row.get("error")} for row in rows if not row.get("success")],
+        "audio_hours": round(audio_seconds / 3600, 3),
+        "wall_hours": round(wall_seconds / 3600, 3),
+        "audio_hours_per_wall_hour": round(audio_seconds / wall_seconds, 2) if wall_seconds else None,
+        "stages": stages,
+        "gates": gates_report(),
+        "runs": rows,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print("=== Batch Throughput ===")
+    print(
+        f"Files: {report['succeeded']}/{report['files']} succeeded; "
+        f"{report['audio_hours']:.2f} h of audio in {report['wall_hours']:.2f} h wall-clock "
+        f"({report['audio_hours_per_wall_hour'] or 0:.2f} audio h per wall h)."
+    )
+    if report["stages"]:
+        print(f"{'stage':<12}{'resource':<10}{'runs':>6}{'run s':>12}{'wait s':>12}{'audio h/h':>12}")
+        for name, total in report["stages"].items():
+            rate = total["audio_hours_per_hour"]
+            print(
+                f"{name:<12}{str(total['resource'] or '-'):<10}{total['runs']:>6}"
+                f"{total['seconds']:>12.1f}{total['wait_seconds']:>12.1f}{(f'{rate:.2f}' if rate is not None else '-'):>12}"
+            )
+    for failure in report["failed"]:
+        print(f"FAILED {failure['path']}: {failure['error']}")
+
+
+def _parallelism(value: Optional[int]) -> int:
+    if value:
+        return max(1, value)
+    env_value = os.getenv("BATCH_PARALLELISM")
+    if env_value:
+        try:
+            return max(1, int(env_value))
+        except ValueError:
+            print(f"[Batch] Invalid BATCH_PARALLELISM='{env_value}'; using {DEFAULT_PARALLELISM}.")
+    return DEFAULT_PARALLELISM
+
+
+def run_batch(
+    entries: List[Dict[str, Any]],
+    profile: Optional[str] = None,
+    korean_only: bool = False,
+    parallel: int = DEFAULT_PARALLELISM,
+    skip_existing: bool = False,
+    preload: bool = True,
+) -> Dict[str, Any]:
+    """Process ``entries`` (with ``run_id`` assigned) and return the throughput report."""
+    project_root = Path(__file__).resolve().parents[2]
+    ensure_models_ready(models_dir=None, config_json=project_root / "apps" / "ai" / "ai.config.json")
+    base_config = Config.load()
+    config = apply_profile(base_config, profile)
+
+    if skip_existing:
+        pending = [
+            entry for entry in entries
+            if not storage.has_llm_summary(storage.resolve_run_directory(config.runs_dir, entry["run_id"]))
+        ]
+        if len(pending) < len(entries):
+            print(f"[Batch] Skipping {len(entries) - len(pending)} file(s) with an existing LLM summary.")
+        entries = pending
+
+    if preload and entries:
+        from .preload import preload_list, preload_models
+
+        preload_models(base_config, preload_list(base_config), profile)
+
+    rows: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    print(f"[Batch] Processing {len(entries)} file(s), {parallel} at a time.")
+
+    def work(entry: Dict[str, Any]) -> None:
+        row = process_entry(config, entry, korean_only)
+        with lock:
+            rows.append(row)
+            done = len(rows)
+        status = "ok" if row["success"] else "FAILED"
+        print(f"[Batch] [{done}/{len(entries)}] {row['run_id']}: {status} ({row['audio_seconds'] / 60:.1f} min audio in {row['seconds']:.0f}s).")
+
+    with ThreadPoolExecutor(max_workers=max(1, parallel), thread_name_prefix="batch") as executor:
+        list(executor.map(work, entries))
+    return throughput_report(rows, time.perf_counter() - started)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the AI pipeline over many recordings with shared models")
+    parser.add_argument("inputs", nargs="*", help="Audio/video files, directories or glob patterns")
+    parser.add_argument("--manifest", type=str, default=None, help="File listing one path (or JSON object) per line")
+    parser.add_argument("--parallel", type=int, default=None, help=f"Files in flight (default: BATCH_PARALLELISM or {DEFAULT_PARALLELISM})")
+    parser.add_argument("--profile", choices=PROFILE_NAMES, default=None, help="Speed/quality profile (default: AI_PROFILE or balanced)")
+    parser.add_argument("--korean-only", action="store_true", help="Skip language detection and transcribe as Korean")
+    parser.add_argument("--prefix", type=str, default=None, help="Run id prefix (default: batch-<manifest stem>, else batch-<timestamp>)")
+    parser.add_argument("--skip-existing", action="store_true", help="Skip files whose earlier run produced an LLM summary")
+    parser.add_argument("--no-preload", action="store_true", help="Load models on first use instead of up front")
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    args = parser.parse_args(argv)
+
+    manifest = Path(args.manifest) if args.manifest else None
+    if args.skip_existing and not args.prefix and manifest is None:
+        parser.error("--skip-existing needs --prefix (or --manifest) so run ids match the earlier run")
+    entries = collect_inputs(args.inputs, manifest)
+    if not entries:
+        parser.error("no input files found")
+    assign_run_ids(entries, args.prefix or default_prefix(manifest))
+
+    report = run_batch(
+        entries,
+        profile=args.profile,
+        korean_only=args.korean_only,
+        parallel=_parallelism(args.parallel),
+        skip_existing=args.skip_existing,
+        preload=not args.no_preload,
+    )
+    _print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
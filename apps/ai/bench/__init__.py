@@ -0,0 +1,7 @@
+"""
+Benchmarks for the AI pipeline.
+
+Each module is a small command line tool that runs real pipeline stages
+on a recording and reports throughput figures such as the real-time
+factor (processing time divided by audio duration; lower is faster).
+"""
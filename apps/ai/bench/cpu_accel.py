@@ -0,0 +1,187 @@
+"""
+Accuracy/speed comparison of the CPU acceleration modes.
+
+Transcribes a fixed local sample set with openai-whisper on CPU once per
+:mod:`apps.ai.accel` mode and reports word error rate (WER), character
+error rate (CER; more telling for Korean) and real-time factor. With
+``--diarization`` the pyannote pipeline is timed per mode as well.
+
+The sample directory holds audio files next to reference transcripts
+with the same stem (``lecture01.wav`` + ``lecture01.txt``). Audio is
+decoded before timing starts, so only inference is measured.
+
+Usage
+-----
+.. code-block:: bash
+
+   python -m apps.ai.bench.cpu_accel samples/ --language ko --modes off int8 bf16
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ..accel import ACCEL_MODES, configure_threads, cpu_supports_bf16, inference_context, prepare_pyannote
+from ..asr import SAMPLE_RATE, decode_audio, load_backend
+
+_AUDIO_SUFFIXES = (".wav", ".flac", ".mp3", ".m4a", ".ogg", ".webm")
+_PUNCTUATION = re.compile(r"[^\w\s]", re.UNICODE)
+
+
+def _normalise(text: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+def _edit_distance(reference: Sequence[str], hypothesis: Sequence[str]) -> int:
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref in enumerate(reference, start=1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp in enumerate(hypothesis, start=1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref != hyp))
+        previous = current
+    return previous[-1]
+
+
+def error_rates(references: Sequence[str], hypotheses: Sequence[str]) -> Tuple[float, float]:
+    """Corpus-level ``(WER, CER)`` after lower-casing and stripping punctuation."""
+    word_errors = word_total = char_errors = char_total = 0
+    for reference, hypothesis in zip(references, hypotheses):
+        ref, hyp = _normalise(reference), _normalise(hypothesis)
+        word_errors += _edit_distance(ref.split(), hyp.split())
+        word_total += len(ref.split())
+        char_errors += _edit_distance(ref.replace(" ", ""), hyp.replace(" ", ""))
+        char_total += len(ref.replace(" ", ""))
+    return word_errors / max(1, word_total), char_errors / max(1, char_total)
+
+
+def load_samples(sample_dir: Path) -> List[Dict[str, Any]]:
+    """Return ``{name, audio, seconds, reference}`` for every labelled sample."""
+    samples: List[Dict[str, Any]] = []
+    for path in sorted(sample_dir.iterdir()):
+        reference = path.with_suffix(".txt")
+        if path.suffix.lower() not in _AUDIO_SUFFIXES or not reference.exists():
+            continue
+        audio = decode_audio("openai-whisper", str(path))
+        samples.append({
+            "name": path.name,
+            "audio": audio,
+            "seconds": len(audio) / SAMPLE_RATE,
+            "reference": reference.read_text(encoding="utf-8"),
+        })
+    return samples
+
+
+def _bench_whisper(samples: List[Dict[str, Any]], model_size: str, mode: str, language: Optional[str]) -> Dict[str, Any]:
+    backend = load_backend("openai-whisper", model_size, "cpu", cpu_accel=mode)
+    hypotheses: List[str] = []
+    elapsed = 0.0
+    for sample in samples:
+        started = time.perf_counter()
+        result = backend.transcribe(sample["audio"], language=language)
+        elapsed += time.perf_counter() - started
+        hypotheses.append(" ".join(seg["text"] for seg in result["segments"]))
+    backend.release()
+    wer, cer = error_rates([sample["reference"] for sample in samples], hypotheses)
+    audio_seconds = sum(sample["seconds"] for sample in samples)
+    return {"mode": mode, "wer": wer, "cer": cer, "seconds": elapsed, "rtf": elapsed / max(audio_seconds, 1e-9)}
+
+
+def _bench_diarization(samples: List[Dict[str, Any]], repo_id: str, mode: str) -> Dict[str, Any]:
+    import torch
+    from pyannote.audio import Pipeline
+
+    from ..pipeline.stages.diarize import diarize_waveform
+
+    pipeline = prepare_pyannote(Pipeline.from_pretrained(repo_id), mode)
+    elapsed = 0.0
+    speakers: List[int] = []
+    for sample in samples:
+        waveform = torch.from_numpy(sample["audio"]).unsqueeze(0)
+        started = time.perf_counter()
+        with inference_context(mode):
+            turns, _ = diarize_waveform(pipeline, waveform, SAMPLE_RATE, sample["name"])
+        elapsed += time.perf_counter() - started
+        speakers.append(len({turn["speaker"] for turn in turns}))
+    audio_seconds = sum(sample["seconds"] for sample in samples)
+    return {"mode": mode, "seconds": elapsed, "rtf": elapsed / max(audio_seconds, 1e-9), "speakers": speakers}
+
+
+def run_benchmark(
+    sample_dir: Path,
+    modes: Sequence[str],
+    model_size: str,
+    language: Optional[str] = None,
+    diarization_repo: Optional[str] = None,
+) -> Dict[str, Any]:
+    samples = load_samples(sample_dir)
+    if not samples:
+        raise FileNotFoundError(f"No audio files with matching .txt references in '{sample_dir}'.")
+    threads = configure_threads()
+    if "bf16" in modes and not cpu_supports_bf16():
+        print("[bench] CPU has no native bf16 support; skipping 'bf16'.")
+        modes = [mode for mode in modes if mode != "bf16"]
+
+    report: Dict[str, Any] = {
+        "samples": len(samples),
+        "audio_seconds": sum(sample["seconds"] for sample in samples),
+        "threads": threads,
+        "model": model_size,
+        "whisper": [],
+        "diarization": [],
+    }
+    for mode in modes:
+        print(f"[bench] Whisper '{model_size}' with CPU mode '{mode}'.")
+        report["whisper"].append(_bench_whisper(samples, model_size, mode, language))
+        if diarization_repo:
+            print(f"[bench] Diarisation '{diarization_repo}' with CPU mode '{mode}'.")
+            report["diarization"].append(_bench_diarization(samples, diarization_repo, mode))
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['samples']} sample(s), {report['audio_seconds']:.1f}s of audio, "
+        f"Whisper '{report['model']}', {report['threads']} thread(s)."
+    )
+    baseline = report["whisper"][0]["seconds"] if report["whisper"] else 0.0
+    print(f"{'mode':>6} {'WER':>7} {'CER':>7} {'RTF':>7} {'speed-up':>9}")
+    for run in report["whisper"]:
+        speedup = baseline / run["seconds"] if run["seconds"] else 0.0
+        print(f"{run['mode']:>6} {run['wer']:>7.3f} {run['cer']:>7.3f} {run['rtf']:>7.3f} {speedup:>8.2f}x")
+    if report["diarization"]:
+        print("Diarisation:")
+        print(f"{'mode':>6} {'RTF':>7} {'speakers':>20}")
+        for run in report["diarization"]:
+            print(f"{run['mode']:>6} {run['rtf']:>7.3f} {str(run['speakers']):>20}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare CPU acceleration modes by WER and real-time factor")
+    parser.add_argument("sample_dir", type=str, help="Directory of audio files with same-stem .txt references")
+    parser.add_argument("--modes", nargs="+", default=list(ACCEL_MODES), choices=ACCEL_MODES)
+    parser.add_argument("--model", type=str, default=None, help="Whisper model size (default: ai.config.json)")
+    parser.add_argument("--language", type=str, default=None, help="Pin the language, e.g. 'ko'")
+    parser.add_argument("--diarization", action="store_true", help="Also time the pyannote pipeline")
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    selected: Dict[str, Any] = {}
+    if not args.model or args.diarization:
+        from ..config import Config
+
+        selected = Config.load().selected_models
+    report = run_benchmark(
+        Path(args.sample_dir),
+        args.modes,
+        args.model or selected.get("whisper", "small"),
+        language=args.language,
+        diarization_repo=selected.get("diar") if args.diarization else None,
+    )
+    _print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
@@ -0,0 +1,152 @@
+"""
+Real-time factor benchmark for :class:`STTStage`.
+
+The recording is normalised and split once, then transcribed by the
+single-process loop (``STT_WORKERS=1``) and by the worker pool for each
+requested worker count. After every run its models and worker pool are
+evicted from the process-wide memory budget, so each configuration
+starts cold and model loading (or pool start-up) is included in its
+timing, as in the first pipeline run after a deploy.
+
+Usage
+-----
+.. code-block:: bash
+
+   python -m apps.ai.bench.stt_rtf recording.wav --segment-seconds 300 --workers auto 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config import Config
+from ..resources import Resources
+from ..pipeline.base import StageContext
+from ..pipeline.stages import NormalizeStage, STTStage
+
+
+def _transcribe(config: Config, base_dir: Path, input_path: Path, chunks: List[Any], workers: str) -> Dict[str, Any]:
+    previous = os.environ.get("STT_WORKERS")
+    os.environ["STT_WORKERS"] = workers
+    resources = Resources(config)
+    try:
+        context = StageContext(
+            run_id=f"bench-{workers}",
+            config=config,
+            resources=resources,
+            base_dir=base_dir,
+            input_file=input_path,
+            data={"chunks": chunks},
+        )
+        started = time.perf_counter()
+        result = STTStage().run(context)
+        elapsed = time.perf_counter() - started
+    finally:
+        # The budget would keep the model or pool warm for the next configuration.
+        resources.close()
+        resources.budget.evict_idle("benchmark configuration finished")
+        if previous is None:
+            os.environ.pop("STT_WORKERS", None)
+        else:
+            os.environ["STT_WORKERS"] = previous
+    segments = result.data or []
+    return {
+        "workers": workers,
+        "success": result.success,
+        "seconds": elapsed,
+        "segments": len(segments),
+        "text": " ".join(str(seg.get("text", "")) for seg in segments),
+    }
+
+
+def run_benchmark(
+    input_path: Path,
+    worker_settings: List[str],
+    segment_seconds: Optional[int] = None,
+    model: Optional[str] = None,
+    backend: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Normalise ``input_path`` and time every STT configuration.
+
+    Returns a report with the audio duration and, per configuration,
+    the wall time, real-time factor, speed-up over the single-process
+    loop and whether the transcript text matches it.
+    """
+    config = Config.load()
+    if model:
+        config.payload.setdefault("selected", {})["whisper"] = model
+    if backend:
+        config.payload.setdefault("selected", {})["asr_backend"] = backend
+
+    with tempfile.TemporaryDirectory(prefix="stt-bench-") as tmp:
+        base_dir = Path(tmp)
+        normalize = NormalizeStage()
+        if segment_seconds:
+            normalize.SEGMENT_LENGTH = segment_seconds
+        context = StageContext(
+            run_id="bench",
+            config=config,
+            resources=Resources(config),
+            base_dir=base_dir,
+            input_file=input_path,
+        )
+        normalize.run(context)
+        context.resources.close()
+        chunks = context.data.get("chunks") or []
+        duration = max((chunk.end for chunk in chunks), default=0.0)
+
+        runs = [_transcribe(config, base_dir, input_path, chunks, "1")]
+        for setting in worker_settings:
+            if setting != "1":
+                runs.append(_transcribe(config, base_dir, input_path, chunks, setting))
+
+    baseline = runs[0]
+    for run in runs:
+        run["rtf"] = run["seconds"] / duration if duration else None
+        run["speedup"] = baseline["seconds"] / run["seconds"] if run["seconds"] else None
+        run["same_text"] = run["text"] == baseline["text"]
+        del run["text"]
+    return {
+        "input": str(input_path),
+        "backend": config.asr_backend,
+        "model": config.selected_models.get("whisper"),
+        "audio_seconds": duration,
+        "chunks": len(chunks),
+        "runs": runs,
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['backend']} model {report['model']}, {report['audio_seconds']:.1f}s of audio in {report['chunks']} chunk(s)."
+    )
+    print(f"{'workers':>8} {'seconds':>9} {'RTF':>7} {'speed-up':>9} {'segments':>9} {'same text':>10}")
+    for run in report["runs"]:
+        rtf = f"{run['rtf']:.3f}" if run["rtf"] is not None else "-"
+        speedup = f"{run['speedup']:.2f}x" if run["speedup"] is not None else "-"
+        print(
+            f"{run['workers']:>8} {run['seconds']:>9.1f} {rtf:>7} {speedup:>9} "
+            f"{run['segments']:>9} {str(run['same_text']):>10}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare STT real-time factor across worker counts")
+    parser.add_argument("input_file", type=str, help="Audio or video file to transcribe")
+    parser.add_argument("--workers", nargs="+", default=["auto"], help="Worker settings to compare with the single-process loop")
+    parser.add_argument("--segment-seconds", type=int, default=None, help="Chunk length override for NormalizeStage")
+    parser.add_argument("--model", type=str, default=None, help="Whisper model size override")
+    parser.add_argument("--backend", type=str, default=None, help="ASR backend override (openai-whisper, faster-whisper)")
+    parser.add_argument("--output", type=str, default=None, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    report = run_benchmark(Path(args.input_file), args.workers, args.segment_seconds, args.model, args.backend)
+    _print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
@@ -0,0 +1,265 @@
+"""
+벤치마크 기반 모델 선택 유틸
+
+resolve.pick_models()는 VRAM/RAM 임계값만으로 모델 크기를 고른다. RAM이 많은
+CPU 노드에서는 large-v3 + 8B Q8을 고르게 되어 실시간보다 훨씬 느리다.
+이 모듈은 부트스트랩 시 짧은 로컬 마이크로 벤치마크로 선택을 보정한다.
+
+- Whisper: 합성 음성(BOOTSTRAP_BENCH_SECONDS, 기본 30초 = Whisper 한 윈도우)을
+  후보 크기마다 전사해 실시간 비율(RTF = 처리 시간 / 오디오 길이)을 잰다.
+  BOOTSTRAP_RTF_TARGET(기본 0.5) 이하인 가장 큰 모델을 고른다.
+- 요약 LLM: 후보 GGUF마다 프롬프트 처리/생성 tokens/s를 재고, 요약 1회
+  (프롬프트 SUMMARY_PROMPT_TOKENS + 응답 SUMMARY_ANSWER_TOKENS) 예상 시간이
+  BOOTSTRAP_SUMMARY_SECONDS(기본 300초) 이하인 가장 큰 모델을 고른다.
+
+후보는 하드웨어 선택에서 시작해 작은 쪽으로 내려가며, 목표를 처음 만족하는
+후보에서 멈춘다(큰 모델부터 재므로 그 후보가 "목표를 만족하는 가장 큰 모델").
+모두 목표에 못 미치면 가장 작은 후보를, 측정 자체가 안 되면(패키지 미설치 등)
+하드웨어 선택을 그대로 쓴다. 측정 결과는 ai.config.json의
+"benchmark" 항목에 기록된다. BOOTSTRAP_BENCHMARK=0 이면 건너뛴다.
+
+단독 실행 (기존 ai.config.json의 선택을 다시 측정해 갱신):
+    python -m apps.ai.bootstrap.benchmark [apps/ai/ai.config.json]
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .resolve import LLM_SUM_LADDER
+
+# 작은 쪽 한계: tiny는 한국어 품질이 너무 낮아 후보에서 제외
+WHISPER_LADDER: tuple[str, ...] = ("large-v3", "medium", "small", "base")
+
+DEFAULT_RTF_TARGET = 0.5
+DEFAULT_SUMMARY_SECONDS = 300.0
+DEFAULT_BENCH_SECONDS = 30.0
+SUMMARY_PROMPT_TOKENS = 2048  # RefineLLMStage가 자르는 6000자 전사문 ≈ 2k 토큰
+SUMMARY_ANSWER_TOKENS = 1792  # 응답 상한 1536 + think 예산 256
+SAMPLE_RATE = 16000
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            print(f"[bootstrap/bench] Invalid {name}='{value}'; using {default}.")
+    return default
+
+
+def benchmark_enabled() -> bool:
+    """BOOTSTRAP_BENCHMARK=0/false/off 이면 벤치마크를 건너뛴다."""
+    return os.getenv("BOOTSTRAP_BENCHMARK", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def synthetic_speech(seconds: float, sample_rate: int = SAMPLE_RATE):
+    """
+    음성과 비슷한 합성 신호 (16 kHz mono float32).
+    - 100~220 Hz로 흔들리는 기본 주파수 + 배음, 4 Hz 음절 단위 진폭 변조, 약한 잡음.
+    - 무음이면 Whisper가 디코딩을 거의 하지 않아 실제보다 빠르게 측정되므로 사용.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    f0 = 160.0 + 60.0 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4.0 * t), 0.0, None) * (0.6 + 0.4 * np.sin(2 * np.pi * 0.17 * t))
+    audio = 0.2 * voiced * envelope + 0.01 * rng.standard_normal(t.size)
+    return audio.astype(np.float32)
+
+
+def whisper_candidates(picked: str) -> List[str]:
+    """하드웨어 선택부터 작은 쪽으로의 Whisper 후보 목록."""
+    tier = "large-v3" if picked.startswith("large") else picked
+    if tier not in WHISPER_LADDER:
+        return [picked]  # 체크포인트 경로 등은 그대로
+    return list(WHISPER_LADDER[WHISPER_LADDER.index(tier):])
+
+
+def llm_candidates(repo_id: str, pattern: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    """하드웨어 선택부터 작은 쪽으로의 요약 LLM 후보 목록 (repo_id, allow_pattern)."""
+    if (repo_id, pattern) not in LLM_SUM_LADDER:
+        return [(repo_id, pattern)]
+    return list(LLM_SUM_LADDER[LLM_SUM_LADDER.index((repo_id, pattern)):])
+
+
+def bench_whisper(backend_name: str, model_size: str, device: str, audio) -> Dict[str, Any]:
+    """model_size 로 합성 음성을 전사해 로드 시간과 RTF를 반환."""
+    from ..accel import accel_mode
+    from ..asr import load_backend
+
+    started = time.perf_counter()
+    backend = load_backend(backend_name, model_size, device, cpu_accel=accel_mode())
+    load_seconds = time.perf_counter() - started
+    try:
+        # 예열 없이 1회 측정: 디코딩 옵션은 greedy/폴백 없음으로 고정해 편차를 줄인다
+        started = time.perf_counter()
+        backend.transcribe(audio, language="ko", temperature=(0.0,), condition_on_previous_text=False)
+        elapsed = time.perf_counter() - started
+    finally:
+        backend.release()
+    return {
+        "model": model_size,
+        "device": device,
+        "load_seconds": round(load_seconds, 2),
+        "seconds": round(elapsed, 2),
+        "rtf": round(elapsed / (len(audio) / SAMPLE_RATE), 3),
+    }
+
+
+def _gpu_layers(cuda: bool) -> int:
+    """LLAMA_GPU_LAYERS 우선, 없으면 CUDA일 때 전체 오프로드(-1)."""
+    value = os.getenv("LLAMA_GPU_LAYERS")
+    if value:
+        try:
+            return int(value)
+        except ValueError:
+            print(f"[bootstrap/bench] Invalid LLAMA_GPU_LAYERS='{value}'; ignoring.")
+    return -1 if cuda else 0
+
+
+def bench_llm(repo_id: str, pattern: Optional[str], hw: Dict[str, Any]) -> Dict[str, Any]:
+    """GGUF 하나를 받아(캐시) 프롬프트 처리/생성 tokens/s와 요약 1회 예상 시간을 반환."""
+    from llama_cpp import Llama  # type: ignore
+
+    from .install import ensure_llm_model
+
+    cuda = bool(hw.get("gpu_cuda"))
+    cache_dir = ensure_llm_model(repo_id, allow_patterns=pattern)
+    files = sorted(cache_dir.rglob(pattern or "*.gguf")) or sorted(cache_dir.rglob("*.gguf"))
+    files = [path for path in files if path.suffix.lower() == ".gguf"]
+    if not files:
+        raise FileNotFoundError(f"No GGUF file under '{cache_dir}'")
+
+    started = time.perf_counter()
+    from ..tuning import llama_settings
+
+    gpu_layers = _gpu_layers(cuda)
+    # 파이프라인과 같은 스레드/배치 설정으로 측정
+    tuning = llama_settings(hw, gpu_layers, files[-1], n_ctx=2048)
+    llama = Llama(model_path=str(files[-1]), n_ctx=2048, n_gpu_layers=gpu_layers, verbose=False, **tuning)
+    load_seconds = time.perf_counter() - started
+    try:
+        prompt_tokens = llama.tokenize(("회의 내용을 요약합니다. " * 64).encode("utf-8"))[:512]
+        started = time.perf_counter()
+        llama.eval(prompt_tokens)
+        prefill_seconds = time.perf_counter() - started
+
+        generated = 0
+        started = time.perf_counter()
+        # 이미 평가한 프롬프트는 접두사 일치로 재사용되므로 생성 시간만 측정된다
+        for _ in llama.generate(prompt_tokens, temp=0.0):
+            generated += 1
+            if generated >= 64:
+                break
+        generate_seconds = time.perf_counter() - started
+    finally:
+        del llama
+
+    prefill_tps = len(prompt_tokens) / max(prefill_seconds, 1e-9)
+    generate_tps = generated / max(generate_seconds, 1e-9)
+    summary_seconds = SUMMARY_PROMPT_TOKENS / prefill_tps + SUMMARY_ANSWER_TOKENS / generate_tps
+    return {
+        "repo_id": repo_id,
+        "allow_pattern": pattern,
+        "file": files[-1].name,
+        "load_seconds": round(load_seconds, 2),
+        "prefill_tokens_per_second": round(prefill_tps, 1),
+        "generate_tokens_per_second": round(generate_tps, 1),
+        "summary_seconds": round(summary_seconds, 1),
+    }
+
+
+def select_models(hw: Dict[str, Any], selected: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    selected(하드웨어 기반 선택)를 벤치마크로 보정해 (새 선택, 측정 기록)을 반환.
+    - 패키지 미설치/측정 실패 시 해당 항목은 하드웨어 선택을 유지한다.
+    """
+    selected = dict(selected)
+    cuda = bool(hw.get("gpu_cuda"))
+    rtf_target = _env_float("BOOTSTRAP_RTF_TARGET", DEFAULT_RTF_TARGET)
+    summary_target = _env_float("BOOTSTRAP_SUMMARY_SECONDS", DEFAULT_SUMMARY_SECONDS)
+    report: Dict[str, Any] = {
+        "measured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "rtf_target": rtf_target,
+        "summary_seconds_target": summary_target,
+        "whisper": [],
+        "llm_sum": [],
+    }
+
+    # 1) Whisper: 큰 후보부터, 목표 RTF를 처음 만족하는 크기에서 멈춤
+    audio = synthetic_speech(_env_float("BOOTSTRAP_BENCH_SECONDS", DEFAULT_BENCH_SECONDS))
+    backend_name = selected.get("asr_backend") or "openai-whisper"
+    candidates = whisper_candidates(selected["whisper"])
+    for model_size in candidates:
+        try:
+            result = bench_whisper(backend_name, model_size, "cuda" if cuda else "cpu", audio)
+        except Exception as e:
+            print(f"[bootstrap/bench] whisper '{model_size}' failed: {e}")
+            report["whisper"].append({"model": model_size, "error": str(e)})
+            continue
+        print(f"[bootstrap/bench] whisper '{model_size}': RTF {result['rtf']:.3f} (target {rtf_target})")
+        report["whisper"].append(result)
+        if result["rtf"] <= rtf_target:
+            selected["whisper"] = model_size
+            break
+    else:
+        if any("rtf" in entry for entry in report["whisper"]):
+            # 모두 목표 미달이면 가장 작은(가장 빠른) 후보 사용
+            selected["whisper"] = candidates[-1]
+            print(f"[bootstrap/bench] No Whisper size meets RTF {rtf_target}; using '{candidates[-1]}'.")
+
+    # 2) 요약 LLM: 같은 방식으로 요약 1회 예상 시간 기준
+    llm_list = llm_candidates(selected["llm_sum_repo_id"], selected.get("llm_sum_allow_pattern"))
+    for repo_id, pattern in llm_list:
+        try:
+            result = bench_llm(repo_id, pattern, hw)
+        except Exception as e:
+            print(f"[bootstrap/bench] llm '{repo_id}' ({pattern}) failed: {e}")
+            report["llm_sum"].append({"repo_id": repo_id, "allow_pattern": pattern, "error": str(e)})
+            continue
+        print(
+            f"[bootstrap/bench] llm '{repo_id}' ({pattern}): "
+            f"{result['generate_tokens_per_second']} tok/s, summary ~{result['summary_seconds']}s (target {summary_target}s)"
+        )
+        report["llm_sum"].append(result)
+        if result["summary_seconds"] <= summary_target:
+            selected["llm_sum_repo_id"], selected["llm_sum_allow_pattern"] = repo_id, pattern
+            break
+    else:
+        if any("summary_seconds" in entry for entry in report["llm_sum"]):
+            selected["llm_sum_repo_id"], selected["llm_sum_allow_pattern"] = llm_list[-1]
+            print(f"[bootstrap/bench] No summary model meets {summary_target}s; using '{llm_list[-1][0]}'.")
+
+    report["selected"] = {
+        "whisper": selected["whisper"],
+        "llm_sum_repo_id": selected["llm_sum_repo_id"],
+        "llm_sum_allow_pattern": selected.get("llm_sum_allow_pattern"),
+    }
+    return selected, report
+
+
+# 선택: 기존 설정을 다시 측정해 갱신
+if __name__ == "__main__":
+    import sys
+
+    from .install import install_all
+    from .resolve import pick_models
+
+    cfg_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("apps/ai/ai.config.json")
+    payload = json.loads(cfg_path.read_text(encoding="utf-8"))
+    # 이전 벤치마크 결과가 아닌 하드웨어 기준 선택에서 다시 시작
+    baseline = {**payload["selected"], **pick_models(payload["hardware"])}
+    payload["selected"], payload["benchmark"] = select_models(payload["hardware"], baseline)
+    install_all(payload["selected"], base_dir_unused=None)
+    cfg_path.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
+    print("[bootstrap/bench] completed")
+    print(json.dumps(payload["benchmark"], indent=2, ensure_ascii=False))
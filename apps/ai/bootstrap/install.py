@@ -162,6 +162,23 @@ def ensure_llm_model(
     raise RuntimeError(f"[install/llm] Failed to prepare '{repo_id}'. last_error={last_err}")
 
 
+# ------------------------------
+# faster-whisper 설치/캐시 보장 (CTranslate2)
+# ------------------------------
+def ensure_faster_whisper_model(model_size: str) -> None:
+    """faster-whisper의 download_model을 호출하여 CTranslate2 변환 모델 캐시를 보장."""
+    try:
+        faster_whisper = importlib.import_module("faster_whisper")
+    except ImportError as e:
+        raise RuntimeError(
+            "faster-whisper 패키지가 필요합니다. `pip install faster-whisper`"
+        ) from e
+
+    print(f"[install/faster-whisper] ensuring '{model_size}'")
+    faster_whisper.download_model(model_size)
+    print(f"[install/faster-whisper] ready: {model_size}")
+
+
 # ------------------------------
 # 일괄 설치
 # ------------------------------
@@ -169,8 +186,12 @@ def install_all(models: dict, base_dir_unused=None) -> None:
     """
     pick_models() 반환 딕셔너리를 기반으로 전체 모델 캐시 보장.
     whisper, llm_cat, llm_sum, diar 키를 포함해야 함.
+    asr_backend가 "faster-whisper"이면 Whisper 대신 CTranslate2 모델을 받는다.
     """
-    ensure_whisper_model(models["whisper"])
+    if models.get("asr_backend") == "faster-whisper":
+        ensure_faster_whisper_model(models["whisper"])
+    else:
+        ensure_whisper_model(models["whisper"])
 
     ensure_llm_model(
         models["llm_cat_repo_id"],
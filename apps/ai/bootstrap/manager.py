@@ -6,6 +6,7 @@
 2) 없으면:
    - 하드웨어 감지:    probe.detect_hardware()
    - 모델 선택:        resolve.pick_models(hw)
+   - 벤치마크 보정:    benchmark.select_models(hw, selected)  (BOOTSTRAP_BENCHMARK=0 이면 생략)
    - 모델 설치/캐시:   install.install_all(models)
    - 결과 기록:        config_json(JSON) 저장
 
@@ -17,19 +18,30 @@
 from __future__ import annotations
 from pathlib import Path
 import json
+import threading
 from typing import Any, Dict
 
 from .probe import detect_hardware
 from .resolve import pick_models
+from .benchmark import benchmark_enabled, select_models
 from .install import install_all
 
+# 작업 스레드·미리보기·배치가 동시에 호출해도 감지/설치는 한 번만 수행
+_lock = threading.Lock()
+
 
 def ensure_models_ready(models_dir: Path | None, config_json: Path) -> Dict[str, Any]:
     """
     최초 실행 시 모델 준비를 보장하고, 결과를 config_json에 기록한다.
     - models_dir 인자는 과거 시그니처 호환용으로 받지만, 실제 설치는 HF/모듈 기본 캐시를 사용한다.
     - config_json이 이미 있으면 로드하여 그대로 반환(멱등).
+    - 프로세스 내 동시 호출은 직렬화되어, 뒤의 호출은 앞의 호출이 기록한 config_json을 읽는다.
     """
+    with _lock:
+        return _prepare_models(config_json)
+
+
+def _prepare_models(config_json: Path) -> Dict[str, Any]:
     # 0) 기존 설정 존재하면 즉시 반환
     if config_json.exists():
         try:
@@ -44,6 +56,11 @@ def ensure_models_ready(models_dir: Path | None, config_json: Path) -> Dict[str,
     # 2) 모델 선택 (사용자 규칙 반영)
     selected = pick_models(hw)
 
+    # 2-1) 로컬 마이크로 벤치마크로 목표 RTF/요약 시간을 만족하는 가장 큰 모델로 보정
+    benchmark = None
+    if benchmark_enabled():
+        selected, benchmark = select_models(hw, selected)
+
     # 3) 설치/캐시 확보 (Whisper/pyannote/LLM)
     #    - install_all 내부에서:
     #       * Whisper → openai-whisper 모듈로 캐시 확보
@@ -57,6 +74,8 @@ def ensure_models_ready(models_dir: Path | None, config_json: Path) -> Dict[str,
         "selected": selected,        # resolve.pick_models() 사양 그대로
         "models_backend": "hf_cache" # 문서화용(모델들은 HF/모듈 기본 캐시에 존재)
     }
+    if benchmark is not None:
+        payload["benchmark"] = benchmark  # 후보별 측정값 + 최종 선택
 
     config_json.parent.mkdir(parents=True, exist_ok=True)
     config_json.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -4,8 +4,13 @@
 - 모든 용량 단위는 'GiB(2^30 bytes)' 기준으로 표기.
 """
 import platform
+from pathlib import Path
+
 import psutil
 
+# 스레드/배치 튜닝(apps/ai/tuning.py)과 bf16 판단(apps/ai/accel.py)에 쓰는 SIMD 플래그
+SIMD_FLAGS = ("sse4_2", "avx", "avx2", "fma", "f16c", "avx512f", "avx512_vnni", "avx512_bf16", "amx_bf16", "amx_int8", "asimd", "neon")
+
 def ram_gib() -> float:
     """현재 시스템 RAM 용량 (GiB 단위, 소수점 한 자리까지 반올림)"""
     total_bytes = psutil.virtual_memory().total
@@ -24,6 +29,26 @@ def cpu_info() -> dict:
         "cpu_logical_cores": psutil.cpu_count(logical=True),
     }
 
+def cpu_simd_flags() -> list:
+    """
+    CPU SIMD 확장 목록 (SIMD_FLAGS 중 지원하는 것만).
+    - Linux: /proc/cpuinfo의 flags(x86) / Features(ARM) 항목
+    - macOS Apple Silicon: arm64는 NEON(asimd)을 항상 지원
+    - 그 외(Windows 등)는 확인 불가 → 빈 목록
+    """
+    try:
+        text = Path("/proc/cpuinfo").read_text(encoding="utf-8", errors="ignore")
+    except OSError:
+        text = ""
+    present = set()
+    for line in text.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip().lower() in ("flags", "features"):
+            present.update(value.split())
+    if not present and platform.machine().lower() in ("arm64", "aarch64"):
+        present.update(("asimd", "neon"))
+    return [flag for flag in SIMD_FLAGS if flag in present]
+
 def gpu_info() -> dict:
     """
     GPU 정보:
@@ -63,6 +88,7 @@ def detect_hardware() -> dict:
       "gpu_name": "NVIDIA RTX 4070",
       "cpu_logical_cores": 16,
       "cpu_physical_cores": 8,
+      "cpu_simd": ["sse4_2", "avx", "avx2", "fma", "f16c"],
       "ram_gib": 31.9,
       "os": {"system": "Windows", "release": "10", "version": "10.0.22621"}
     }
@@ -76,6 +102,7 @@ def detect_hardware() -> dict:
     # CPU
     c = cpu_info()
     hw.update(c)
+    hw["cpu_simd"] = cpu_simd_flags()
 
     # RAM
     hw["ram_gib"] = ram_gib()
@@ -3,6 +3,14 @@
 - 단위는 모두 GiB 기준.
 """
 
+# 요약 LLM 후보 (큰 모델 → 작은 모델). benchmark.select_models()가 이 순서로 내려가며 측정한다.
+LLM_SUM_LADDER: list[tuple[str, str]] = [
+    ("lmstudio-community/DeepSeek-R1-0528-Qwen3-8B-GGUF", "*Q8_0*"),
+    ("lmstudio-community/DeepSeek-R1-0528-Qwen3-8B-GGUF", "*Q4_K_M*"),
+    ("lmstudio-community/Qwen3-4B-Thinking-2507-GGUF", "*Q8_0*"),
+    ("lmstudio-community/Qwen3-4B-Instruct-2507-GGUF", "*Q4_K_M*"),
+]
+
 def pick_models(hw: dict) -> dict:
     """
     hw: {"gpu_cuda": bool, "gpu_vram_gib": float, "ram_gib": float, ...}
@@ -50,8 +58,13 @@ def pick_models(hw: dict) -> dict:
     # === Diarization 모델 (고정) ===
     diar = "pyannote/speaker-diarization-3.1"
 
+    # === ASR 엔진 ===
+    # 기본은 openai-whisper. CPU 전용 노드는 ai.config.json에서 "faster-whisper"(int8)로 바꿀 수 있다.
+    asr_backend = "openai-whisper"
+
     return {
             "whisper": whisper, 
+            "asr_backend": asr_backend,
             "llm_cat_repo_id": llm_cat_repo_id, 
             "llm_cat_allow_pattern": llm_cat_allow_pattern, 
             "llm_sum_repo_id": llm_sum_repo_id, 
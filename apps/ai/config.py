@@ -12,9 +12,13 @@ exposes a few convenience properties for common paths.
 from __future__ import annotations
 
 import json
+import os
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from .profiles import Profile
 
 
 @dataclass
@@ -85,3 +89,23 @@ class Config:
         return self.payload.get("hardware", {})
 
 
+
+    @property
+    def profile(self) -> "Profile":
+        """Processing profile of this run (see :mod:`apps.ai.profiles`)."""
+        from .profiles import Profile, get_profile
+
+        stored = self.payload.get("profile")
+        if stored:
+            return Profile(**{**stored, "temperature": tuple(stored.get("temperature") or (0.0,))})
+        return get_profile(None, self.selected_models)
+
+    @property
+    def asr_backend(self) -> str:
+        """Speech recognition engine (``ASR_BACKEND`` or ``selected['asr_backend']``)."""
+        return os.getenv("ASR_BACKEND") or self.selected_models.get("asr_backend") or "openai-whisper"
+
+    @property
+    def asr_compute_type(self) -> Optional[str]:
+        """CTranslate2 compute type override for ``faster-whisper`` (``None`` = per device)."""
+        return os.getenv("ASR_COMPUTE_TYPE") or self.selected_models.get("asr_compute_type")
@@ -65,6 +65,10 @@ def persist_run(context: StageContext) -> None:
         - ``stt``: list of serialisable transcript segments
         - ``categories``: serialisable categorisation results
         - ``summary``: string summarising the run
+        - ``summary_source``: ``"llm"`` or ``"fallback"`` (raw transcript)
+        - ``refine_token_usage``: think/answer token counts of the summary
+        - ``model_budget``: memory budget report (:mod:`apps.ai.residency`)
+        - ``stage_timings``: run and gate wait seconds per stage
 
     Side Effects
     ------------
@@ -89,12 +93,15 @@ def persist_run(context: StageContext) -> None:
             except Exception:
                 # ignore copy failures
                 pass
-            manifest.append({
+            entry = {
                 "id": chunk.id,
                 "file": dest.name,
                 "start": chunk.start,
                 "end": chunk.end,
-            })
+            }
+            if chunk.speech_map:
+                entry["speech_map"] = chunk.speech_map
+            manifest.append(entry)
         (run_dir / "chunks_manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
 
     # Save diarisation output
@@ -117,8 +124,39 @@ def persist_run(context: StageContext) -> None:
     if speaker_text is not None:
         (run_dir / "speaker-attributed.txt").write_text(str(speaker_text), encoding="utf-8")
 
+    # Save refinement token accounting
+    usage = context.data.get("refine_token_usage")
+    if usage is not None:
+        (run_dir / "refine_usage.json").write_text(json.dumps(usage, indent=2), encoding="utf-8")
+
+    # Save memory budget decisions
+    budget = context.data.get("model_budget")
+    if budget is not None:
+        (run_dir / "model_budget.json").write_text(json.dumps(budget, indent=2), encoding="utf-8")
+
+    # Save per-stage timings
+    timings = context.data.get("stage_timings")
+    if timings:
+        (run_dir / "stage_timings.json").write_text(json.dumps(timings, indent=2), encoding="utf-8")
+
     # Save summary
     summary = context.data.get("summary")
     if summary is not None:
         (run_dir / "summary.txt").write_text(str(summary), encoding="utf-8")
+    source = context.data.get("summary_source")
+    if source is not None:
+        (run_dir / "summary_source.txt").write_text(str(source), encoding="utf-8")
+
+
+def has_llm_summary(run_dir: Path) -> bool:
+    """Whether a completed run in ``run_dir`` has a summary written by the LLM.
+
+    ``summary.txt`` alone is not enough: the refine stage also writes it
+    when it falls back to the raw transcript.
+    """
+    try:
+        source = (run_dir / "summary_source.txt").read_text(encoding="utf-8").strip()
+    except OSError:
+        return False
+    return source == "llm" and (run_dir / "summary.txt").exists()
 
@@ -0,0 +1,120 @@
+"""
+In-memory token buffers for summaries that are still being generated.
+
+The refinement stage publishes summary text into a per-run
+:class:`SummaryStream` while llama.cpp produces it, and the API reads
+the buffer to forward tokens to clients before ``summary.txt`` exists.
+Buffers are kept in a process-wide registry keyed by the normalised run
+identifier. Closed buffers stay readable for a while so late readers
+still receive the full text.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from .storage import normalise_run_identifier
+
+# Number of finished streams kept around for late readers.
+MAX_CLOSED_STREAMS = 64
+
+
+class SummaryStream:
+    """Append-only text buffer with blocking reads."""
+
+    def __init__(self) -> None:
+        self._chunks: list[str] = []
+        self._length = 0
+        self._closed = False
+        self._replaced = False
+        self._condition = threading.Condition()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def replaced(self) -> bool:
+        """Whether :meth:`close` discarded the streamed text for a different final text."""
+        return self._replaced
+
+    def append(self, text: str) -> None:
+        """Publish a piece of generated text."""
+        with self._condition:
+            if not self._chunks:
+                # Drop the whitespace models emit after a closed think block.
+                text = text.lstrip()
+            if self._closed or not text:
+                return
+            self._chunks.append(text)
+            self._length += len(text)
+            self._condition.notify_all()
+
+    def close(self, final_text: Optional[str] = None) -> None:
+        """Mark the stream finished.
+
+        When ``final_text`` is given and differs from what was streamed
+        (for example a fallback summary), the buffer is replaced so
+        readers starting later see the persisted summary.
+        """
+        with self._condition:
+            streamed = "".join(self._chunks)
+            if final_text is not None and final_text.strip() != streamed.strip():
+                if final_text.startswith(streamed):
+                    self._chunks.append(final_text[len(streamed):])
+                else:
+                    self._chunks = [final_text]
+                    self._replaced = True
+                self._length = len(final_text)
+            self._closed = True
+            self._condition.notify_all()
+
+    def read(self, offset: int, timeout: Optional[float] = None) -> Tuple[str, bool]:
+        """Return text after ``offset`` and whether the stream is finished.
+
+        Blocks for up to ``timeout`` seconds while no new text is
+        available. Once :attr:`replaced` is set, offsets from earlier
+        reads no longer line up and callers should re-read :meth:`text`.
+        """
+        with self._condition:
+            if self._length <= offset and not self._closed:
+                self._condition.wait(timeout)
+            text = "".join(self._chunks)
+            return text[offset:], self._closed
+
+    def text(self) -> str:
+        with self._condition:
+            return "".join(self._chunks)
+
+
+_streams: "OrderedDict[str, SummaryStream]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def open_stream(run_id: str) -> SummaryStream:
+    """Create (or reset) the stream for ``run_id``."""
+    key = normalise_run_identifier(run_id)
+    stream = SummaryStream()
+    with _lock:
+        _streams.pop(key, None)
+        _streams[key] = stream
+        _evict_closed()
+    return stream
+
+
+def get_stream(run_id: str) -> Optional[SummaryStream]:
+    """Return the stream for ``run_id`` if one was opened in this process."""
+    try:
+        key = normalise_run_identifier(run_id)
+    except ValueError:
+        return None
+    with _lock:
+        return _streams.get(key)
+
+
+def _evict_closed() -> None:
+    closed = [key for key, stream in _streams.items() if stream.closed]
+    for key in closed[: max(0, len(closed) - MAX_CLOSED_STREAMS)]:
+        _streams.pop(key, None)
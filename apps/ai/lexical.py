@@ -0,0 +1,412 @@
+"""
+Lightweight lexical document-type classifier.
+
+Choosing between 대화록, 강의록 and 회의록 rarely needs a multi-GB
+language model. This module scores the speaker-attributed transcript
+with three cheap signals and combines them into a probability per
+label:
+
+- keyword evidence, counted in a single pass with an Aho-Corasick
+  automaton over a small per-label lexicon;
+- conversational structure derived from the merge stage's
+  ``speaker_index`` and the ``SPEAKER: text`` lines (number of active
+  speakers, dominant speaker share, turn-taking rate);
+- an optional TF-IDF centroid model trained from past pipeline runs.
+
+The categorisation stage only loads llama.cpp when the resulting
+confidence is below its threshold.
+
+Training
+--------
+Labels already written by previous runs can be used to fit the TF-IDF
+model:
+
+.. code-block:: bash
+
+   python -m apps.ai.lexical train
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+DOCUMENT_LABELS: Tuple[str, ...] = ("대화록", "강의록", "회의록")
+MODEL_FILENAME = "lexical_model.json"
+
+# Weighted lexicon per label. Weights reflect how specific a term is to
+# the document type; generic words get lower weights.
+_LEXICON: Dict[str, Dict[str, float]] = {
+    "대화록": {
+        "ㅋㅋ": 1.0, "ㅎㅎ": 1.0, "진짜": 0.5, "대박": 0.8, "어제": 0.4, "주말": 0.6,
+        "밥": 0.5, "놀러": 0.8, "친구": 0.5, "그니까": 0.6, "근데": 0.3, "맞아": 0.5,
+        "chat": 0.6, "conversation": 0.8,
+    },
+    "강의록": {
+        "강의": 1.0, "수업": 1.0, "교수": 0.8, "학생": 0.6, "시험": 0.8, "과제": 0.8,
+        "슬라이드": 1.0, "교재": 1.0, "챕터": 0.8, "정의": 0.5, "공식": 0.6, "예제": 0.8,
+        "증명": 0.8, "이론": 0.5, "오늘 배울": 1.2, "여러분": 0.6, "커리큘럼": 1.0,
+        "카리타지널": 0.5, "lecture": 1.0, "class": 0.4, "course": 0.6,
+    },
+    "회의록": {
+        "회의": 1.0, "회의록": 1.2, "안건": 1.2, "의제": 1.2, "협의": 0.8, "참석자": 1.0,
+        "결정": 0.6, "일정": 0.5, "마감": 0.6, "담당": 0.8, "진행 상황": 1.0, "보고": 0.6,
+        "예산": 0.8, "액션 아이템": 1.2, "다음 회의": 1.2, "agenda": 1.2, "meeting": 1.0,
+        "minutes": 0.8,
+    },
+}
+
+_SPEAKER_LINE = re.compile(r"^\s*([^:\n]{1,40}):\s*(.*)$")
+_WORD = re.compile(r"[\w가-힣]+", re.UNICODE)
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher.
+
+    All patterns are matched in one left-to-right scan of the text,
+    regardless of how many patterns are registered. Overlapping
+    matches are counted.
+    """
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build()
+
+    def _add(self, pattern: str) -> None:
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = nxt
+            node = nxt
+        self._output[node].append(pattern)
+
+    def _build(self) -> None:
+        queue: deque[int] = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._output[nxt].extend(self._output[self._fail[nxt]])
+
+    def count(self, text: str) -> Counter:
+        """Return how often each pattern occurs in ``text``."""
+        counts: Counter = Counter()
+        node = 0
+        for char in text:
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern in self._output[node]:
+                counts[pattern] += 1
+        return counts
+
+
+def _tokens(text: str) -> List[str]:
+    """Word unigrams plus character bigrams (robust to Korean particles)."""
+    features: List[str] = []
+    for word in _WORD.findall(text.lower()):
+        features.append(word)
+        if len(word) > 2:
+            features.extend(f"#{word[i:i + 2]}" for i in range(len(word) - 1))
+    return features
+
+
+def _normalise(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    if norm <= 0.0:
+        return {}
+    return {key: value / norm for key, value in vector.items()}
+
+
+@dataclass
+class TfidfCentroidModel:
+    """Nearest-centroid classifier over sublinear TF-IDF vectors."""
+
+    idf: Dict[str, float] = field(default_factory=dict)
+    centroids: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    temperature: float = 0.1
+    documents: int = 0
+
+    @classmethod
+    def fit(
+        cls,
+        texts: Sequence[str],
+        labels: Sequence[str],
+        *,
+        max_features: int = 20000,
+    ) -> "TfidfCentroidModel":
+        """Fit the model from parallel sequences of texts and labels."""
+        if len(texts) != len(labels):
+            raise ValueError("texts and labels must have the same length.")
+        tokenised = [Counter(_tokens(text)) for text in texts]
+        document_frequency: Counter = Counter()
+        for counts in tokenised:
+            document_frequency.update(counts.keys())
+        vocabulary = [term for term, _ in document_frequency.most_common(max_features)]
+        total = len(tokenised)
+        idf = {term: math.log((1 + total) / (1 + document_frequency[term])) + 1.0 for term in vocabulary}
+
+        model = cls(idf=idf, documents=total)
+        sums: Dict[str, Counter] = {}
+        for counts, label in zip(tokenised, labels):
+            sums.setdefault(label, Counter()).update(model._vectorise(counts))
+        model.centroids = {label: _normalise(dict(vector)) for label, vector in sums.items()}
+        return model
+
+    def _vectorise(self, counts: Mapping[str, int]) -> Dict[str, float]:
+        vector = {
+            term: (1.0 + math.log(count)) * self.idf[term]
+            for term, count in counts.items()
+            if term in self.idf
+        }
+        return _normalise(vector)
+
+    def predict_proba(self, text: str) -> Dict[str, float]:
+        """Return a probability per known label for ``text``."""
+        if not self.centroids:
+            return {}
+        vector = self._vectorise(Counter(_tokens(text)))
+        similarities = {
+            label: sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+            for label, centroid in self.centroids.items()
+        }
+        return _softmax({label: value / self.temperature for label, value in similarities.items()})
+
+    def save(self, path: Path) -> None:
+        payload = {
+            "idf": self.idf,
+            "centroids": self.centroids,
+            "temperature": self.temperature,
+            "documents": self.documents,
+        }
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, ensure_ascii=False), encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: Path) -> "TfidfCentroidModel":
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            idf={str(k): float(v) for k, v in payload.get("idf", {}).items()},
+            centroids={
+                str(label): {str(k): float(v) for k, v in vector.items()}
+                for label, vector in payload.get("centroids", {}).items()
+            },
+            temperature=float(payload.get("temperature", 0.1)),
+            documents=int(payload.get("documents", 0)),
+        )
+
+
+@dataclass
+class LexicalPrediction:
+    """Result of :meth:`LexicalClassifier.predict`."""
+
+    label: str
+    confidence: float
+    scores: Dict[str, float]
+    features: Dict[str, Any] = field(default_factory=dict)
+
+
+class LexicalClassifier:
+    """Combine keyword, speaker-structure and TF-IDF evidence.
+
+    Parameters
+    ----------
+    model : Optional[TfidfCentroidModel]
+        Trained TF-IDF model. Without it only keywords and speaker
+        structure contribute, which yields lower confidences and thus
+        more LLM escalations.
+    """
+
+    def __init__(self, model: Optional[TfidfCentroidModel] = None) -> None:
+        self.model = model
+        self._matcher = AhoCorasick(term.lower() for terms in _LEXICON.values() for term in terms)
+
+    @classmethod
+    def from_root(cls, root_dir: Path) -> "LexicalClassifier":
+        """Create a classifier, loading the trained model if one exists."""
+        path = root_dir / "apps" / "ai" / MODEL_FILENAME
+        model: Optional[TfidfCentroidModel] = None
+        if path.exists():
+            try:
+                model = TfidfCentroidModel.load(path)
+            except Exception as exc:
+                print(f"[Lexical] Failed to load '{path}': {exc}")
+        return cls(model)
+
+    def predict(self, text: str, speaker_index: Optional[Mapping[str, Mapping[str, Any]]] = None) -> LexicalPrediction:
+        lowered = text.lower()
+        logits = {label: 0.0 for label in DOCUMENT_LABELS}
+        # A mild prior towards the conversation label, which is also the
+        # default whenever nothing else is known.
+        logits[DOCUMENT_LABELS[0]] += 0.2
+
+        keyword_scores = self._keyword_scores(lowered)
+        for label, score in keyword_scores.items():
+            logits[label] += math.log1p(score)
+
+        structure = speaker_features(text, speaker_index)
+        for label, score in _structure_scores(structure).items():
+            logits[label] += score
+
+        tfidf: Dict[str, float] = {}
+        if self.model is not None:
+            tfidf = self.model.predict_proba(text)
+            for label, probability in tfidf.items():
+                if label in logits:
+                    logits[label] += 1.5 * math.log(max(probability, 1e-6) * len(tfidf))
+
+        scores = _softmax(logits)
+        label = max(scores, key=scores.get)
+        features: Dict[str, Any] = {"keywords": keyword_scores, **structure}
+        if tfidf:
+            features["tfidf"] = tfidf
+        return LexicalPrediction(label=label, confidence=scores[label], scores=scores, features=features)
+
+    def _keyword_scores(self, lowered: str) -> Dict[str, float]:
+        counts = self._matcher.count(lowered)
+        # Scale by transcript length so long recordings do not saturate.
+        length_factor = max(1.0, len(lowered) / 2000.0)
+        return {
+            label: sum(weight * counts.get(term.lower(), 0) for term, weight in terms.items()) / length_factor
+            for label, terms in _LEXICON.items()
+        }
+
+
+def speaker_features(
+    text: str,
+    speaker_index: Optional[Mapping[str, Mapping[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Derive speaker-count and turn-taking features.
+
+    ``speaker_index`` is the mapping produced by the merge stage
+    (``utterance_count`` and ``total_duration`` per speaker). Speaker
+    changes are counted from consecutive ``SPEAKER: text`` lines.
+    """
+    durations: Dict[str, float] = {}
+    for speaker, entry in (speaker_index or {}).items():
+        if speaker == "UNKNOWN":
+            continue
+        try:
+            durations[speaker] = float(entry.get("total_duration", 0.0))
+        except (TypeError, ValueError, AttributeError):
+            continue
+
+    speakers: List[str] = []
+    for line in text.splitlines():
+        match = _SPEAKER_LINE.match(line)
+        if match and match.group(1).strip() != "UNKNOWN":
+            speakers.append(match.group(1).strip())
+    if not durations and speakers:
+        durations = {speaker: float(count) for speaker, count in Counter(speakers).items()}
+
+    total = sum(durations.values())
+    shares = sorted((value / total for value in durations.values()), reverse=True) if total > 0 else []
+    active = sum(1 for share in shares if share >= 0.05)
+    changes = sum(1 for prev, cur in zip(speakers, speakers[1:]) if prev != cur)
+    return {
+        "active_speakers": active,
+        "dominant_share": shares[0] if shares else 0.0,
+        "turn_rate": changes / max(1, len(speakers) - 1) if speakers else 0.0,
+    }
+
+
+def _structure_scores(features: Mapping[str, Any]) -> Dict[str, float]:
+    """Map speaker-structure features to per-label evidence.
+
+    A single speaker is ambiguous (a monologue or a diarisation
+    fallback), so structure only contributes from two speakers up.
+    """
+    active = int(features.get("active_speakers", 0))
+    dominant = float(features.get("dominant_share", 0.0))
+    turn_rate = float(features.get("turn_rate", 0.0))
+    scores = {label: 0.0 for label in DOCUMENT_LABELS}
+    if active < 2:
+        return scores
+    if dominant >= 0.7:
+        scores["강의록"] += 2.0 * (dominant - 0.7) / 0.3 + 0.5
+    if active >= 3 and dominant < 0.6:
+        scores["회의록"] += 0.5 * min(active - 2, 3)
+    if active == 2 and dominant < 0.7:
+        scores["대화록"] += 0.5 + turn_rate
+    return scores
+
+
+def _softmax(logits: Mapping[str, float]) -> Dict[str, float]:
+    if not logits:
+        return {}
+    peak = max(logits.values())
+    weights = {label: math.exp(value - peak) for label, value in logits.items()}
+    norm = sum(weights.values())
+    return {label: weight / norm for label, weight in weights.items()}
+
+
+def collect_training_data(runs_dir: Path) -> Tuple[List[str], List[str]]:
+    """Gather (transcript, label) pairs from previous pipeline runs.
+
+    A run contributes when it has both ``speaker-attributed.txt`` and a
+    ``categories.json`` labelled by the LLM. Lexical and heuristic labels
+    are skipped so the model does not learn from its own guesses.
+    """
+    texts: List[str] = []
+    labels: List[str] = []
+    for run_dir in sorted(path for path in runs_dir.iterdir() if path.is_dir()):
+        categories_path = run_dir / "categories.json"
+        transcript_path = run_dir / "speaker-attributed.txt"
+        if not categories_path.exists() or not transcript_path.exists():
+            continue
+        try:
+            categories = json.loads(categories_path.read_text(encoding="utf-8"))
+            text = transcript_path.read_text(encoding="utf-8").strip()
+        except Exception as exc:
+            print(f"[Lexical] Skipping '{run_dir.name}': {exc}")
+            continue
+        label = categories.get("document_type")
+        if not text or label not in DOCUMENT_LABELS or categories.get("source") != "llm":
+            continue
+        texts.append(text)
+        labels.append(label)
+    return texts, labels
+
+
+def _train_cli(args: argparse.Namespace) -> None:
+    root_dir = Path(__file__).resolve().parents[2]
+    runs_dir = Path(args.runs_dir) if args.runs_dir else root_dir / "apps" / "ai" / "output"
+    output = Path(args.output) if args.output else root_dir / "apps" / "ai" / MODEL_FILENAME
+    texts, labels = collect_training_data(runs_dir)
+    distribution = Counter(labels)
+    print(f"[Lexical] Collected {len(texts)} labelled run(s) from {runs_dir}: {dict(distribution)}")
+    if len(distribution) < 2:
+        raise SystemExit("[Lexical] At least two document types are required to train the model.")
+    model = TfidfCentroidModel.fit(texts, labels, max_features=args.max_features)
+    model.save(output)
+    print(f"[Lexical] Wrote model with {len(model.idf)} feature(s) to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lexical document-type classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    train = subparsers.add_parser("train", help="Fit the TF-IDF model from past runs")
+    train.add_argument("--runs-dir", type=str, default=None, help="Directory holding run outputs")
+    train.add_argument("--output", type=str, default=None, help="Where to write the model JSON")
+    train.add_argument("--max-features", type=int, default=20000)
+    _train_cli(parser.parse_args())
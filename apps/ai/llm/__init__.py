@@ -0,0 +1,10 @@
+"""
+Shared llama.cpp helpers for the LLM stages.
+
+The categorisation and refinement stages both drive llama.cpp GGUF
+models. Helpers that need to behave identically for both of them
+(prompt rendering, scoring) live in this package, together with the
+optional model server (:mod:`apps.ai.llm.server`), its request
+scheduler (:mod:`apps.ai.llm.scheduler`) and its client
+(:mod:`apps.ai.llm.client`).
+"""
@@ -0,0 +1,131 @@
+"""
+Chat prompt rendering for llama.cpp models.
+
+``Llama.create_chat_completion`` hides the rendered prompt, which makes
+it impossible to score candidate continuations or to resume a
+generation part way through. The helpers in this module render the
+chat template embedded in the GGUF metadata into a plain prompt string
+so callers can work at the token level. Models without an embedded
+template fall back to the ChatML layout used by the Qwen family.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Sequence
+
+_CHATML_TEMPLATE = (
+    "{% for message in messages %}"
+    "<|im_start|>{{ message['role'] }}\n{{ message['content'] }}<|im_end|>\n"
+    "{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def _special_token_text(llama: Any, token_id: Optional[int]) -> str:
+    """Return the text form of a special token such as BOS or EOS."""
+    if token_id is None or token_id < 0:
+        return ""
+    try:
+        return llama.detokenize([token_id], special=True).decode("utf-8", errors="ignore")
+    except TypeError:
+        # Older llama_cpp releases do not accept ``special``.
+        try:
+            return llama.detokenize([token_id]).decode("utf-8", errors="ignore")
+        except Exception:
+            return ""
+    except Exception:
+        return ""
+
+
+def chat_template(llama: Any) -> str:
+    """Return the Jinja chat template stored in the model metadata."""
+    metadata = getattr(llama, "metadata", None) or {}
+    template = metadata.get("tokenizer.chat_template")
+    return template or _CHATML_TEMPLATE
+
+
+def render_chat_prompt(
+    llama: Any,
+    messages: Sequence[Dict[str, str]],
+    *,
+    add_generation_prompt: bool = True,
+    **template_kwargs: Any,
+) -> str:
+    """Render ``messages`` with the model's chat template.
+
+    Parameters
+    ----------
+    llama : Any
+        Loaded ``llama_cpp.Llama`` instance.
+    messages : Sequence[Dict[str, str]]
+        Chat messages with ``role`` and ``content`` keys.
+    add_generation_prompt : bool
+        Append the assistant header so the next token starts the reply.
+    **template_kwargs : Any
+        Extra variables forwarded to the template (for example
+        ``enable_thinking`` for Qwen3 templates).
+
+    Returns
+    -------
+    str
+        The rendered prompt, ready to be tokenised with ``special=True``.
+    """
+    from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+    def _raise(message: str) -> None:
+        raise ValueError(message)
+
+    env = ImmutableSandboxedEnvironment(trim_blocks=True, lstrip_blocks=True)
+    template = env.from_string(chat_template(llama))
+    return template.render(
+        messages=list(messages),
+        add_generation_prompt=add_generation_prompt,
+        bos_token=_special_token_text(llama, _call(llama, "token_bos")),
+        eos_token=_special_token_text(llama, _call(llama, "token_eos")),
+        raise_exception=_raise,
+        **template_kwargs,
+    )
+
+
+def render_chat_prefix(llama: Any, system_prompt: str, **template_kwargs: Any) -> str:
+    """Render everything that precedes the user content.
+
+    The returned text is a prefix of :func:`render_chat_prompt` for any
+    conversation made of this system prompt and one user message, which
+    makes it suitable as a key for prompt state caching.
+    """
+    sentinel = "\u0000user-content\u0000"
+    rendered = render_chat_prompt(
+        llama,
+        [{"role": "system", "content": system_prompt}, {"role": "user", "content": sentinel}],
+        **template_kwargs,
+    )
+    return rendered.split(sentinel, 1)[0]
+
+
+def tokenize_prompt(llama: Any, prompt: str) -> List[int]:
+    """Tokenise a rendered prompt the same way ``create_completion`` does.
+
+    Special tokens are parsed and the model's own BOS policy applies, so
+    the tokens line up with llama.cpp's prefix matching.
+    """
+    data = prompt.encode("utf-8")
+    try:
+        return list(llama.tokenize(data, special=True))
+    except TypeError:
+        return list(llama.tokenize(data))
+
+
+def tokenize_text(llama: Any, text: str) -> List[int]:
+    """Tokenise a continuation (no BOS, special markers treated as text)."""
+    return list(llama.tokenize(text.encode("utf-8"), add_bos=False))
+
+
+def _call(obj: Any, name: str) -> Optional[int]:
+    method = getattr(obj, name, None)
+    if not callable(method):
+        return None
+    try:
+        return int(method())
+    except Exception:
+        return None
@@ -0,0 +1,322 @@
+"""
+Client adapter for the out-of-process LLM server.
+
+With ``LLM_SERVER_URL`` set (``http://127.0.0.1:8765`` or
+``unix:///path/to/llm.sock``) the LLM stages do not load llama.cpp
+models themselves. :func:`connect_llm_server` returns a
+:class:`RemoteLlama` instead, which provides the part of the
+``llama_cpp.Llama`` interface the stages and :mod:`apps.ai.llm.chat`
+use (tokenisation, chat template metadata, ``create_completion`` with
+streaming and ``create_chat_completion``) and forwards label scoring
+(:mod:`apps.ai.llm.scoring`) and system prompt priming
+(:mod:`apps.ai.llm.prompt_cache`) to the server.
+
+Requests go over keep-alive HTTP/1.1 connections that are pooled per
+server and shared by every job in the process. When the server cannot
+be reached the stages fall back to loading the model locally.
+
+``LLM_SERVER_URL=local`` serves the requests from an in-process
+:class:`~apps.ai.llm.server.LLMServer` instead, through
+:class:`LocalTransport`, so concurrent jobs of one API process share a
+single continuously batched model (:mod:`apps.ai.llm.scheduler`). Every
+request carries its job's run id, which the scheduler uses for fair
+ordering between runs.
+"""
+
+from __future__ import annotations
+
+import base64
+import http.client
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+# Generation can take minutes; the socket timeout only bounds silence between chunks.
+_READ_TIMEOUT = 600.0
+_MAX_IDLE_CONNECTIONS = 8
+
+
+def llm_server_url() -> Optional[str]:
+    """``LLM_SERVER_URL`` or ``None`` when models are loaded in-process."""
+    value = (os.getenv("LLM_SERVER_URL") or "").strip()
+    return value or None
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: float) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class ConnectionPool:
+    """Idle keep-alive connections to one server, reused across threads."""
+
+    def __init__(self, url: str) -> None:
+        self.url = url
+        parsed = urlparse(url)
+        self._scheme = parsed.scheme
+        self._socket_path = parsed.path
+        self._host = parsed.hostname or "127.0.0.1"
+        self._port = parsed.port or 8765
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self._scheme == "unix":
+            return _UnixHTTPConnection(self._socket_path, _READ_TIMEOUT)
+        return http.client.HTTPConnection(self._host, self._port, timeout=_READ_TIMEOUT)
+
+    def _take(self) -> Tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _give_back(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < _MAX_IDLE_CONNECTIONS:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> http.client.HTTPResponse:
+        """Send a request; retry once on a fresh connection if a pooled one went stale."""
+        body = json.dumps(payload or {}).encode("utf-8")
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(body))}
+        while True:
+            conn, reused = self._take()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            response.pool_connection = conn  # type: ignore[attr-defined]
+            return response
+
+    def finish(self, response: http.client.HTTPResponse) -> None:
+        """Return the response's connection to the pool once it is fully read."""
+        conn = getattr(response, "pool_connection", None)
+        if conn is None:
+            return
+        if response.isclosed() and not response.will_close:
+            self._give_back(conn)
+        else:
+            conn.close()
+
+    def call(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.request("POST", path, payload)
+        try:
+            data = json.loads(response.read().decode("utf-8") or "{}")
+        finally:
+            self.finish(response)
+        if response.status != 200:
+            raise RuntimeError(f"LLM server error {response.status}: {data.get('error', data)}")
+        return data
+
+    def stream(self, path: str, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Yield the newline-delimited JSON objects of a streamed response."""
+        response = self.request("POST", path, payload)
+        try:
+            if response.status != 200:
+                data = json.loads(response.read().decode("utf-8") or "{}")
+                raise RuntimeError(f"LLM server error {response.status}: {data.get('error', data)}")
+            for line in iter(response.readline, b""):
+                line = line.strip()
+                if line:
+                    yield json.loads(line.decode("utf-8"))
+        finally:
+            if not response.isclosed():
+                # Abandoned mid-stream (e.g. think budget reached): the connection cannot be reused.
+                response.close()
+                conn = getattr(response, "pool_connection", None)
+                if conn is not None:
+                    conn.close()
+            else:
+                self.finish(response)
+
+
+class LocalTransport:
+    """Calls an in-process :class:`~apps.ai.llm.server.LLMServer` directly."""
+
+    url = "local"
+
+    def __init__(self, server: Any) -> None:
+        self._server = server
+
+    def call(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._server.handle(path, payload)
+
+    def stream(self, path: str, payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        return self._server.handle(path, payload)
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def connection_pool(url: str) -> ConnectionPool:
+    with _pools_lock:
+        pool = _pools.get(url)
+        if pool is None:
+            pool = _pools[url] = ConnectionPool(url)
+        return pool
+
+
+class RemoteLlama:
+    """``llama_cpp.Llama`` stand-in backed by the LLM server.
+
+    Parameters
+    ----------
+    pool : ConnectionPool or LocalTransport
+        Connections to the server.
+    model_path : Path
+        GGUF file; the server loads it on first use.
+    n_ctx : int
+        Context length the stage expects.
+    owner : str
+        Run id sent with every request for fair scheduling.
+    """
+
+    remote = True
+
+    def __init__(self, pool: Any, model_path: Path, n_ctx: int, owner: str = "anonymous") -> None:
+        self.url = pool.url
+        self._pool = pool
+        self.model_path = str(model_path)
+        self._n_ctx = n_ctx
+        self.owner = owner
+        self.prefix: Optional[str] = None
+        self._detokenized: Dict[Tuple[Tuple[int, ...], bool], bytes] = {}
+        info = self._call("/v1/info", {})
+        self.metadata: Dict[str, Any] = info.get("metadata") or {}
+        self._token_bos = int(info.get("token_bos", -1))
+        self._token_eos = int(info.get("token_eos", -1))
+        self._n_vocab = int(info.get("n_vocab", 0))
+
+    def _payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"model_path": self.model_path, "n_ctx": self._n_ctx, "owner": self.owner, **payload}
+
+    def _call(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._pool.call(path, self._payload(payload))
+
+    # ------------------------------------------------------------------
+    # Model information and tokenisation
+    # ------------------------------------------------------------------
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def n_vocab(self) -> int:
+        return self._n_vocab
+
+    def token_bos(self) -> int:
+        return self._token_bos
+
+    def token_eos(self) -> int:
+        return self._token_eos
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        data = self._call("/v1/tokenize", {"text": text.decode("utf-8"), "add_bos": add_bos, "special": special})
+        return list(data["tokens"])
+
+    def detokenize(self, tokens: Sequence[int], special: bool = False) -> bytes:
+        key = (tuple(tokens), special)
+        if key not in self._detokenized:
+            data = self._call("/v1/detokenize", {"tokens": list(tokens), "special": special})
+            self._detokenized[key] = base64.b64decode(data["bytes"])
+        return self._detokenized[key]
+
+    # ------------------------------------------------------------------
+    # Prompt state
+    # ------------------------------------------------------------------
+    def prime_prefix(self, prefix_text: str) -> str:
+        """Have the server restore ``prefix_text`` from its prompt cache before each request."""
+        self.prefix = prefix_text
+        return "remote"
+
+    def reset(self) -> None:
+        """Server slots manage their own state."""
+
+    def close(self) -> None:
+        """Connections are pooled per server and stay open."""
+
+    # ------------------------------------------------------------------
+    # Inference
+    # ------------------------------------------------------------------
+    def create_completion(
+        self,
+        prompt: str,
+        max_tokens: Optional[int] = 16,
+        temperature: float = 0.8,
+        stream: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        payload = self._payload({
+            "prompt": prompt,
+            "prefix": self.prefix,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "stream": stream,
+            "options": kwargs,
+        })
+        if stream:
+            return self._pool.stream("/v1/completion", payload)
+        return self._pool.call("/v1/completion", payload)
+
+    def create_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None,
+        grammar: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Dict[str, Any]:
+        return self._call("/v1/chat", {
+            "messages": messages,
+            "prefix": self.prefix,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "grammar": grammar,
+            "options": kwargs,
+        })
+
+    def score_labels(self, messages: List[Dict[str, str]], labels: List[str]) -> Dict[str, Any]:
+        """Label log-likelihood scoring on the server (:func:`apps.ai.llm.scoring.score_labels`)."""
+        return self._call("/v1/score", {"messages": messages, "labels": labels, "prefix": self.prefix})
+
+
+def connect_llm_server(model_path: Path, n_ctx: int, owner: str = "anonymous", config: Optional[Any] = None) -> Optional[RemoteLlama]:
+    """Return a :class:`RemoteLlama` for ``model_path``, or ``None`` to load locally.
+
+    ``None`` is returned when ``LLM_SERVER_URL`` is unset or the server
+    does not answer. ``config`` is needed for ``LLM_SERVER_URL=local``.
+    """
+    url = llm_server_url()
+    if url is None:
+        return None
+    try:
+        if url == "local":
+            if config is None:
+                return None
+            from .server import local_server
+
+            return RemoteLlama(LocalTransport(local_server(config)), model_path, n_ctx, owner)
+        return RemoteLlama(connection_pool(url), model_path, n_ctx, owner)
+    except Exception as exc:
+        print(f"[LLMClient] LLM server at {url} unavailable ({exc}); loading the model per job.")
+        return None
@@ -0,0 +1,196 @@
+"""
+System-prompt state cache for llama.cpp models.
+
+Every categorisation and refinement call starts with the same system
+prompt from ``apps/ai/sysprompt``. This module evaluates that prefix
+once, snapshots the llama.cpp state (KV cache plus token history) and
+restores the snapshot on later calls, so only the user content has to
+be evaluated. Snapshots are keyed on the model path, a hash of the
+rendered prefix, ``n_ctx`` and the llama_cpp version, and are kept in
+memory and, optionally, on disk so they survive process restarts.
+
+After :meth:`PromptPrefixCache.prime` returns, ``create_completion`` and
+``create_chat_completion`` reuse the restored tokens automatically
+through llama.cpp's prefix matching. Code that drives ``Llama.eval``
+directly should use :func:`eval_with_prefix_reuse`.
+
+Configuration
+-------------
+``LLM_PROMPT_CACHE``
+    ``disk`` (default), ``memory`` or ``off``.
+``LLM_PROMPT_CACHE_GIB``
+    Upper bound for the on-disk cache (default 4 GiB). The least
+    recently used snapshots are removed first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from .chat import tokenize_prompt
+
+_MODES: tuple[str, ...] = ("disk", "memory", "off")
+_DEFAULT_DISK_GIB = 4.0
+_MAX_MEMORY_ENTRIES = 8
+
+
+class PromptPrefixCache:
+    """Memory and disk cache of llama.cpp states after a prompt prefix.
+
+    Parameters
+    ----------
+    cache_dir : Optional[Path]
+        Directory for persisted snapshots. ``None`` keeps the cache in
+        memory only.
+    max_disk_bytes : int
+        Size bound for ``cache_dir``.
+    """
+
+    def __init__(self, cache_dir: Optional[Path], max_disk_bytes: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @staticmethod
+    def key(model_path: str, prefix_text: str, n_ctx: int) -> str:
+        try:
+            import llama_cpp  # type: ignore
+
+            version = str(getattr(llama_cpp, "__version__", ""))
+        except ImportError:
+            version = ""
+        digest = hashlib.sha256(prefix_text.encode("utf-8")).hexdigest()
+        raw = "\n".join([str(Path(model_path).resolve()), digest, str(n_ctx), version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+    def prime(self, llama: Any, prefix_text: str) -> str:
+        """Load the state for ``prefix_text`` into ``llama``.
+
+        Returns ``"memory"`` or ``"disk"`` on a cache hit and ``"miss"``
+        when the prefix had to be evaluated (the resulting state is then
+        stored for the next call). For a model served by the LLM server
+        the prefix is sent along with its requests and ``"remote"`` is
+        returned.
+        """
+        remote_prime = getattr(llama, "prime_prefix", None)
+        if callable(remote_prime):
+            # The LLM server restores the prefix in its own slots (:mod:`apps.ai.llm.server`).
+            return remote_prime(prefix_text)
+        key = self.key(str(getattr(llama, "model_path", "")), prefix_text, int(llama.n_ctx()))
+        with self._lock:
+            state = self._memory.get(key)
+            if state is not None:
+                self._memory.move_to_end(key)
+        if state is not None:
+            llama.load_state(state)
+            self.stats["memory_hits"] += 1
+            return "memory"
+
+        state = self._read_disk(key)
+        if state is not None:
+            llama.load_state(state)
+            self._remember(key, state)
+            self.stats["disk_hits"] += 1
+            return "disk"
+
+        tokens = tokenize_prompt(llama, prefix_text)
+        llama.reset()
+        llama.eval(tokens)
+        state = llama.save_state()
+        self._remember(key, state)
+        self._write_disk(key, state)
+        self.stats["misses"] += 1
+        return "miss"
+
+    def _remember(self, key: str, state: Any) -> None:
+        with self._lock:
+            self._memory[key] = state
+            self._memory.move_to_end(key)
+            while len(self._memory) > _MAX_MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Any]:
+        if self.cache_dir is None:
+            return None
+        path = self.cache_dir / f"{key}.state"
+        if not path.exists():
+            return None
+        try:
+            with path.open("rb") as handle:
+                state = pickle.load(handle)
+            os.utime(path)
+            return state
+        except Exception as exc:
+            print(f"[PromptCache] Discarding unreadable snapshot '{path.name}': {exc}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def _write_disk(self, key: str, state: Any) -> None:
+        if self.cache_dir is None:
+            return
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f"{key}.state.tmp"
+            with tmp_path.open("wb") as handle:
+                pickle.dump(state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            tmp_path.replace(self.cache_dir / f"{key}.state")
+            self._trim_disk()
+        except Exception as exc:
+            print(f"[PromptCache] Failed to persist prompt state: {exc}")
+
+    def _trim_disk(self) -> None:
+        assert self.cache_dir is not None
+        files = sorted(self.cache_dir.glob("*.state"), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in files)
+        while files and total > self.max_disk_bytes:
+            oldest = files.pop(0)
+            total -= oldest.stat().st_size
+            oldest.unlink(missing_ok=True)
+
+
+def eval_with_prefix_reuse(llama: Any, tokens: Sequence[int]) -> int:
+    """Evaluate ``tokens`` while keeping the longest already evaluated prefix.
+
+    Returns the number of tokens that did not need to be evaluated.
+    """
+    tokens = list(tokens)
+    reused = 0
+    for evaluated, token in zip(llama.input_ids[: llama.n_tokens], tokens[:-1]):
+        if int(evaluated) != token:
+            break
+        reused += 1
+    llama.n_tokens = reused
+    llama.eval(tokens[reused:])
+    return reused
+
+
+_shared_cache: Optional[PromptPrefixCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_prompt_cache(root_dir: Path) -> Optional[PromptPrefixCache]:
+    """Return the process-wide cache, or ``None`` when caching is off."""
+    global _shared_cache
+    mode = (os.getenv("LLM_PROMPT_CACHE") or _MODES[0]).strip().lower()
+    if mode not in _MODES:
+        print(f"[PromptCache] Invalid LLM_PROMPT_CACHE='{mode}'; using '{_MODES[0]}'.")
+        mode = _MODES[0]
+    if mode == "off":
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            cache_dir = root_dir / "apps" / "ai" / "cache" / "prompt_state" if mode == "disk" else None
+            try:
+                limit_gib = float(os.getenv("LLM_PROMPT_CACHE_GIB") or _DEFAULT_DISK_GIB)
+            except ValueError:
+                limit_gib = _DEFAULT_DISK_GIB
+            _shared_cache = PromptPrefixCache(cache_dir, int(limit_gib * (1024 ** 3)))
+        return _shared_cache
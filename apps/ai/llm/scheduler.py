@@ -0,0 +1,242 @@
+"""
+Continuous batching scheduler for llama.cpp requests.
+
+Without it, a model serves one request at a time: when several
+materials reach the summary stage together they are generated one after
+another. :class:`LLMScheduler` queues the categorisation and summary
+requests of every active run and serves them on a batch of llama.cpp
+contexts on one GGUF file (sharing its memory-mapped weights on CPU;
+each context offloads its own copy to the GPU):
+
+- each context decodes its own sequence on a worker thread; llama.cpp
+  releases the GIL while evaluating, so the sequences advance in
+  parallel and aggregate tokens/s grows with the number of contexts;
+- admission is continuous: a queued request starts as soon as any
+  sequence finishes instead of waiting for a whole batch;
+- ordering is fair across runs: requests are queued per owner (the run
+  id) and owners are served round-robin, so a run submitting many
+  requests cannot starve the others;
+- every request's ``max_tokens`` is capped at ``max_request_tokens``.
+
+llama-cpp-python's high-level API has no multi-sequence decode on a
+single context, so the batch is made of contexts (``LLM_SERVER_SLOTS``).
+"""
+
+from __future__ import annotations
+
+import concurrent.futures
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+_END = object()
+
+
+class _Request:
+    def __init__(self, owner: str, fn: Callable[[Any], Any], streaming: bool) -> None:
+        self.owner = owner
+        self.fn = fn
+        self.future: "concurrent.futures.Future[Any]" = concurrent.futures.Future()
+        self.chunks: Optional["queue.Queue[Any]"] = queue.Queue() if streaming else None
+        self.cancelled = threading.Event()
+        self.enqueued = time.perf_counter()
+
+
+class LLMScheduler:
+    """Fair, continuously admitting request queue over ``slots`` contexts.
+
+    Parameters
+    ----------
+    name : str
+        Model name used in logs.
+    slots : int
+        Contexts, i.e. sequences decoded in parallel.
+    create : Callable[[], Any]
+        Creates one ``llama_cpp.Llama`` context. The first context is
+        created immediately, the others when their worker first gets a
+        request.
+    max_request_tokens : Optional[int]
+        Cap applied by :meth:`cap_tokens`.
+    """
+
+    def __init__(self, name: str, slots: int, create: Callable[[], Any], max_request_tokens: Optional[int] = None) -> None:
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_request_tokens = max_request_tokens
+        self._create = create
+        self._contexts: List[Optional[Any]] = [create()] + [None] * (self.slots - 1)
+        self._queues: "OrderedDict[str, Deque[_Request]]" = OrderedDict()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._running = 0
+        self.last_used = time.time()
+        self.stats: Dict[str, float] = {"served": 0, "failed": 0, "wait_seconds": 0.0}
+        self._workers = [
+            threading.Thread(target=self._work, args=(index,), name=f"llm-slot-{index}", daemon=True)
+            for index in range(self.slots)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def primary(self) -> Any:
+        """The first context; tokenisation only reads the shared vocabulary."""
+        return self._contexts[0]
+
+    def cap_tokens(self, max_tokens: Optional[int]) -> Optional[int]:
+        """Apply the per-request token limit to ``max_tokens``."""
+        if self.max_request_tokens is None:
+            return max_tokens
+        if max_tokens is None or max_tokens <= 0:
+            return self.max_request_tokens
+        return min(max_tokens, self.max_request_tokens)
+
+    # ------------------------------------------------------------------
+    # Submission
+    # ------------------------------------------------------------------
+    def _enqueue(self, owner: str, fn: Callable[[Any], Any], streaming: bool) -> _Request:
+        request = _Request(owner, fn, streaming)
+        self.last_used = time.time()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Scheduler for '{self.name}' is closed")
+            self._queues.setdefault(owner, deque()).append(request)
+            self._cond.notify()
+        return request
+
+    def submit(self, owner: str, fn: Callable[[Any], Any]) -> Any:
+        """Run ``fn(llama)`` on the next free context and return its result."""
+        return self._enqueue(owner, fn, streaming=False).future.result()
+
+    def stream(self, owner: str, fn: Callable[[Any], Iterator[Any]]) -> Iterator[Any]:
+        """Run the generator ``fn(llama)`` on a context and yield its items.
+
+        Closing the returned iterator early stops the generation and
+        frees the context.
+        """
+        request = self._enqueue(owner, fn, streaming=True)
+        assert request.chunks is not None
+        try:
+            while True:
+                item = request.chunks.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            request.cancelled.set()
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+    def _next(self) -> Optional[_Request]:
+        """Pop the oldest request of the next owner in round-robin order."""
+        with self._cond:
+            while not self._closed and not self._queues:
+                self._cond.wait()
+            if self._closed:
+                return None
+            owner, pending = next(iter(self._queues.items()))
+            request = pending.popleft()
+            # Move the owner behind the others; drop it when it has nothing left.
+            del self._queues[owner]
+            if pending:
+                self._queues[owner] = pending
+            self._running += 1
+            return request
+
+    def _work(self, index: int) -> None:
+        try:
+            while True:
+                request = self._next()
+                if request is None:
+                    return
+                try:
+                    if self._contexts[index] is None:
+                        self._contexts[index] = self._create()
+                    self._run(self._contexts[index], request)
+                except BaseException as exc:
+                    self._fail(request, exc)
+                finally:
+                    with self._cond:
+                        self._running -= 1
+        finally:
+            # Only this worker generates on its context, so it frees it once it has stopped.
+            llama, self._contexts[index] = self._contexts[index], None
+            close = getattr(llama, "close", None)
+            if callable(close):
+                close()
+
+    def _count(self, key: str, value: float = 1) -> None:
+        with self._cond:
+            self.stats[key] += value
+
+    def _run(self, llama: Any, request: _Request) -> None:
+        self._count("wait_seconds", time.perf_counter() - request.enqueued)
+        if request.chunks is None:
+            request.future.set_result(request.fn(llama))
+            self._count("served")
+            return
+        generator = request.fn(llama)
+        try:
+            for chunk in generator:
+                if request.cancelled.is_set():
+                    break
+                request.chunks.put(chunk)
+        finally:
+            close = getattr(generator, "close", None)
+            if callable(close):
+                close()
+        request.chunks.put(_END)
+        request.future.set_result(None)
+        self._count("served")
+
+    def _fail(self, request: _Request, exc: BaseException) -> None:
+        self._count("failed")
+        if request.chunks is not None:
+            request.chunks.put(exc)
+        if not request.future.done():
+            request.future.set_exception(exc)
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+    def idle(self) -> bool:
+        with self._cond:
+            return not self._queues and not self._running
+
+    def describe(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = {owner: len(pending) for owner, pending in self._queues.items()}
+            running = self._running
+            stats = dict(self.stats)
+        served = int(stats["served"])
+        return {
+            "model": self.name,
+            "slots": self.slots,
+            "contexts": sum(1 for context in self._contexts if context is not None),
+            "running": running,
+            "queued": queued,
+            "served": served,
+            "failed": int(stats["failed"]),
+            "mean_wait_seconds": round(stats["wait_seconds"] / served, 3) if served else 0.0,
+            "max_request_tokens": self.max_request_tokens,
+        }
+
+    def close(self) -> None:
+        """Stop the workers after their current request; each frees its context as it exits."""
+        with self._cond:
+            self._closed = True
+            abandoned = [request for pending in self._queues.values() for request in pending]
+            self._queues.clear()
+            self._cond.notify_all()
+        for request in abandoned:
+            self._fail(request, RuntimeError(f"Scheduler for '{self.name}' closed"))
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join(timeout=30)
+                if worker.is_alive():
+                    print(f"[LLMScheduler] '{self.name}' {worker.name} is still generating; it frees its context when done.")
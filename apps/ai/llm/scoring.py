@@ -0,0 +1,75 @@
+"""
+Label scoring with llama.cpp logits.
+
+Scores a fixed set of candidate continuations by their log-likelihood
+after a rendered chat prompt, without generating text. Used by
+:class:`~apps.ai.pipeline.stages.categorize_llm.CategorizeLLMStage` and,
+for clients of the LLM server, by :mod:`apps.ai.llm.server`.
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Sequence
+
+from .chat import render_chat_prompt, tokenize_prompt, tokenize_text
+from .prompt_cache import eval_with_prefix_reuse
+
+
+def score_labels(llama: Any, messages: List[Dict[str, str]], labels: Sequence[str]) -> Dict[str, Any]:
+    """Score each candidate label by its log-likelihood after the prompt.
+
+    The rendered prompt is evaluated once, reusing any cached system
+    prompt state. Each label is then scored token by token on top of
+    that shared prefix; between labels the context is rewound to the
+    end of the prompt, so only the few label tokens are re-evaluated.
+    A remote model (:class:`~apps.ai.llm.client.RemoteLlama`) scores on
+    the server instead.
+    """
+    remote = getattr(llama, "score_labels", None)
+    if callable(remote):
+        return remote(messages, list(labels))
+
+    prompt_tokens = tokenize_prompt(llama, render_chat_prompt(llama, messages))
+    eval_with_prefix_reuse(llama, prompt_tokens)
+    prefix_length = llama.n_tokens
+    prefix_logits = last_logits(llama)
+
+    log_likelihoods: Dict[str, float] = {}
+    for label in labels:
+        label_tokens = tokenize_text(llama, label)
+        llama.n_tokens = prefix_length
+        logits = prefix_logits
+        total = 0.0
+        for index, token in enumerate(label_tokens):
+            total += log_softmax_at(logits, token)
+            if index + 1 < len(label_tokens):
+                llama.eval([token])
+                logits = last_logits(llama)
+        log_likelihoods[label] = total
+    llama.n_tokens = prefix_length
+
+    peak = max(log_likelihoods.values())
+    weights = {label: math.exp(value - peak) for label, value in log_likelihoods.items()}
+    norm = sum(weights.values())
+    scores = {label: weight / norm for label, weight in weights.items()}
+    label = max(scores, key=scores.get)
+    return {"label": label, "confidence": scores[label], "scores": scores, "method": "logits"}
+
+
+def last_logits(llama: Any) -> Any:
+    """Copy the logits produced for the most recently evaluated token."""
+    import llama_cpp  # type: ignore
+    import numpy as np
+
+    pointer = llama_cpp.llama_get_logits(llama.ctx)
+    return np.ctypeslib.as_array(pointer, shape=(llama.n_vocab(),)).astype(np.float64)
+
+
+def log_softmax_at(logits: Any, token: int) -> float:
+    """Return ``log_softmax(logits)[token]`` computed in a stable way."""
+    import numpy as np
+
+    values = np.asarray(logits, dtype=np.float64)
+    peak = float(values.max())
+    return float(values[token] - peak - np.log(np.exp(values - peak).sum()))
@@ -0,0 +1,571 @@
+"""
+Out-of-process llama.cpp inference server.
+
+Every pipeline process otherwise loads its own GGUF models, so several
+uvicorn or queue workers multiply the memory used by the LLMs. This
+server holds the models once and serves the requests of every worker
+(:mod:`apps.ai.llm.client`; set ``LLM_SERVER_URL`` in the workers).
+
+Each model is served by an :class:`~apps.ai.llm.scheduler.LLMScheduler`:
+a batch of slots, i.e. independent llama.cpp contexts on the same GGUF
+file. On CPU the slots share the memory-mapped weights and each only
+adds its own K/V cache; with GPU offload every slot uploads its own copy
+of the offloaded weights, so each slot costs a full model in VRAM.
+Requests carry the run id of their job; the scheduler queues them per
+run, admits them round-robin as soon as a slot frees up, and caps each
+request at ``LLM_MAX_REQUEST_TOKENS`` (default 4096, ``0`` for no cap)
+generated tokens. Slots restore the client's system prompt from the
+prompt cache (:mod:`apps.ai.llm.prompt_cache`) before each request.
+
+Models are identified by their GGUF path and context length and loaded
+on first request; requests for other models are served while one loads.
+At most ``LLM_SERVER_MAX_MODELS`` (default 2) are kept; the least
+recently used is dropped when another one is needed and closed once its
+last in-flight request has finished.
+
+Run it with::
+
+    python -m apps.ai.llm.server --port 8765          # http://127.0.0.1:8765
+    python -m apps.ai.llm.server --socket /tmp/llm.sock  # unix:///tmp/llm.sock
+
+``--slots`` (``LLM_SERVER_SLOTS``, default 2) sets the slots per model.
+With ``LLM_SERVER_URL=local`` the same server runs inside the pipeline
+process (:func:`local_server`), so concurrent jobs of one API process
+share the batch; its models are then leased from the process memory
+budget (:mod:`apps.ai.residency`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import concurrent.futures
+import json
+import os
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .prompt_cache import get_prompt_cache
+from .scheduler import LLMScheduler
+from .scoring import score_labels
+
+DEFAULT_PORT = 8765
+DEFAULT_SLOTS = 2
+DEFAULT_MAX_MODELS = 2
+DEFAULT_MAX_REQUEST_TOKENS = 4096
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            print(f"[LLMServer] Invalid {name}='{value}'; using {default}.")
+    return default
+
+
+def max_request_tokens() -> Optional[int]:
+    """``LLM_MAX_REQUEST_TOKENS`` (default 4096); ``None`` when set to 0."""
+    value = os.getenv("LLM_MAX_REQUEST_TOKENS")
+    if not value:
+        return DEFAULT_MAX_REQUEST_TOKENS
+    try:
+        limit = int(value)
+    except ValueError:
+        print(f"[LLMServer] Invalid LLM_MAX_REQUEST_TOKENS='{value}'; using {DEFAULT_MAX_REQUEST_TOKENS}.")
+        return DEFAULT_MAX_REQUEST_TOKENS
+    return limit if limit > 0 else None
+
+
+class LLMServer:
+    """Model schedulers and request handlers, independent of the transport.
+
+    Parameters
+    ----------
+    config : Config
+        Pipeline configuration (hardware overrides, prompt cache root).
+    slots : int
+        Contexts per model.
+    max_models : int
+        Models kept loaded at once.
+    budget : Optional[ModelBudget]
+        When given, each model is leased from it for as long as it is
+        loaded (used by the in-process server).
+    """
+
+    def __init__(self, config: Any, slots: int, max_models: int, budget: Optional[Any] = None) -> None:
+        self.config = config
+        self.slots = slots
+        self.max_models = max_models
+        self.max_request_tokens = max_request_tokens()
+        self._budget = budget
+        self._schedulers: "OrderedDict[Tuple[str, int], LLMScheduler]" = OrderedDict()
+        # Models being loaded (outside the lock), requests in flight per
+        # scheduler, and evicted schedulers waiting for their last request.
+        self._loading: Dict[Tuple[str, int], "concurrent.futures.Future[LLMScheduler]"] = {}
+        self._users: Dict[LLMScheduler, int] = {}
+        self._retired: Set[LLMScheduler] = set()
+        self._lock = threading.Lock()
+        self._cache = get_prompt_cache(config.root_dir)
+        self._hardware: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------------
+    # Models
+    # ------------------------------------------------------------------
+    def _hardware_info(self) -> Dict[str, Any]:
+        from ..tuning import hardware_info
+
+        if self._hardware is None:
+            self._hardware = hardware_info(self.config.hardware)
+        return self._hardware
+
+    def _load(self, model_path: Path, n_ctx: int, device: Optional[str] = None) -> Any:
+        from llama_cpp import Llama  # type: ignore
+
+        from ..tuning import describe_llama_settings, llama_settings
+
+        hardware = self._hardware_info()
+        env_layers = os.getenv("LLAMA_GPU_LAYERS")
+        gpu_layers = int(env_layers) if env_layers else (-1 if hardware.get("gpu_cuda") else 0)
+        if device == "cpu" and hardware.get("gpu_cuda"):
+            # The memory budget placed this model in RAM.
+            gpu_layers = 0
+        settings = llama_settings(hardware, gpu_layers, model_path, n_ctx)
+        started = time.perf_counter()
+        llama = Llama(
+            model_path=str(model_path),
+            n_ctx=n_ctx,
+            n_gpu_layers=gpu_layers,
+            logits_all=False,
+            embedding=False,
+            verbose=False,
+            **settings,
+        )
+        print(
+            f"[LLMServer] Loaded '{model_path.name}' (n_ctx={n_ctx}) in {time.perf_counter() - started:.1f}s "
+            f"({describe_llama_settings(settings)})."
+        )
+        return llama
+
+    def _open(self, path: Path, n_ctx: int) -> LLMScheduler:
+        name = f"{path.name}:{n_ctx}x{self.slots}"
+
+        def load(device: Optional[str]) -> Tuple[LLMScheduler, Optional[str]]:
+            create = lambda: self._load(path, n_ctx, device)  # noqa: E731
+            return LLMScheduler(name, self.slots, create, self.max_request_tokens), device
+
+        if self._budget is None:
+            return load(None)[0]
+        from ..residency import Footprint, gguf_footprint
+
+        def footprint(device: str) -> Footprint:
+            if device == "cuda":
+                # Every slot is its own Llama and uploads its own copy of the offloaded weights.
+                return Footprint(vram_bytes=gguf_footprint(path, n_ctx, device).vram_bytes * self.slots)
+            # On CPU the slots share the memory-mapped weights and only add their K/V caches.
+            return gguf_footprint(path, n_ctx * self.slots, device)
+
+        return self._budget.lease(
+            "llm_server",
+            name,
+            load,
+            footprint,
+            prefer_gpu=bool(self._hardware_info().get("gpu_cuda")),
+            release=LLMScheduler.close,
+        )
+
+    def _close(self, scheduler: LLMScheduler) -> None:
+        if self._budget is None:
+            scheduler.close()
+            return
+        # Handing the lease back lets the budget keep or evict it like any other model.
+        self._budget.end_lease("llm_server", scheduler.name)
+
+    def _acquire(self, model_path: str, n_ctx: int) -> LLMScheduler:
+        """Return the scheduler for the model, loading it if needed; pair with :meth:`_release`.
+
+        The model is loaded outside ``self._lock``; concurrent requests
+        for the same model wait for that load instead of starting another.
+        """
+        key = (model_path, int(n_ctx))
+        path = Path(model_path)
+        while True:
+            with self._lock:
+                scheduler = self._schedulers.get(key)
+                if scheduler is not None:
+                    self._schedulers.move_to_end(key)
+                    self._users[scheduler] = self._users.get(scheduler, 0) + 1
+                    return scheduler
+                loading = self._loading.get(key)
+                if loading is None:
+                    if not path.is_file():
+                        raise FileNotFoundError(f"Model file not found on the server: {model_path}")
+                    loading = self._loading[key] = concurrent.futures.Future()
+                    evicted = self._evict_for(path)
+                    break
+            # Raises the loader's error; otherwise look the scheduler up again.
+            loading.result()
+
+        for old in evicted:
+            self._close(old)
+        try:
+            scheduler = self._open(path, int(n_ctx))
+            if scheduler is None:
+                raise RuntimeError(f"Could not load '{path.name}'")
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[key]
+            loading.set_exception(exc)
+            raise
+        with self._lock:
+            del self._loading[key]
+            self._schedulers[key] = scheduler
+            self._users[scheduler] = 1
+        loading.set_result(scheduler)
+        return scheduler
+
+    def _evict_for(self, path: Path) -> List[LLMScheduler]:
+        """Drop least recently used models to make room; returns those that can be closed now.
+
+        Called with ``self._lock`` held. Schedulers with requests in
+        flight are retired instead and closed by their last :meth:`_release`.
+        """
+        closable: List[LLMScheduler] = []
+        while self._schedulers and len(self._schedulers) + len(self._loading) > self.max_models:
+            (old_path, old_ctx), old = self._schedulers.popitem(last=False)
+            print(f"[LLMServer] Closing '{Path(old_path).name}' (n_ctx={old_ctx}) for '{path.name}'.")
+            if self._users.get(old):
+                self._retired.add(old)
+            else:
+                closable.append(old)
+        return closable
+
+    def _release(self, scheduler: LLMScheduler) -> None:
+        with self._lock:
+            users = self._users.get(scheduler, 0) - 1
+            if users > 0:
+                self._users[scheduler] = users
+                return
+            self._users.pop(scheduler, None)
+            if scheduler not in self._retired:
+                return
+            self._retired.discard(scheduler)
+        self._close(scheduler)
+
+    def _use(self, request: Dict[str, Any], fn: Callable[[LLMScheduler], Any]) -> Any:
+        """Call ``fn(scheduler)`` while holding the request's model."""
+        scheduler = self._acquire(request["model_path"], request["n_ctx"])
+        try:
+            return fn(scheduler)
+        finally:
+            self._release(scheduler)
+
+    def _prime(self, llama: Any, request: Dict[str, Any]) -> Any:
+        prefix = request.get("prefix")
+        if prefix and self._cache is not None:
+            try:
+                self._cache.prime(llama, prefix)
+            except Exception as exc:
+                print(f"[LLMServer] Prompt state cache unavailable ({exc}); evaluating from scratch.")
+                llama.reset()
+        return llama
+
+    def _submit(self, request: Dict[str, Any], fn: Callable[[Any, LLMScheduler], Any]) -> Any:
+        """Queue ``fn(llama, scheduler)`` for the request's owner and wait for the result."""
+        owner = str(request.get("owner") or "anonymous")
+        return self._use(
+            request,
+            lambda scheduler: scheduler.submit(owner, lambda llama: fn(self._prime(llama, request), scheduler)),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            schedulers = list(self._schedulers.values()) + list(self._retired)
+            self._schedulers.clear()
+            self._retired.clear()
+        for scheduler in schedulers:
+            self._close(scheduler)
+
+    # ------------------------------------------------------------------
+    # Operations
+    # ------------------------------------------------------------------
+    def info(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        def describe(scheduler: LLMScheduler) -> Dict[str, Any]:
+            llama = scheduler.primary
+            metadata = getattr(llama, "metadata", None) or {}
+            return {
+                "metadata": {key: value for key, value in metadata.items() if key == "tokenizer.chat_template"},
+                "token_bos": int(llama.token_bos()),
+                "token_eos": int(llama.token_eos()),
+                "n_vocab": int(llama.n_vocab()),
+            }
+
+        return self._use(request, describe)
+
+    def tokenize(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        data = request["text"].encode("utf-8")
+        tokens = self._use(
+            request,
+            lambda scheduler: scheduler.primary.tokenize(
+                data, add_bos=bool(request.get("add_bos", True)), special=bool(request.get("special"))
+            ),
+        )
+        return {"tokens": list(tokens)}
+
+    def detokenize(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        def detokenize(scheduler: LLMScheduler) -> bytes:
+            try:
+                return scheduler.primary.detokenize(request["tokens"], special=bool(request.get("special")))
+            except TypeError:
+                return scheduler.primary.detokenize(request["tokens"])
+
+        return {"bytes": base64.b64encode(self._use(request, detokenize)).decode("ascii")}
+
+    def completion(self, request: Dict[str, Any]) -> Any:
+        options = dict(request.get("options") or {})
+
+        def run(llama: Any, scheduler: LLMScheduler, stream: bool = False) -> Any:
+            return llama.create_completion(
+                request["prompt"],
+                max_tokens=scheduler.cap_tokens(request.get("max_tokens")),
+                temperature=float(request.get("temperature", 0.8)),
+                stream=stream,
+                **options,
+            )
+
+        if not request.get("stream"):
+            return self._submit(request, run)
+        # Load the model before the response headers go out so errors still get a status code.
+        scheduler = self._acquire(request["model_path"], request["n_ctx"])
+        owner = str(request.get("owner") or "anonymous")
+        # The slot (and the model) is held until the client has consumed (or abandoned) the stream.
+        chunks = scheduler.stream(owner, lambda llama: run(self._prime(llama, request), scheduler, stream=True))
+        return _HeldStream(chunks, lambda: self._release(scheduler))
+
+    def chat(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        options = dict(request.get("options") or {})
+        grammar = request.get("grammar")
+        if grammar:
+            from llama_cpp import LlamaGrammar  # type: ignore
+
+            options["grammar"] = LlamaGrammar.from_string(grammar, verbose=False)
+        return self._submit(
+            request,
+            lambda llama, scheduler: llama.create_chat_completion(
+                messages=request["messages"],
+                max_tokens=scheduler.cap_tokens(request.get("max_tokens")),
+                temperature=float(request.get("temperature", 0.2)),
+                **options,
+            ),
+        )
+
+    def score(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self._submit(request, lambda llama, _scheduler: score_labels(llama, request["messages"], request["labels"]))
+
+    def health(self) -> Dict[str, Any]:
+        with self._lock:
+            models = [
+                {
+                    **scheduler.describe(),
+                    "n_ctx": n_ctx,
+                    "idle_seconds": round(time.time() - scheduler.last_used, 1),
+                }
+                for (_path, n_ctx), scheduler in self._schedulers.items()
+            ]
+        return {"status": "ok", "models": models}
+
+    def handle(self, path: str, request: Dict[str, Any]) -> Any:
+        """Dispatch a POST route; a dict result is a JSON body, anything else a stream."""
+        routes: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "/v1/info": self.info,
+            "/v1/tokenize": self.tokenize,
+            "/v1/detokenize": self.detokenize,
+            "/v1/completion": self.completion,
+            "/v1/chat": self.chat,
+            "/v1/score": self.score,
+        }
+        route = routes.get(path)
+        if route is None:
+            raise LookupError(f"Unknown path {path}")
+        return route(request)
+
+
+class _HeldStream:
+    """Iterator over a scheduler stream that releases the model once closed or exhausted."""
+
+    def __init__(self, chunks: Iterator[Dict[str, Any]], release: Callable[[], None]) -> None:
+        self._chunks = chunks
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> "_HeldStream":
+        return self
+
+    def __next__(self) -> Dict[str, Any]:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._chunks, "close", None)
+            if callable(close):
+                close()
+        finally:
+            release()
+
+    def __del__(self) -> None:
+        self.close()
+
+
+_local: Optional[LLMServer] = None
+_local_lock = threading.Lock()
+
+
+def local_server(config: Any) -> LLMServer:
+    """The in-process server shared by every job (``LLM_SERVER_URL=local``)."""
+    global _local
+    with _local_lock:
+        if _local is None:
+            from ..residency import model_budget
+            from ..tuning import hardware_info
+
+            _local = LLMServer(
+                config,
+                _env_int("LLM_SERVER_SLOTS", DEFAULT_SLOTS),
+                _env_int("LLM_SERVER_MAX_MODELS", DEFAULT_MAX_MODELS),
+                budget=model_budget(hardware_info(config.hardware)),
+            )
+        return _local
+
+
+def _handler(server: LLMServer) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps client connections alive between requests.
+        protocol_version = "HTTP/1.1"
+
+        def address_string(self) -> str:
+            return str(self.client_address[0]) if isinstance(self.client_address, tuple) else "unix"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+        def _send_json(self, status: int, data: Any) -> None:
+            body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_stream(self, chunks: Iterator[Dict[str, Any]]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for chunk in chunks:
+                    line = json.dumps(chunk, ensure_ascii=False).encode("utf-8") + b"\n"
+                    self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                    self.wfile.flush()
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # The client stopped reading (e.g. think budget reached); free the slot.
+                self.close_connection = True
+            finally:
+                close = getattr(chunks, "close", None)
+                if callable(close):
+                    close()
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                self._send_json(200, server.health())
+            else:
+                self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length).decode("utf-8") or "{}")
+            except ValueError as exc:
+                self._send_json(400, {"error": f"Invalid JSON: {exc}"})
+                return
+            try:
+                result = server.handle(self.path, request)
+            except LookupError as exc:
+                # Unknown route (404) or a missing request field (KeyError, 400).
+                self._send_json(400 if isinstance(exc, KeyError) else 404, {"error": str(exc)})
+                return
+            except FileNotFoundError as exc:
+                self._send_json(400, {"error": str(exc)})
+                return
+            except Exception as exc:
+                print(f"[LLMServer] {self.path} failed: {exc}")
+                self._send_json(500, {"error": str(exc)})
+                return
+            if isinstance(result, dict):
+                self._send_json(200, result)
+            else:
+                self._send_stream(result)
+
+    return Handler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(config: Any, host: str, port: int, socket_path: Optional[str], slots: int, max_models: int) -> None:
+    """Serve until interrupted."""
+    handler = _handler(LLMServer(config, slots, max_models))
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)
+        httpd: socketserver.BaseServer = _UnixHTTPServer(socket_path, handler)
+        address = f"unix://{socket_path}"
+    else:
+        httpd = ThreadingHTTPServer((host, port), handler)
+        httpd.daemon_threads = True
+        address = f"http://{host}:{port}"
+    print(f"[LLMServer] Serving on {address} with {slots} slot(s) per model; set LLM_SERVER_URL={address} in the workers.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        if socket_path:
+            Path(socket_path).unlink(missing_ok=True)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from ..config import Config
+
+    parser = argparse.ArgumentParser(description="Serve llama.cpp models to the pipeline workers")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", default=None, help="Serve on this Unix socket instead of TCP")
+    parser.add_argument("--slots", type=int, default=None, help="Concurrent contexts per model (default: LLM_SERVER_SLOTS or 2)")
+    args = parser.parse_args(argv)
+    slots = args.slots or _env_int("LLM_SERVER_SLOTS", DEFAULT_SLOTS)
+    serve(
+        Config.load(),
+        args.host,
+        args.port,
+        args.socket,
+        slots,
+        _env_int("LLM_SERVER_MAX_MODELS", DEFAULT_MAX_MODELS),
+    )
+
+
+if __name__ == "__main__":
+    main()
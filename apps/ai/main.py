@@ -14,23 +14,30 @@ Run this module as a script with the path to an input audio file:
    python -m project.apps.ai.ai_main /path/to/audio.wav
 
 The results of the run will be saved under ``/apps/ai/output/<run_id>`` in
-the project root and a summary will be printed to stdout.
+the project root and a summary will be printed to stdout. To process many
+recordings in one process with shared models, use :mod:`apps.ai.batch`.
 """
 
 from __future__ import annotations
 
 import argparse
+import copy
+import dataclasses
+import os
 import time
 from pathlib import Path
 
 # Import here ensures the package is recognised when running as a module.
 from .config import Config
+from .profiles import PROFILE_NAMES, apply_profile
 from .resources import Resources
 from .bootstrap.manager import ensure_models_ready
 from .pipeline.base import StageContext
 from .pipeline.orchestrator import PipelineOrchestrator
 from .pipeline.stages import (
     NormalizeStage,
+    VADStage,
+    PreviewSampleStage,
     DiarizeStage,
     STTStage,
     MergeStage,
@@ -40,6 +47,19 @@ from .pipeline.stages import (
 from .io import storage
 
 
+def full_pipeline_stages() -> list:
+    """Fresh instances of the stages of a full run, in order."""
+    return [
+        NormalizeStage(),
+        VADStage(),
+        DiarizeStage(),
+        STTStage(),
+        MergeStage(),
+        CategorizeLLMStage(),
+        RefineLLMStage(),
+    ]
+
+
 def ai_main(argv: list[str] | None = None) -> None:
     # 1) Project root & config path
     project_root = Path(__file__).resolve().parents[2]
@@ -54,12 +74,15 @@ def ai_main(argv: list[str] | None = None) -> None:
     # 4) Parse CLI
     parser = argparse.ArgumentParser(description="Run the AI audio processing pipeline")
     parser.add_argument("input_file", type=str, help="Path to an input audio or video file")
+    parser.add_argument("--korean-only", action="store_true", help="Skip language detection and transcribe as Korean")
+    parser.add_argument("--profile", choices=PROFILE_NAMES, default=None, help="Speed/quality profile (default: AI_PROFILE or balanced)")
     args = parser.parse_args(argv)
     input_path = Path(args.input_file)
     if not input_path.exists():
         raise FileNotFoundError(f"Input file not found: {input_path}")
 
     # 5) Create resources & context
+    config = apply_profile(config, args.profile)
     resources = Resources(config)
     # Create run id and base directory
     run_id = time.strftime("%Y%m%d%H%M%S")
@@ -71,18 +94,11 @@ def ai_main(argv: list[str] | None = None) -> None:
         resources=resources,
         base_dir=base_dir,
         input_file=input_path,
+        is_korean_only=args.korean_only,
     )
 
     # 6) Stages & run
-    # Initialise stages
-    stages = [
-        NormalizeStage(),
-        DiarizeStage(),
-        STTStage(),
-        MergeStage(),
-        CategorizeLLMStage(),
-        RefineLLMStage(),
-    ]
+    stages = full_pipeline_stages()
     orchestrator = PipelineOrchestrator(stages)
     # Run pipeline
     results = orchestrator.run(context)
@@ -101,7 +117,12 @@ if __name__ == "__main__":
     import sys
     ai_main(sys.argv[1:])
 
-def run_ai_pipeline(file_path: str, job_id: str, is_korean_only: bool = False) -> None:
+def run_ai_pipeline(
+    file_path: str,
+    job_id: str,
+    is_korean_only: bool = False,
+    profile: str | None = None,
+) -> None:
     input_path = Path(file_path)
     if not input_path.exists():
         raise FileNotFoundError(f"Input file not found: {input_path}")
@@ -110,7 +131,7 @@ def run_ai_pipeline(file_path: str, job_id: str, is_korean_only: bool = False) -
     config_path = project_root / "apps" / "ai" / "ai.config.json"
     ensure_models_ready(models_dir=None, config_json=config_path)
 
-    config = Config.load()
+    config = apply_profile(Config.load(), profile)
     resources = Resources(config)
     run_id = storage.normalise_run_identifier(job_id)
     base_dir = storage.resolve_run_directory(config.runs_dir, job_id)
@@ -121,16 +142,10 @@ def run_ai_pipeline(file_path: str, job_id: str, is_korean_only: bool = False) -
         resources=resources,
         base_dir=base_dir,
         input_file=input_path,
+        is_korean_only=is_korean_only,
     )
 
-    stages = [
-        NormalizeStage(),
-        DiarizeStage(),
-        STTStage(),
-        MergeStage(),
-        CategorizeLLMStage(),
-        RefineLLMStage(),
-    ]
+    stages = full_pipeline_stages()
     orchestrator = PipelineOrchestrator(stages)
     results = orchestrator.run(context)
 
@@ -140,3 +155,68 @@ def run_ai_pipeline(file_path: str, job_id: str, is_korean_only: bool = False) -
         print(summary)
     else:
         print("Pipeline completed, but no summary was produced.")
+
+
+def preview_config(config: Config) -> Config:
+    """Copy ``config`` with the ``fast`` profile and a small Whisper model.
+
+    The model comes from ``PREVIEW_WHISPER_MODEL`` or
+    ``selected["whisper_preview"]`` and defaults to ``base``.
+    """
+    config = apply_profile(config, "fast")
+    payload = copy.deepcopy(config.payload)
+    selected = payload.setdefault("selected", {})
+    model = os.getenv("PREVIEW_WHISPER_MODEL") or selected.get("whisper_preview") or "base"
+    selected["whisper"] = model
+    selected["whisper_ko"] = model
+    return dataclasses.replace(config, payload=payload)
+
+
+def run_ai_preview(file_path: str, job_id: str, is_korean_only: bool = False) -> str:
+    """Produce a draft summary from a sample of the recording.
+
+    Transcribes the opening minutes plus a few probes spread across the
+    recording (see :class:`PreviewSampleStage`) with a small Whisper
+    model and no diarisation, then summarises them with the regular LLM
+    stages. Artefacts go to ``<run dir>/preview`` so the full run for
+    the same ``job_id`` is unaffected, and the stages hold the preview
+    gates (:mod:`apps.ai.pipeline.gates`) rather than those of full runs.
+    Returns the draft summary (empty when none was produced).
+    """
+    input_path = Path(file_path)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    project_root = Path(__file__).resolve().parents[2]
+    config_path = project_root / "apps" / "ai" / "ai.config.json"
+    ensure_models_ready(models_dir=None, config_json=config_path)
+
+    config = preview_config(Config.load())
+    resources = Resources(config)
+    run_id = storage.normalise_run_identifier(job_id)
+    base_dir = storage.resolve_run_directory(config.runs_dir, job_id) / "preview"
+
+    context = StageContext(
+        run_id=f"{run_id}-preview",
+        config=config,
+        resources=resources,
+        base_dir=base_dir,
+        input_file=input_path,
+        is_korean_only=is_korean_only,
+    )
+
+    stages = [
+        PreviewSampleStage(),
+        STTStage(),
+        MergeStage(),
+        CategorizeLLMStage(),
+        RefineLLMStage(),
+    ]
+    # Preview gates: the draft must not queue behind full runs' diarisation and transcription.
+    orchestrator = PipelineOrchestrator(stages, lane="preview")
+    orchestrator.run(context)
+
+    summary = str(context.data.get("summary") or "")
+    print(f"=== Draft Summary ({config.selected_models['whisper']}) ===")
+    print(summary or "(none)")
+    return summary
@@ -56,6 +56,9 @@ class StageContext:
     data : Dict[str, Any]
         Mutable mapping storing intermediate results. Keys are agreed
         by convention between stages.
+    is_korean_only : bool
+        The recording is known to be Korean (``Subject.is_korean_only``);
+        stages may skip language detection.
     """
     run_id: str
     config: Config
@@ -63,6 +66,7 @@ class StageContext:
     base_dir: Path
     input_file: Path
     data: Dict[str, Any] = field(default_factory=dict)
+    is_korean_only: bool = False
 
 
 class BaseStage:
@@ -73,9 +77,14 @@ class BaseStage:
     information between stages. If a stage fails it should return a
     :class:`StageResult` with ``success=False`` and set an
     appropriate message.
+
+    ``resource`` names the stage gate (:mod:`apps.ai.pipeline.gates`)
+    held while the stage runs: ``"cpu"``, ``"gpu"``, ``"llm"`` or
+    ``None`` for stages too light to gate.
     """
 
     name: str = "base"
+    resource: Optional[str] = None
 
     def run(self, context: StageContext) -> StageResult:
         raise NotImplementedError
@@ -0,0 +1,147 @@
+"""
+Process-wide stage gates.
+
+Each stage declares the resource it mostly keeps busy through
+:attr:`~apps.ai.pipeline.base.BaseStage.resource`:
+
+``cpu``
+    Decoding, resampling and voice activity detection.
+``gpu``
+    Diarisation and transcription. On CPU-only hosts these stages use
+    every core through torch, so the gate still keeps them apart.
+``llm``
+    The llama.cpp categorisation and summary stages.
+
+:class:`~apps.ai.pipeline.orchestrator.PipelineOrchestrator` holds the
+matching gate while a stage runs. When several materials of a job (or
+several jobs) run concurrently they therefore pipeline through the
+stages: one file is normalised while another is transcribed and a
+third is summarised, but two transcriptions never share the GPU. A job
+then takes about as long as its bottleneck stage instead of the sum of
+all of them.
+
+Gate widths come from ``STAGE_SLOTS_CPU`` (default 2),
+``STAGE_SLOTS_GPU`` (default 1) and ``STAGE_SLOTS_LLM`` (default 1, or
+``LLM_SERVER_SLOTS`` when ``LLM_SERVER_URL`` routes requests to the
+scheduled LLM server, which batches them itself).
+
+Gates belong to a lane. Full runs use the ``main`` lane; quick previews
+(:func:`apps.ai.main.run_ai_preview`) use their own ``preview`` gates,
+``STAGE_SLOTS_PREVIEW`` (default 1) wide per resource, so a draft only
+waits for other previews instead of queueing behind the diarisation and
+transcription of every full run.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+GATE_RESOURCES: tuple[str, ...] = ("cpu", "gpu", "llm")
+GATE_LANES: tuple[str, ...] = ("main", "preview")
+_DEFAULT_SLOTS = {"cpu": 2, "gpu": 1, "llm": 1}
+_DEFAULT_PREVIEW_SLOTS = 1
+
+
+def _gate_slots(resource: str, lane: str = "main") -> int:
+    if lane == "preview":
+        env_name = "STAGE_SLOTS_PREVIEW"
+        default = _DEFAULT_PREVIEW_SLOTS
+    else:
+        env_name = f"STAGE_SLOTS_{resource.upper()}"
+        default = _DEFAULT_SLOTS[resource]
+    if lane == "main" and resource == "llm" and (os.getenv("LLM_SERVER_URL") or "").strip():
+        from ..llm.server import DEFAULT_SLOTS
+
+        default = int(os.getenv("LLM_SERVER_SLOTS") or DEFAULT_SLOTS)
+    value = os.getenv(env_name)
+    if value:
+        try:
+            return max(1, int(value))
+        except ValueError:
+            print(f"[Pipeline] Invalid {env_name}='{value}'; using {default}.")
+    return max(1, default)
+
+
+class StageGate:
+    """A counting semaphore with wait statistics."""
+
+    def __init__(self, resource: str, slots: int) -> None:
+        self.resource = resource
+        self.slots = slots
+        self._semaphore = threading.BoundedSemaphore(slots)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.wait_seconds = 0.0
+
+    @contextlib.contextmanager
+    def hold(self) -> Iterator[float]:
+        """Hold one slot; yields the seconds spent waiting for it."""
+        started = time.perf_counter()
+        with self._lock:
+            self.waiting += 1
+        self._semaphore.acquire()
+        waited = time.perf_counter() - started
+        with self._lock:
+            self.waiting -= 1
+            self.active += 1
+            self.wait_seconds += waited
+        try:
+            yield waited
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._semaphore.release()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "active": self.active,
+                "waiting": self.waiting,
+                "wait_seconds": round(self.wait_seconds, 2),
+            }
+
+
+_gates: Dict[Tuple[str, str], StageGate] = {}
+_gates_lock = threading.Lock()
+
+
+def stage_gate(resource: Optional[str], lane: str = "main") -> Optional[StageGate]:
+    """Return the process-wide gate for ``resource`` in ``lane`` (``None`` for ungated stages)."""
+    if resource is None:
+        return None
+    if resource not in GATE_RESOURCES:
+        raise ValueError(f"Unknown stage resource '{resource}'; expected one of {', '.join(GATE_RESOURCES)}")
+    if lane not in GATE_LANES:
+        raise ValueError(f"Unknown gate lane '{lane}'; expected one of {', '.join(GATE_LANES)}")
+    with _gates_lock:
+        gate = _gates.get((lane, resource))
+        if gate is None:
+            gate = _gates[(lane, resource)] = StageGate(resource, _gate_slots(resource, lane))
+        return gate
+
+
+@contextlib.contextmanager
+def hold_gate(resource: Optional[str], lane: str = "main") -> Iterator[float]:
+    """Hold the gate for ``resource`` in ``lane`` if there is one; yields the wait in seconds."""
+    gate = stage_gate(resource, lane)
+    if gate is None:
+        yield 0.0
+        return
+    with gate.hold() as waited:
+        yield waited
+
+
+def gates_report() -> Dict[str, Dict[str, Any]]:
+    """State of every gate created so far; preview gates are keyed ``preview:<resource>``."""
+    with _gates_lock:
+        gates = dict(_gates)
+    return {
+        resource if lane == "main" else f"{lane}:{resource}": gate.describe()
+        for (lane, resource), gate in gates.items()
+    }
@@ -7,6 +7,13 @@ each stage, collecting and storing results as appropriate. At the
 end of the run it calls into the storage layer to persist the
 accumulated results.
 
+Each stage runs while holding the process-wide gate of its resource
+(:mod:`.gates`), and models are handed back to the memory budget after
+every stage, so concurrent runs pipeline through the stages instead of
+contending for the GPU or waiting on each other's model leases. Preview
+runs pass ``lane="preview"`` and hold separate gates, so a draft is not
+queued behind full runs.
+
 Example
 -------
 >>> from .stages.normalize import NormalizeStage
@@ -19,18 +26,24 @@ Example
 
 from __future__ import annotations
 
+import time
 from pathlib import Path
-from typing import Iterable, List
+from typing import Any, Dict, Iterable, List
 
 from .base import BaseStage, StageContext, StageResult
+from .gates import hold_gate
 from ..io import storage
 
 
 class PipelineOrchestrator:
-    """Execute a series of stages on a given context."""
+    """Execute a series of stages on a given context.
+
+    ``lane`` selects the stage gates (:data:`~.gates.GATE_LANES`).
+    """
 
-    def __init__(self, stages: Iterable[BaseStage]):
+    def __init__(self, stages: Iterable[BaseStage], lane: str = "main"):
         self.stages: List[BaseStage] = list(stages)
+        self.lane = lane
 
     def run(self, context: StageContext) -> List[StageResult]:
         """Run all stages sequentially and persist the results.
@@ -49,23 +62,43 @@ class PipelineOrchestrator:
             skipped and execution stops.
         """
         results: List[StageResult] = []
+        timings: Dict[str, Dict[str, Any]] = {}
+        context.data["stage_timings"] = timings
         # Ensure run directory exists
         context.base_dir.mkdir(parents=True, exist_ok=True)
         # Iterate through the configured stages
-        for stage in self.stages:
-            print(f"[Pipeline] Starting stage '{stage.name}'.")
-            result = stage.run(context)
-            results.append(result)
-            status = "success" if result.success else "failure"
-            print(f"[Pipeline] Stage '{stage.name}' finished with {status}.")
-            if result.message:
-                print(f"[Pipeline] Stage '{stage.name}' message: {result.message}")
-            # Record result in context for potential downstream use
-            context.data[f"{stage.name}_result"] = result.data
-            if not result.success:
-                # Stop execution on error
-                print(f"[Pipeline] Halting pipeline due to failure in stage '{stage.name}'.")
-                break
+        try:
+            for stage in self.stages:
+                with hold_gate(stage.resource, self.lane) as waited:
+                    if waited >= 0.5:
+                        print(f"[Pipeline] Stage '{stage.name}' waited {waited:.1f}s for the {stage.resource} gate.")
+                    print(f"[Pipeline] Starting stage '{stage.name}'.")
+                    started = time.perf_counter()
+                    try:
+                        result = stage.run(context)
+                    finally:
+                        # Let concurrent runs lease this stage's models while this one moves on.
+                        context.resources.close()
+                timings[stage.name] = {
+                    "resource": stage.resource,
+                    "seconds": round(time.perf_counter() - started, 3),
+                    "wait_seconds": round(waited, 3),
+                }
+                results.append(result)
+                status = "success" if result.success else "failure"
+                print(f"[Pipeline] Stage '{stage.name}' finished with {status}.")
+                if result.message:
+                    print(f"[Pipeline] Stage '{stage.name}' message: {result.message}")
+                # Record result in context for potential downstream use
+                context.data[f"{stage.name}_result"] = result.data
+                if not result.success:
+                    # Stop execution on error
+                    print(f"[Pipeline] Halting pipeline due to failure in stage '{stage.name}'.")
+                    break
+        finally:
+            # Hand models back to the memory budget; it keeps what fits warm for the next job.
+            context.resources.close()
+        context.data["model_budget"] = context.resources.budget_report()
         # Persist run artifacts
         storage.persist_run(context)
         print("[Pipeline] Run complete. Results persisted to storage.")
@@ -0,0 +1,218 @@
+"""
+Process-pool helpers for chunk-parallel stages.
+
+CPU-only nodes have many cores, but a single PyTorch model on one chunk
+uses them poorly. Stages can instead fan chunks out to a pool of worker
+processes that each hold their own model and a fixed number of torch
+threads. Chunk audio travels to the workers as PCM in
+:mod:`multiprocessing.shared_memory` rather than being pickled.
+
+Worker counts are derived from :func:`apps.ai.bootstrap.probe.cpu_info`.
+
+Pools are persistent (:class:`WorkerPool`): spawning the workers and
+loading a model in each of them takes seconds per worker, so a pool is
+leased from the memory budget like an in-process model
+(:meth:`apps.ai.resources.Resources.worker_pool`) and kept warm between
+stage calls and jobs.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# Descriptor of an array placed in shared memory: (name, shape, dtype).
+SharedArray = Tuple[str, Tuple[int, ...], str]
+
+
+def share_array(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, SharedArray]:
+    """Copy ``array`` into a new shared memory block.
+
+    The caller owns the returned block and must :func:`release_shared`
+    it once the consumer is done.
+    """
+    array = np.ascontiguousarray(array)
+    block = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, (block.name, tuple(array.shape), array.dtype.str)
+
+
+def attach_array(descriptor: SharedArray) -> np.ndarray:
+    """Return a private copy of a shared array inside a worker."""
+    name, shape, dtype = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        return np.array(np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf), copy=True)
+    finally:
+        block.close()
+
+
+def release_shared(block: shared_memory.SharedMemory) -> None:
+    try:
+        block.close()
+        block.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def plan_workers(
+    jobs: Optional[int] = None,
+    requested: Optional[int] = None,
+    threads_per_worker: int = 4,
+) -> Tuple[int, int]:
+    """Return ``(workers, torch_threads_per_worker)`` for ``jobs`` tasks.
+
+    Without an explicit request the physical cores are split into
+    workers of ``threads_per_worker`` threads each, never exceeding the
+    number of jobs (``None`` sizes a persistent pool for the host).
+    Threads are then spread evenly over the workers.
+    """
+    from ..bootstrap.probe import cpu_info
+
+    info = cpu_info()
+    cores = int(info.get("cpu_physical_cores") or info.get("cpu_logical_cores") or 1)
+    if requested is not None and requested > 0:
+        workers = requested
+    else:
+        workers = max(1, cores // max(1, threads_per_worker))
+    if jobs is not None:
+        workers = min(workers, jobs)
+    workers = max(1, workers)
+    return workers, max(1, cores // workers)
+
+
+def parse_worker_setting(value: Optional[str]) -> Optional[int]:
+    """Interpret a ``*_WORKERS`` setting.
+
+    ``None``/``"auto"`` selects automatic sizing (returns ``None``), an
+    integer selects that many workers; ``0`` or ``1`` disable the pool.
+    """
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value in ("", "auto"):
+        return None
+    return int(value)
+
+
+def map_over_shared_pcm(
+    items: Sequence[T],
+    load_pcm: Callable[[T], Tuple[np.ndarray, int]],
+    task: Callable[..., R],
+    task_args: Callable[[T], tuple],
+    *,
+    executor: Executor,
+    workers: int,
+    max_in_flight: Optional[int] = None,
+) -> List[R]:
+    """Run ``task`` for every item on ``executor`` and keep item order.
+
+    For each item the parent calls ``load_pcm(item)`` to obtain
+    ``(pcm, sample_rate)``, places the PCM in shared memory and submits
+    ``task(descriptor, sample_rate, *task_args(item))``. ``task`` must
+    be a module-level function. At most ``max_in_flight`` chunks
+    (default ``2 * workers``) are held in shared memory at a time.
+    """
+    limit = max_in_flight or 2 * workers
+    results: List[Any] = [None] * len(items)
+    pending: Dict[Future, Tuple[int, shared_memory.SharedMemory]] = {}
+    next_index = 0
+    try:
+        while next_index < len(items) or pending:
+            while next_index < len(items) and len(pending) < limit:
+                item = items[next_index]
+                pcm, sample_rate = load_pcm(item)
+                block, descriptor = share_array(pcm)
+                try:
+                    future = executor.submit(task, descriptor, sample_rate, *task_args(item))
+                except Exception:
+                    release_shared(block)
+                    raise
+                pending[future] = (next_index, block)
+                next_index += 1
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                index, block = pending.pop(future)
+                release_shared(block)
+                results[index] = future.result()
+    finally:
+        for future, (_, block) in pending.items():
+            future.cancel()
+        if pending:
+            # Wait for chunks still being processed before their shared memory goes away.
+            wait(list(pending))
+        for _, block in pending.values():
+            release_shared(block)
+    return results
+
+
+def _ping(delay: float) -> int:
+    time.sleep(delay)
+    return multiprocessing.current_process().pid or 0
+
+
+class WorkerPool:
+    """A persistent ``spawn`` process pool whose workers each hold a model.
+
+    Parameters
+    ----------
+    workers : int
+        Worker processes.
+    threads : int
+        Torch threads per worker (passed to ``initializer`` by the caller).
+    initializer : Callable[..., None]
+        Module-level function that loads the worker's model.
+    initargs : tuple
+        Arguments for ``initializer``.
+    """
+
+    def __init__(self, workers: int, threads: int, initializer: Callable[..., None], initargs: tuple = ()) -> None:
+        self.workers = workers
+        self.threads = threads
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=initargs,
+        )
+
+    def warm(self) -> None:
+        """Start every worker and wait for its model to load.
+
+        Raises ``BrokenProcessPool`` when the initializer fails.
+        """
+        # Tasks submitted while no worker is idle each start a new process.
+        futures = [self._executor.submit(_ping, 0.5) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def map(
+        self,
+        items: Sequence[T],
+        load_pcm: Callable[[T], Tuple[np.ndarray, int]],
+        task: Callable[..., R],
+        task_args: Callable[[T], tuple],
+        max_in_flight: Optional[int] = None,
+    ) -> List[R]:
+        """:func:`map_over_shared_pcm` on this pool."""
+        return map_over_shared_pcm(
+            items,
+            load_pcm,
+            task,
+            task_args,
+            executor=self._executor,
+            workers=self.workers,
+            max_in_flight=max_in_flight,
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
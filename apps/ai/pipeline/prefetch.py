@@ -0,0 +1,99 @@
+"""
+Background prefetch of chunk audio.
+
+Reading and decoding a chunk takes long enough on slow disks or
+compressed inputs that the inference device idles between chunks.
+:func:`prefetch` loads the next chunks on a background thread into a
+bounded queue while the caller runs inference on the current one.
+Decoding releases the GIL (file I/O, ffmpeg subprocesses, libsndfile),
+so a thread is sufficient.
+
+The queue depth comes from ``PREFETCH_DEPTH`` (default 1, i.e. double
+buffering); ``0`` loads synchronously.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+L = TypeVar("L")
+
+DEFAULT_DEPTH = 1
+
+_DONE = object()
+
+
+def prefetch_depth() -> int:
+    """Queue depth from ``PREFETCH_DEPTH``."""
+    env_value = os.getenv("PREFETCH_DEPTH")
+    if env_value:
+        try:
+            return max(0, int(env_value))
+        except ValueError:
+            print(f"[Prefetch] Invalid PREFETCH_DEPTH='{env_value}'; using {DEFAULT_DEPTH}.")
+    return DEFAULT_DEPTH
+
+
+class _Failure:
+    def __init__(self, item: object, error: BaseException) -> None:
+        self.item = item
+        self.error = error
+
+
+def prefetch(
+    items: Iterable[T],
+    load: Callable[[T], L],
+    depth: Optional[int] = None,
+) -> Iterator[Tuple[T, L]]:
+    """Yield ``(item, load(item))`` in order, loading ahead on a thread.
+
+    At most ``depth`` loaded items wait in the queue, so memory stays
+    bounded. An exception raised by ``load`` is re-raised when its item
+    is reached. Closing the iterator early stops the loader.
+    """
+    depth = prefetch_depth() if depth is None else depth
+    if depth <= 0:
+        for item in items:
+            yield item, load(item)
+        return
+
+    buffer: "queue.Queue[object]" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(entry: object) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _worker() -> None:
+        for item in items:
+            try:
+                entry: object = (item, load(item))
+            except BaseException as exc:  # handed to the consumer
+                _put(_Failure(item, exc))
+                return
+            if not _put(entry):
+                return
+        _put(_DONE)
+
+    thread = threading.Thread(target=_worker, name="chunk-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            entry = buffer.get()
+            if entry is _DONE:
+                return
+            if isinstance(entry, _Failure):
+                raise entry.error
+            yield entry  # type: ignore[misc]
+    finally:
+        stop.set()
+        thread.join(timeout=5.0)
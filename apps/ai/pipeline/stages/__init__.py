@@ -5,6 +5,8 @@ easily imported elsewhere without referencing individual files.
 """
 
 from .normalize import NormalizeStage
+from .vad import VADStage
+from .preview import PreviewSampleStage
 from .diarize import DiarizeStage
 from .stt import STTStage
 from .merge import MergeStage
@@ -13,6 +15,8 @@ from .refine_llm import RefineLLMStage
 
 __all__ = [
     "NormalizeStage",
+    "VADStage",
+    "PreviewSampleStage",
     "DiarizeStage",
     "STTStage",
     "MergeStage",
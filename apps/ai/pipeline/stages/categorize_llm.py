@@ -2,23 +2,39 @@
 LLM-powered categorisation stage.
 
 This stage reads the available summary text for the current run and
-uses a llama.cpp model to classify it as one of three document types.
-If the llama.cpp runtime or model cannot be loaded the stage falls
-back to a lightweight keyword heuristic so downstream stages still
-receive a best-effort label.
+classifies it as one of three document types. A lexical classifier
+(:mod:`apps.ai.lexical`) runs first; a llama.cpp model is only loaded
+when its confidence is below ``CATEGORIZE_LEXICAL_THRESHOLD``.
+
+By default the model is not asked to generate text: the log-likelihood
+of each candidate label is scored after a single evaluation of the
+prompt and normalised into a confidence. A grammar-constrained
+completion and the original free-text completion remain available via
+``CATEGORIZE_MODE``. If the llama.cpp runtime or model cannot be
+loaded the stage keeps the lexical prediction so downstream stages
+still receive a best-effort label.
 """
 
 from __future__ import annotations
 
 import os
 import re
+import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 from ..base import BaseStage, StageContext, StageResult
+from ...lexical import LexicalClassifier, LexicalPrediction
+from ...llm.chat import render_chat_prefix
+from ...llm.client import connect_llm_server
+from ...llm.prompt_cache import get_prompt_cache
+from ...llm.scoring import score_labels
 
 _PROMPT_FILENAME = "categorize.txt"
 _CANDIDATE_LABELS: tuple[str, ...] = ("\ub300\ud654\ub85d", "\uac15\uc758\ub85d", "\ud68c\uc758\ub85d")
+_SCORING_MODES: tuple[str, ...] = ("logits", "grammar", "generate")
+_LABEL_GRAMMAR: str = "root ::= " + " | ".join(f'"{label}"' for label in _CANDIDATE_LABELS)
+_DEFAULT_LEXICAL_THRESHOLD = 0.8
 _DEFAULT_PROMPT: str = (
     "\uc774 \ud14d\uc2a4\ud2b8\uac00 \ub300\ud654\ub85d\uc778\uc9c0, \uac15\uc758\ub85d\uc778\uc9c0, "
     "\ud68c\uc758\ub85d\uc778\uc9c0 \ud310\ubcc4\ud574\uc11c \ub300\ud654\ub85d\uc774\uba74 \"\ub300\ud654\ub85d\", "
@@ -33,6 +49,9 @@ class CategorizeLLMStage(BaseStage):
     """Classify the summary into dialogue, lecture or meeting minutes."""
 
     name = "categorize"
+    resource = "llm"
+
+    N_CTX = 4096
 
     def run(self, context: StageContext) -> StageResult:
         summary_text = self._load_summary_text(context)
@@ -43,26 +62,55 @@ class CategorizeLLMStage(BaseStage):
             context.data["document_type"] = default_label
             return StageResult(name=self.name, success=True, data=context.data["categories"], message=message)
 
-        self._release_unused_resources(context)
-        llama = self._load_llama_model(context)
-        if llama is None:
-            label = self._heuristic_label(summary_text)
-            message = "llama_cpp model unavailable; used heuristic classification."
-            source = "heuristic"
+        lexical = self._classify_lexically(context, summary_text)
+        threshold = self._lexical_threshold()
+        confidence: Optional[float] = lexical.confidence
+        scores: Optional[Dict[str, float]] = lexical.scores
+        method: Optional[str] = "lexical"
+        if lexical.confidence >= threshold:
+            label = lexical.label
+            message = None
+            source = "lexical"
         else:
-            label = self._classify_with_llm(context, llama, summary_text)
-            if not label:
-                label = self._heuristic_label(summary_text)
-                message = "LLM classification failed; used heuristic classification."
-                source = "heuristic"
+            print(
+                f"    [CategorizeStage] Lexical confidence {lexical.confidence:.2f} below "
+                f"{threshold:.2f}; escalating to the LLM."
+            )
+            self._release_unused_resources(context)
+            llama = self._load_llama_model(context)
+            prediction = None if llama is None else self._classify_with_llm(context, llama, summary_text)
+            context.resources.end_lease("llm_cat")
+            if prediction is None:
+                label = lexical.label
+                source = "lexical"
+                if llama is None:
+                    message = "llama_cpp model unavailable; used lexical classification."
+                else:
+                    message = "LLM classification failed; used lexical classification."
             else:
+                label = prediction["label"]
+                confidence = prediction.get("confidence")
+                scores = prediction.get("scores")
+                method = prediction.get("method")
                 message = None
                 source = "llm"
 
-        result: Dict[str, str] = {"document_type": label, "source": source}
+        result: Dict[str, Any] = {"document_type": label, "source": source}
+        if method:
+            result["method"] = method
+        if confidence is not None:
+            result["confidence"] = round(confidence, 4)
+        if scores:
+            result["scores"] = {key: round(value, 4) for key, value in scores.items()}
+        result["lexical"] = {
+            "label": lexical.label,
+            "confidence": round(lexical.confidence, 4),
+            "features": lexical.features,
+        }
         context.data["categories"] = result
         context.data["document_type"] = label
-        print(f"[CategorizeStage] Classified summary as '{label}' using {source}.")
+        confidence_note = f" (confidence {confidence:.2f})" if confidence is not None else ""
+        print(f"[CategorizeStage] Classified summary as '{label}' using {source}{confidence_note}.")
         return StageResult(name=self.name, success=True, data=result, message=message)
 
     # ------------------------------------------------------------------
@@ -70,7 +118,12 @@ class CategorizeLLMStage(BaseStage):
     # ------------------------------------------------------------------
 
     def _load_llama_model(self, context: StageContext) -> Optional[Any]:
-        """Initialise a llama.cpp model with GPU preference and CPU fallback."""
+        """Return the llama.cpp model for this stage.
+
+        Uses the LLM server when ``LLM_SERVER_URL`` is set and reachable;
+        otherwise leases the model from the memory budget, loading it
+        with GPU preference and CPU fallback.
+        """
         model_path = self._resolve_model_path(
             context,
             repo_key="llm_cat_repo_id",
@@ -79,6 +132,11 @@ class CategorizeLLMStage(BaseStage):
         if model_path is None:
             return None
 
+        remote = connect_llm_server(model_path, self.N_CTX, owner=context.run_id, config=context.config)
+        if remote is not None:
+            print(f"    [CategorizeStage] Using LLM server at {remote.url} for '{model_path.name}'.")
+            return remote
+
         try:
             from llama_cpp import Llama  # type: ignore
         except ImportError:
@@ -88,50 +146,137 @@ class CategorizeLLMStage(BaseStage):
         gpu_layers = self._determine_gpu_layers(context)
         init_kwargs = {
             "model_path": str(model_path),
-            "n_ctx": 4096,
+            "n_ctx": self.N_CTX,
             "logits_all": False,
             "embedding": False,
         }
 
-        try:
-            llama = Llama(n_gpu_layers=gpu_layers, **init_kwargs)
-            offload_note = "GPU" if gpu_layers != 0 else "CPU"
-            print(f"    [CategorizeStage] Loaded llama.cpp model '{model_path.name}' on {offload_note}.")
-            return llama
-        except Exception as gpu_exc:
-            if gpu_layers != 0:
-                print(f"    [CategorizeStage] GPU initialisation failed ({gpu_exc}); retrying on CPU.")
+        def load(device: str) -> Tuple[Optional[Any], str]:
+            # The budget only moves a model off a CUDA GPU that lacks room; other
+            # accelerators (e.g. Metal) keep the requested offload.
+            layers = 0 if device == "cpu" and context.resources.hardware.get("gpu_cuda") else gpu_layers
             try:
-                llama = Llama(n_gpu_layers=0, **init_kwargs)
-                print(f"    [CategorizeStage] Loaded llama.cpp model '{model_path.name}' on CPU.")
-                return llama
-            except Exception as cpu_exc:
-                print(f"    [CategorizeStage] Failed to load llama.cpp model on CPU: {cpu_exc}")
-                return None
-
-    def _classify_with_llm(self, context: StageContext, llama: Any, summary_text: str) -> str:
-        """Run the llama.cpp model and interpret the response."""
+                tuning = context.resources.llama_settings(layers, model_path, init_kwargs["n_ctx"])
+                started = time.perf_counter()
+                llama = Llama(n_gpu_layers=layers, **init_kwargs, **tuning)
+                offload_note = "GPU" if layers != 0 else "CPU"
+                context.resources.record_load("llm_cat", model_path.name, time.perf_counter() - started, [model_path], device=offload_note.lower())
+                print(f"    [CategorizeStage] Loaded llama.cpp model '{model_path.name}' on {offload_note}.")
+                return llama, device
+            except Exception as gpu_exc:
+                if layers != 0:
+                    print(f"    [CategorizeStage] GPU initialisation failed ({gpu_exc}); retrying on CPU.")
+                try:
+                    tuning = context.resources.llama_settings(0, model_path, init_kwargs["n_ctx"])
+                    started = time.perf_counter()
+                    llama = Llama(n_gpu_layers=0, **init_kwargs, **tuning)
+                    context.resources.record_load("llm_cat", model_path.name, time.perf_counter() - started, [model_path], device="cpu")
+                    print(f"    [CategorizeStage] Loaded llama.cpp model '{model_path.name}' on CPU.")
+                    return llama, "cpu"
+                except Exception as cpu_exc:
+                    print(f"    [CategorizeStage] Failed to load llama.cpp model on CPU: {cpu_exc}")
+                    return None, "cpu"
+
+        return context.resources.lease_llama("llm_cat", model_path, init_kwargs["n_ctx"], load)
+
+    def _classify_with_llm(
+        self,
+        context: StageContext,
+        llama: Any,
+        summary_text: str,
+    ) -> Optional[Dict[str, Any]]:
+        """Classify the text with llama.cpp using the configured scoring mode.
+
+        Returns a mapping with ``label``, ``method`` and, when the mode
+        provides one, ``confidence`` and per-label ``scores``. ``None``
+        signals that every attempted mode failed.
+        """
         system_prompt = self._load_system_prompt(context) or _DEFAULT_PROMPT
         prompt = summary_text.strip()
         if len(prompt) > 4000:
             prompt = prompt[:4000]
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt},
+        ]
+        self._prime_prompt_cache(context, llama, system_prompt)
+
+        mode = self._scoring_mode()
+        if mode == "logits":
+            try:
+                return self._score_labels(llama, messages)
+            except Exception as exc:
+                print(f"    [CategorizeStage] Label scoring failed ({exc}); retrying with grammar.")
+                mode = "grammar"
+        if mode == "grammar":
+            try:
+                return self._classify_with_grammar(llama, messages)
+            except Exception as exc:
+                print(f"    [CategorizeStage] Grammar-constrained classification failed: {exc}")
+                return None
+        return self._classify_with_generation(llama, messages)
+
+    def _score_labels(self, llama: Any, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Score each candidate label by its log-likelihood (:func:`apps.ai.llm.scoring.score_labels`)."""
+        return score_labels(llama, messages, _CANDIDATE_LABELS)
+
+    def _classify_with_grammar(self, llama: Any, messages: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """Generate a label with a GBNF grammar that only admits the candidates."""
+        grammar: Any = _LABEL_GRAMMAR
+        if not getattr(llama, "remote", False):
+            # The LLM server compiles the grammar itself.
+            from llama_cpp import LlamaGrammar  # type: ignore
+
+            grammar = LlamaGrammar.from_string(_LABEL_GRAMMAR, verbose=False)
+        response = llama.create_chat_completion(
+            messages=messages,
+            temperature=0.0,
+            max_tokens=8,
+            grammar=grammar,
+        )
+        content = (response["choices"][0]["message"]["content"] or "").strip()
+        if content not in _CANDIDATE_LABELS:
+            print(f"    [CategorizeStage] Grammar output '{content}' is not a candidate label.")
+            return None
+        return {"label": content, "method": "grammar"}
 
+    def _classify_with_generation(self, llama: Any, messages: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """Run a free-text completion and map the response onto a label."""
         try:
             response = llama.create_chat_completion(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt},
-                ],
+                messages=messages,
                 temperature=0.0,
                 max_tokens=8,
             )
             content = (response["choices"][0]["message"]["content"] or "").strip()
         except Exception as exc:
             print(f"    [CategorizeStage] LLM classification failed: {exc}")
-            return ""
+            return None
 
         cleaned = self._strip_think_tags(content)
-        return self._normalise_label(cleaned)
+        return {"label": self._normalise_label(cleaned), "method": "generate"}
+
+    def _prime_prompt_cache(self, context: StageContext, llama: Any, system_prompt: str) -> None:
+        """Restore (or build) the cached llama.cpp state for the system prompt."""
+        cache = get_prompt_cache(context.config.root_dir)
+        if cache is None:
+            return
+        try:
+            outcome = cache.prime(llama, render_chat_prefix(llama, system_prompt))
+            print(f"    [CategorizeStage] System prompt state: {outcome}.")
+        except Exception as exc:
+            print(f"    [CategorizeStage] Prompt state cache unavailable ({exc}); evaluating from scratch.")
+            llama.reset()
+
+    def _scoring_mode(self) -> str:
+        """Return the scoring mode selected through ``CATEGORIZE_MODE``."""
+        env_value = (os.getenv("CATEGORIZE_MODE") or "").strip().lower()
+        if not env_value:
+            return _SCORING_MODES[0]
+        if env_value not in _SCORING_MODES:
+            print(f"    [CategorizeStage] Invalid CATEGORIZE_MODE='{env_value}'; using '{_SCORING_MODES[0]}'.")
+            return _SCORING_MODES[0]
+        return env_value
 
     def _load_system_prompt(self, context: StageContext) -> str:
         """Load the categorisation system prompt from disk."""
@@ -213,24 +358,21 @@ class CategorizeLLMStage(BaseStage):
         # Prefer the lexicographically last file (often the highest quantisation quality).
         return sorted(candidates)[-1]
 
-    def _heuristic_label(self, text: str) -> str:
-        """Fallback heuristic based on keyword counts."""
-        lowered = self._strip_think_tags(text).lower()
-        meeting_terms = ("\ud68c\uc758", "\ud68c\uc758\ub85d", "agenda", "meeting", "\uc758\uc81c", "\ud611\uc758", "\ucc38\uc11d\uc790")
-        lecture_terms = ("\uac15\uc758", "lecture", "\uad50\uc218", "\ud559\uc0dd", "\uc218\uc5c5", "\uce74\ub9ac\ud0c0\uc9c0\ub110", "\uc2ac\ub77c\uc774\ub4dc")
+    def _classify_lexically(self, context: StageContext, text: str) -> LexicalPrediction:
+        """Score the transcript with the lexical classifier."""
+        classifier = LexicalClassifier.from_root(context.config.root_dir)
+        speaker_index = context.data.get("speaker_index")
+        return classifier.predict(self._strip_think_tags(text), speaker_index)
 
-        meeting_score = self._count_terms(lowered, meeting_terms)
-        lecture_score = self._count_terms(lowered, lecture_terms)
-
-        if meeting_score > lecture_score and meeting_score > 0:
-            return _CANDIDATE_LABELS[2]
-        if lecture_score > meeting_score and lecture_score > 0:
-            return _CANDIDATE_LABELS[1]
-        return _CANDIDATE_LABELS[0]
-
-    @staticmethod
-    def _count_terms(text: str, terms: Iterable[str]) -> int:
-        return sum(text.count(term.lower()) for term in terms if term)
+    def _lexical_threshold(self) -> float:
+        """Confidence required to accept the lexical label without the LLM."""
+        env_value = os.getenv("CATEGORIZE_LEXICAL_THRESHOLD")
+        if env_value:
+            try:
+                return float(env_value)
+            except ValueError:
+                print(f"    [CategorizeStage] Invalid CATEGORIZE_LEXICAL_THRESHOLD='{env_value}'; ignoring.")
+        return _DEFAULT_LEXICAL_THRESHOLD
 
     def _normalise_label(self, raw: str) -> str:
         """Ensure the LLM response maps to one of the expected labels."""
@@ -343,7 +485,8 @@ class CategorizeLLMStage(BaseStage):
         return -1
 
     def _release_unused_resources(self, context: StageContext) -> None:
-        """Release heavy resources before loading the LLM."""
-        release_whisper = getattr(context.resources, "release_whisper_model", None)
-        if callable(release_whisper):
-            release_whisper()
+        """Hand the speech models back to the budget before loading the LLM."""
+        for release_name in ("release_whisper_model", "release_diarization_pipeline"):
+            release = getattr(context.resources, release_name, None)
+            if callable(release):
+                release()
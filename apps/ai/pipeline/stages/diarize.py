@@ -4,103 +4,189 @@ Speaker diarisation stage.
 This stage identifies when different speakers are talking within each
 audio chunk. It uses the ``pyannote.audio`` library when available.
 If the library is not installed or the diarisation model cannot be
-loaded, the stage assigns a single default speaker label to each
-chunk. The diarisation results are stored in ``context.data`` under
+loaded, the stage assigns a single default speaker label to the whole
+recording. The diarisation results are stored in ``context.data`` under
 the key ``"diarization"`` as a list of dictionaries with
 ``start``, ``end`` and ``speaker`` keys.
+
+Chunks are diarised independently, so their local speaker labels are
+unrelated. The pipeline is asked for per-speaker embeddings alongside
+the turns; those are saved once per chunk under
+``diarize/embeddings/`` and clustered across chunks
+(:func:`apps.ai.speakers.link_speakers`) to relabel every turn with a
+recording-wide speaker.
+
+On CPU-only hosts with several chunks the stage fans the chunks out to
+a process pool (:mod:`apps.ai.pipeline.parallel`). Every worker loads its
+own pyannote pipeline with a fixed number of torch threads and receives
+chunk PCM through shared memory; results are merged in chunk order. The
+pool is leased from the memory budget like the in-process pipeline and
+stays warm between runs.
+``DIARIZE_WORKERS`` overrides the worker count (``1`` disables the pool).
+Inference runs under the CPU acceleration mode from :mod:`apps.ai.accel`.
+In-process, the next chunk is read on a background thread while the
+current one is diarised (:mod:`apps.ai.pipeline.prefetch`).
 """
 
 from __future__ import annotations
 
-from typing import List, Dict
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import soundfile as sf
 import torch
 
 from ..base import BaseStage, StageContext, StageResult
+from ...accel import accel_mode, inference_context
+from ..prefetch import prefetch
+from ..parallel import SharedArray, WorkerPool, attach_array, parse_worker_setting
+from ...residency import diarization_footprint
+from ...resources import load_diarization_pipeline
+from ...speakers import DEFAULT_LINK_THRESHOLD, LocalSpeaker, link_speakers, save_chunk_embeddings
+
+
+def diarize_waveform(
+    pipeline: Any,
+    waveform: Any,
+    sample_rate: int,
+    uri: str,
+) -> Tuple[List[Dict[str, float | str]], Dict[str, np.ndarray]]:
+    """Run a pyannote pipeline on one chunk.
+
+    Returns chunk-relative speaker turns and a mapping from local speaker
+    label to embedding (empty when the pipeline cannot provide them).
+    """
+    file = {"waveform": waveform, "sample_rate": sample_rate, "uri": uri}
+    embeddings = None
+    try:
+        diar_output = pipeline(file, return_embeddings=True)
+    except TypeError:
+        diar_output = pipeline(file)
+    if isinstance(diar_output, tuple) and len(diar_output) == 2:
+        diar_output, embeddings = diar_output
+    elif hasattr(diar_output, "speaker_embeddings"):
+        embeddings = diar_output.speaker_embeddings
+
+    annotation = None
+    if hasattr(diar_output, "exclusive_speaker_diarization"):
+        annotation = diar_output.exclusive_speaker_diarization
+        print(f"    [DiarizeStage] Using exclusive diarization for chunk {uri}.")
+    elif hasattr(diar_output, "speaker_diarization"):
+        annotation = diar_output.speaker_diarization
+    elif hasattr(diar_output, "itertracks"):
+        annotation = diar_output
+
+    turns: List[Dict[str, float | str]] = []
+    if annotation is not None and hasattr(annotation, "itertracks"):
+        for turn, _, speaker in annotation.itertracks(yield_label=True):
+            turns.append({
+                "start": float(turn.start),
+                "end": float(turn.end),
+                "speaker": str(speaker),
+            })
+    else:
+        serialized: Dict[str, List[Dict[str, float | str]]] | None = None
+        if hasattr(diar_output, "serialize"):
+            serialized = diar_output.serialize()
+        elif isinstance(diar_output, dict):
+            serialized = diar_output  # type: ignore[assignment]
+
+        if serialized is None:
+            raise AttributeError(
+                f"Unsupported diarization output type: {type(diar_output).__name__}"
+            )
+        entries = serialized.get("exclusive_diarization") or serialized.get("diarization") or []
+        for entry in entries:
+            turns.append({
+                "start": float(entry.get("start", 0.0)),
+                "end": float(entry.get("end", 0.0)),
+                "speaker": str(entry.get("speaker", "UNKNOWN")),
+            })
+
+    vectors: Dict[str, np.ndarray] = {}
+    if embeddings is not None:
+        # Embedding rows follow the label order of the (non-exclusive) annotation.
+        labelled = getattr(diar_output, "speaker_diarization", None) or annotation
+        labels = list(labelled.labels()) if hasattr(labelled, "labels") else []
+        matrix = np.asarray(embeddings)
+        if matrix.ndim == 2 and len(labels) == matrix.shape[0]:
+            vectors = {str(label): matrix[index] for index, label in enumerate(labels)}
+    return turns, vectors
+
+
+_worker_pipeline: Any = None
+_worker_accel = "off"
+
+
+def _init_worker(repo_id: str, threads: int, cpu_accel: str) -> None:
+    """Process-pool initialiser: load a private pipeline on CPU."""
+    global _worker_pipeline, _worker_accel
+    torch.set_num_threads(threads)
+    _worker_pipeline, _ = load_diarization_pipeline(repo_id, "cpu", cpu_accel)
+    _worker_accel = cpu_accel
+
+
+def _diarize_shared_chunk(
+    descriptor: SharedArray,
+    sample_rate: int,
+    chunk_id: str,
+) -> Tuple[List[Dict[str, float | str]], Dict[str, np.ndarray]]:
+    waveform = torch.from_numpy(attach_array(descriptor))
+    with inference_context(_worker_accel):
+        return diarize_waveform(_worker_pipeline, waveform, sample_rate, chunk_id)
+
+
+def _read_chunk_pcm(chunk: Any) -> Tuple[np.ndarray, int]:
+    data, sr = sf.read(chunk.file_path, always_2d=True, dtype="float32")
+    return np.ascontiguousarray(data.T), sr
 
 
 class DiarizeStage(BaseStage):
     name = "diarize"
+    resource = "gpu"
 
     def run(self, context: StageContext) -> StageResult:
         chunks = context.data.get("chunks") or []
-        diarization: List[Dict[str, float | str]] = []
-        pipeline = context.resources.diarization_pipeline
+        if not context.config.profile.diarize:
+            diarization = self._placeholder_turns(chunks)
+            context.data["diarization"] = diarization
+            print(f"    [DiarizeStage] Skipped by profile '{context.config.profile.name}'; using placeholder speaker turns.")
+            return StageResult(name=self.name, success=True, data=diarization)
         print(f"    [DiarizeStage] Starting diarisation over {len(chunks)} chunk(s).")
+        per_chunk = self._diarize_in_pool(context, chunks)
+        if per_chunk is not None:
+            diarization = self._link_chunks(context, per_chunk)
+            context.data["diarization"] = diarization
+            print(f"    [DiarizeStage] Completed diarisation with {len(diarization)} speaker turns.")
+            return StageResult(name=self.name, success=True, data=diarization)
+
+        pipeline = context.resources.diarization_pipeline
         if pipeline is None:
-            # Fallback: assign single speaker per chunk
-            speaker_id = 0
-            for chunk in chunks:
-                diarization.append({
-                    "start": chunk.start,
-                    "end": chunk.end,
-                    "speaker": f"SPEAKER_{speaker_id:02d}",
-                })
-                speaker_id += 1
+            diarization = self._placeholder_turns(chunks)
             context.data["diarization"] = diarization
             print("    [DiarizeStage] No diarisation pipeline available. Generated placeholder speaker turns.")
             return StageResult(name=self.name, success=True, data=diarization)
         # Use real diarisation pipeline
         try:
-            for chunk in chunks:
+            per_chunk = []
+            for chunk, (pcm, sr) in prefetch(chunks, _read_chunk_pcm):
                 print(f"    [DiarizeStage] Processing chunk {chunk.id} ({chunk.file_path.name}).")
-                data, sr = sf.read(chunk.file_path, always_2d=True)
-                waveform = torch.from_numpy(data.T).float().contiguous()
-                diar_output = pipeline({"waveform": waveform, "sample_rate": sr, "uri": chunk.id})
-
-                annotation = None
-                if hasattr(diar_output, "exclusive_speaker_diarization"):
-                    annotation = diar_output.exclusive_speaker_diarization
-                    print(f"    [DiarizeStage] Using exclusive diarization for chunk {chunk.id}.")
-                elif hasattr(diar_output, "speaker_diarization"):
-                    annotation = diar_output.speaker_diarization
-                elif hasattr(diar_output, "itertracks"):
-                    annotation = diar_output
-
-                if annotation is not None and hasattr(annotation, "itertracks"):
-                    for turn, _, speaker in annotation.itertracks(yield_label=True):
-                        diarization.append({
-                            "start": chunk.start + float(turn.start),
-                            "end": chunk.start + float(turn.end),
-                            "speaker": str(speaker),
-                        })
-                    continue
-
-                serialized: Dict[str, List[Dict[str, float | str]]] | None = None
-                if hasattr(diar_output, "serialize"):
-                    serialized = diar_output.serialize()
-                elif isinstance(diar_output, dict):
-                    serialized = diar_output  # type: ignore[assignment]
-
-                if serialized is not None:
-                    entries = serialized.get("exclusive_diarization") or serialized.get("diarization") or []
-                    for entry in entries:
-                        diarization.append({
-                            "start": chunk.start + float(entry.get("start", 0.0)),
-                            "end": chunk.start + float(entry.get("end", 0.0)),
-                            "speaker": str(entry.get("speaker", "UNKNOWN")),
-                        })
-                    continue
-
-                raise AttributeError(
-                    f"Unsupported diarization output type: {type(diar_output).__name__}"
-                )
+                waveform = torch.from_numpy(pcm)
+                with inference_context(context.resources.cpu_accel):
+                    turns, embeddings = diarize_waveform(pipeline, waveform, sr, chunk.id)
+                per_chunk.append((chunk, turns, embeddings))
+            context.resources.release_diarization_pipeline()
 
+            diarization = self._link_chunks(context, per_chunk)
             context.data["diarization"] = diarization
             print(f"    [DiarizeStage] Completed diarisation with {len(diarization)} speaker turns.")
             return StageResult(name=self.name, success=True, data=diarization)
         except Exception as e:
             # On failure, fallback to single label but continue the pipeline.
-            fallback = []
-            speaker_id = 0
-            for chunk in chunks:
-                fallback.append({
-                    "start": chunk.start,
-                    "end": chunk.end,
-                    "speaker": f"SPEAKER_{speaker_id:02d}",
-                })
-                speaker_id += 1
+            context.resources.release_diarization_pipeline()
+            fallback = self._placeholder_turns(chunks)
             context.data["diarization"] = fallback
             print(f"    [DiarizeStage] Diarisation failed; fallback to default speakers. Error: {e}")
             return StageResult(
@@ -109,3 +195,136 @@ class DiarizeStage(BaseStage):
                 data=fallback,
                 message=f"Falling back to default speaker labels: {e}",
             )
+
+    def _diarize_in_pool(
+        self,
+        context: StageContext,
+        chunks: List[Any],
+    ) -> Optional[List[Tuple[Any, List[Dict[str, float | str]], Dict[str, np.ndarray]]]]:
+        """Diarise chunks in worker processes.
+
+        Returns ``None`` when the pool is not used or fails, in which case
+        the caller falls back to the in-process loop.
+        """
+        if len(chunks) < 2:
+            return None
+        pool = self.worker_pool(context)
+        if pool is None:
+            return None
+
+        print(
+            f"    [DiarizeStage] Diarising {len(chunks)} chunk(s) with {pool.workers} worker(s) "
+            f"x {pool.threads} thread(s)."
+        )
+        try:
+            results = pool.map(chunks, _read_chunk_pcm, _diarize_shared_chunk, lambda chunk: (chunk.id,))
+        except Exception as exc:
+            print(f"    [DiarizeStage] Worker pool failed ({exc}); diarising in-process.")
+            context.resources.discard("diarization_pool", f"worker pool failed: {exc}")
+            return None
+        context.resources.end_lease("diarization_pool")
+        return [(chunk, turns, embeddings) for chunk, (turns, embeddings) in zip(chunks, results)]
+
+    @staticmethod
+    def worker_pool(context: StageContext) -> Optional[WorkerPool]:
+        """Lease the CPU worker pool for the configured pipeline; ``None`` when it does not apply.
+
+        Shared with :mod:`apps.ai.preload`; the caller ends the
+        ``diarization_pool`` lease.
+        """
+        repo_id = context.config.selected_models.get("diar")
+        if not repo_id or torch.cuda.is_available():
+            return None
+        env_value = os.getenv("DIARIZE_WORKERS")
+        try:
+            requested = parse_worker_setting(env_value)
+        except ValueError:
+            print(f"    [DiarizeStage] Invalid DIARIZE_WORKERS='{env_value}'; using automatic sizing.")
+            requested = None
+        worker_footprint = diarization_footprint("cpu")
+        workers, threads = context.resources.pool_workers("diarization_pool", requested, worker_footprint)
+        if workers < 2:
+            return None
+        return context.resources.worker_pool(
+            "diarization_pool",
+            repo_id,
+            workers,
+            threads,
+            _init_worker,
+            (repo_id, threads, accel_mode(context.config)),
+            worker_footprint,
+        )
+
+    @staticmethod
+    def _placeholder_turns(chunks: List[Any]) -> List[Dict[str, float | str]]:
+        """One unknown speaker for the whole recording, consistent across chunks."""
+        return [
+            {"start": chunk.start, "end": chunk.end, "speaker": "SPEAKER_00"}
+            for chunk in chunks
+        ]
+
+    def _link_chunks(
+        self,
+        context: StageContext,
+        per_chunk: List[Tuple[Any, List[Dict[str, float | str]], Dict[str, np.ndarray]]],
+    ) -> List[Dict[str, float | str]]:
+        """Relabel chunk-local speakers with recording-wide labels.
+
+        Turn times are mapped back to the recording timeline, through the
+        chunk's ``speech_map`` when the VAD stage trimmed it.
+        """
+        embeddings_dir = context.base_dir / self.name / "embeddings"
+        speakers: List[LocalSpeaker] = []
+        for chunk, turns, embeddings in per_chunk:
+            if embeddings:
+                try:
+                    save_chunk_embeddings(embeddings_dir / f"{chunk.id}.npz", embeddings)
+                except Exception as exc:
+                    print(f"    [DiarizeStage] Failed to save embeddings for chunk {chunk.id}: {exc}")
+            first_start: Dict[str, float] = {}
+            for turn in turns:
+                label = str(turn["speaker"])
+                first_start[label] = min(first_start.get(label, float("inf")), float(turn["start"]))
+            for label, start in first_start.items():
+                speakers.append(LocalSpeaker(
+                    chunk_id=chunk.id,
+                    label=label,
+                    first_start=chunk.start + chunk.to_original(start),
+                    embedding=embeddings.get(label),
+                ))
+
+        mapping = link_speakers(speakers, threshold=self._link_threshold())
+        if len(per_chunk) > 1:
+            linked = len(set(mapping.values()))
+            print(f"    [DiarizeStage] Linked {len(speakers)} chunk-local speaker(s) into {linked} global speaker(s).")
+            try:
+                links = [
+                    {"chunk": chunk_id, "local": local, "speaker": speaker}
+                    for (chunk_id, local), speaker in mapping.items()
+                ]
+                (context.base_dir / self.name).mkdir(parents=True, exist_ok=True)
+                (context.base_dir / self.name / "speaker_links.json").write_text(
+                    json.dumps(links, indent=2), encoding="utf-8"
+                )
+            except Exception as exc:
+                print(f"    [DiarizeStage] Failed to write speaker_links.json: {exc}")
+
+        diarization: List[Dict[str, float | str]] = []
+        for chunk, turns, _ in per_chunk:
+            for turn in turns:
+                diarization.append({
+                    "start": chunk.start + chunk.to_original(float(turn["start"])),
+                    "end": chunk.start + chunk.to_original(float(turn["end"]), is_end=True),
+                    "speaker": mapping.get((chunk.id, str(turn["speaker"])), str(turn["speaker"])),
+                })
+        return diarization
+
+    def _link_threshold(self) -> float:
+        """Cosine distance threshold for linking speakers (``DIARIZE_LINK_THRESHOLD``)."""
+        env_value = os.getenv("DIARIZE_LINK_THRESHOLD")
+        if env_value:
+            try:
+                return float(env_value)
+            except ValueError:
+                print(f"    [DiarizeStage] Invalid DIARIZE_LINK_THRESHOLD='{env_value}'; ignoring.")
+        return DEFAULT_LINK_THRESHOLD
@@ -2,17 +2,22 @@
 Audio normalisation and segmentation stage.
 
 This stage performs basic preprocessing on the input audio file. It
-converts the audio to a mono, 16 kHz PCM WAV file using ``ffmpeg``
-and optionally splits long recordings into smaller chunks. The
-resulting chunks are recorded in the context's data under the
-``"chunks"`` key.
+converts the audio to a mono, 16 kHz PCM WAV file and optionally splits
+long recordings into smaller chunks. The resulting chunks are recorded
+in the context's data under the ``"chunks"`` key.
+
+When PyAV is installed the input is decoded, downmixed and resampled
+in-process in a single streaming pass, and the chunk files are written
+directly from the decoded samples; the duration is the exact number of
+samples decoded. Without PyAV (or if it cannot decode the input) the
+stage falls back to the ``ffmpeg``/``ffprobe`` command line tools.
 """
 
 from __future__ import annotations
 
 import subprocess
 from pathlib import Path
-from typing import List
+from typing import Any, Iterator, List, Optional, Tuple
 
 from ..base import BaseStage, StageContext, StageResult
 from ...types import AudioChunk
@@ -22,9 +27,11 @@ class NormalizeStage(BaseStage):
     """Convert input audio to mono 16 kHz and create audio chunks."""
 
     name = "normalize"
+    resource = "cpu"
 
     # maximum segment length in seconds (30 minutes)
     SEGMENT_LENGTH = 30 * 60  # 1800 seconds
+    SAMPLE_RATE = 16000
 
     def _run_ffmpeg(self, cmd: List[str]) -> None:
         """Helper to run an ffmpeg command and raise on failure."""
@@ -47,12 +54,117 @@ class NormalizeStage(BaseStage):
         except Exception:
             return 0.0
 
+    @staticmethod
+    def _as_frames(resampled: Any) -> List[Any]:
+        """PyAV < 9 returns a single frame (or ``None``) instead of a list."""
+        if resampled is None:
+            return []
+        return resampled if isinstance(resampled, list) else [resampled]
+
+    def _decode_blocks(self, av: Any, container: Any) -> Iterator[Any]:
+        """Yield mono 16 kHz float32 blocks of the first audio stream."""
+        if not container.streams.audio:
+            raise ValueError("input has no audio stream")
+        stream = container.streams.audio[0]
+        stream.thread_type = "AUTO"
+        resampler = av.AudioResampler(format="flt", layout="mono", rate=self.SAMPLE_RATE)
+        for frame in container.decode(stream):
+            for out in self._as_frames(resampler.resample(frame)):
+                yield out.to_ndarray().reshape(-1)
+        # Flush samples buffered inside the resampler.
+        for out in self._as_frames(resampler.resample(None)):
+            yield out.to_ndarray().reshape(-1)
+
+    def _normalise_in_process(
+        self,
+        input_file: Path,
+        run_dir: Path,
+        normalized_path: Path,
+    ) -> Optional[Tuple[List[AudioChunk], float]]:
+        """Decode with PyAV and write the chunks in one streaming pass.
+
+        Returns ``None`` when PyAV is not installed or cannot decode the
+        input, so the caller can use the ffmpeg command line instead.
+        """
+        try:
+            import av
+            import soundfile as sf
+        except ImportError:
+            return None
+
+        segments_dir = run_dir / "segments"
+        segments_dir.mkdir(exist_ok=True)
+        chunk_samples = int(self.SEGMENT_LENGTH * self.SAMPLE_RATE)
+        paths: List[Path] = []
+        writer = None
+        written = 0
+        total = 0
+        try:
+            with av.open(str(input_file)) as container:
+                for pcm in self._decode_blocks(av, container):
+                    while pcm.size:
+                        if writer is None:
+                            path = segments_dir / f"chunk_{len(paths):03d}.wav"
+                            writer = sf.SoundFile(
+                                path, "w", samplerate=self.SAMPLE_RATE, channels=1, subtype="PCM_16"
+                            )
+                            paths.append(path)
+                            written = 0
+                        take = min(pcm.size, chunk_samples - written)
+                        writer.write(pcm[:take])
+                        written += take
+                        total += take
+                        pcm = pcm[take:]
+                        if written >= chunk_samples:
+                            writer.close()
+                            writer = None
+        except Exception as e:
+            print(f"    [NormalizeStage] In-process decoding failed ({e}); falling back to ffmpeg.")
+            if writer is not None:
+                writer.close()
+            for path in paths:
+                path.unlink(missing_ok=True)
+            return None
+        if writer is not None:
+            writer.close()
+        if total == 0:
+            print("    [NormalizeStage] In-process decoding produced no audio; falling back to ffmpeg.")
+            return None
+
+        duration = total / self.SAMPLE_RATE
+        if len(paths) == 1:
+            paths[0].replace(normalized_path)
+            try:
+                segments_dir.rmdir()
+            except OSError:
+                pass
+            chunks = [AudioChunk(id="chunk0", file_path=normalized_path, start=0.0, end=duration)]
+        else:
+            chunks = [
+                AudioChunk(
+                    id=f"chunk{i}",
+                    file_path=path,
+                    start=i * self.SEGMENT_LENGTH,
+                    end=min((i + 1) * self.SEGMENT_LENGTH, duration),
+                )
+                for i, path in enumerate(paths)
+            ]
+        print(f"    [NormalizeStage] Decoded {duration:.2f}s in-process into {len(chunks)} chunk(s).")
+        return chunks, duration
+
     def run(self, context: StageContext) -> StageResult:
         input_file = context.input_file
         run_dir = context.base_dir / self.name
         run_dir.mkdir(parents=True, exist_ok=True)
         normalized_path = run_dir / "normalized.wav"
         print(f"    [NormalizeStage] Normalising '{input_file.name}' to {normalized_path}.")
+        decoded = self._normalise_in_process(input_file, run_dir, normalized_path)
+        if decoded is not None:
+            chunks, _ = decoded
+            context.data["chunks"] = chunks
+            # Long inputs are written straight to the chunk files; no full-length WAV exists then.
+            context.data["normalized_path"] = normalized_path if normalized_path.exists() else None
+            return StageResult(name=self.name, success=True, data=[c.__dict__ for c in chunks])
         # Convert to mono 16 kHz PCM WAV when ffmpeg is available.
         import shutil
         from shutil import which
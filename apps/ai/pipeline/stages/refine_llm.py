@@ -5,17 +5,38 @@ This stage uses a llama.cpp model to generate a formatted summary based
 on the classified document type. When the llama.cpp runtime is not
 available the stage falls back to a deterministic transcript merge so
 that downstream consumers still receive an output.
+
+Reasoning models (DeepSeek-R1, Qwen3 Thinking) spend tokens inside
+``<think>`` blocks before answering. ``REFINE_THINK_MODE`` controls that
+phase: ``off`` closes the think block in the prompt, ``budget`` (the
+default) streams the completion and, once ``REFINE_THINK_BUDGET`` think
+tokens have been produced, closes the block and resumes for the answer,
+and ``free`` leaves the model alone. Token counts for both phases are
+recorded under ``refine_token_usage``.
+
+Answer tokens are published to the run's :class:`~apps.ai.io.stream.SummaryStream`
+as they are generated so the API can forward them before ``summary.txt``
+is written.
 """
 
 from __future__ import annotations
 
 import os
 import re
+import time
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
 from ..base import BaseStage, StageContext, StageResult
-
+from ...io import stream as summary_stream
+from ...llm.chat import chat_template, render_chat_prefix, render_chat_prompt, tokenize_prompt
+from ...llm.client import connect_llm_server
+from ...llm.prompt_cache import get_prompt_cache
+from ...profiles import Profile
+
+_THINK_MODES: tuple[str, ...] = ("budget", "off", "free")
+_THINK_OPEN = "<think>"
+_THINK_CLOSE = "</think>"
 _DEFAULT_DOCUMENT_TYPE = "\ub300\ud654\ub85d"
 _PROMPT_FILES: Dict[str, str] = {
     "\ub300\ud654\ub85d": "conversation.txt",
@@ -46,15 +67,26 @@ class RefineLLMStage(BaseStage):
     """Generate a formatted summary using llama.cpp with prompt templates."""
 
     name = "refine"
+    resource = "llm"
+
+    N_CTX = 8192
+    DEFAULT_THINK_BUDGET = 256
+    # Answer length is sized from the prompt: summaries get a share of the
+    # input tokens (``summary_ratio`` of the processing profile, a third by
+    # default), within these bounds.
+    MIN_ANSWER_TOKENS = 256
+    MAX_ANSWER_TOKENS = 1536
 
     def run(self, context: StageContext) -> StageResult:
         document_type = str(context.data.get("document_type") or _DEFAULT_DOCUMENT_TYPE)
         self._release_unused_resources(context)
         source_text = self._load_input_text(context)
+        stream = summary_stream.open_stream(context.run_id)
         if not source_text:
             message = "No transcript text available; produced empty summary."
             context.data["summary"] = ""
             self._save_summary_file(context, "")
+            stream.close("")
             return StageResult(name=self.name, success=True, data="", message=message)
 
         llama = self._load_llama_model(context)
@@ -68,7 +100,17 @@ class RefineLLMStage(BaseStage):
             message = "llama_cpp model unavailable; used fallback formatting."
         else:
             system_prompt = self._load_system_prompt(context, document_type)
-            generated = self._summarise_with_llm(llama, system_prompt, document_type, source_text)
+            generated, usage = self._summarise_with_llm(
+                context,
+                llama,
+                system_prompt,
+                document_type,
+                source_text,
+                publish=stream.append,
+            )
+            context.resources.end_lease("llm_sum")
+            if usage:
+                context.data["refine_token_usage"] = usage
             if generated:
                 summary = generated
                 source = "llm"
@@ -82,6 +124,7 @@ class RefineLLMStage(BaseStage):
         context.data["summary"] = summary
         context.data["summary_source"] = source
         self._save_summary_file(context, summary)
+        stream.close(summary)
 
         print(f"    [RefineStage] Generated summary ({source}) with length {len(summary)} characters.")
 
@@ -155,7 +198,12 @@ class RefineLLMStage(BaseStage):
         return lines
 
     def _load_llama_model(self, context: StageContext) -> Optional[Any]:
-        """Initialise a llama.cpp model with GPU preference and CPU fallback."""
+        """Return the llama.cpp model for this stage.
+
+        Uses the LLM server when ``LLM_SERVER_URL`` is set and reachable;
+        otherwise leases the model from the memory budget, loading it
+        with GPU preference and CPU fallback.
+        """
         model_path = self._resolve_model_path(
             context,
             repo_key="llm_sum_repo_id",
@@ -164,6 +212,11 @@ class RefineLLMStage(BaseStage):
         if model_path is None:
             return None
 
+        remote = connect_llm_server(model_path, self.N_CTX, owner=context.run_id, config=context.config)
+        if remote is not None:
+            print(f"    [RefineStage] Using LLM server at {remote.url} for '{model_path.name}'.")
+            return remote
+
         try:
             from llama_cpp import Llama  # type: ignore
         except ImportError:
@@ -173,35 +226,54 @@ class RefineLLMStage(BaseStage):
         gpu_layers = self._determine_gpu_layers(context)
         init_kwargs = {
             "model_path": str(model_path),
-            "n_ctx": 8192,
+            "n_ctx": self.N_CTX,
             "logits_all": False,
             "embedding": False,
         }
 
-        try:
-            llama = Llama(n_gpu_layers=gpu_layers, **init_kwargs)
-            offload_note = "GPU" if gpu_layers != 0 else "CPU"
-            print(f"    [RefineStage] Loaded llama.cpp model '{model_path.name}' on {offload_note}.")
-            return llama
-        except Exception as gpu_exc:
-            if gpu_layers != 0:
-                print(f"    [RefineStage] GPU initialisation failed ({gpu_exc}); retrying on CPU.")
+        def load(device: str) -> Tuple[Optional[Any], str]:
+            # The budget only moves a model off a CUDA GPU that lacks room; other
+            # accelerators (e.g. Metal) keep the requested offload.
+            layers = 0 if device == "cpu" and context.resources.hardware.get("gpu_cuda") else gpu_layers
             try:
-                llama = Llama(n_gpu_layers=0, **init_kwargs)
-                print(f"    [RefineStage] Loaded llama.cpp model '{model_path.name}' on CPU.")
-                return llama
-            except Exception as cpu_exc:
-                print(f"    [RefineStage] Failed to load llama.cpp model on CPU: {cpu_exc}")
-                return None
+                tuning = context.resources.llama_settings(layers, model_path, init_kwargs["n_ctx"])
+                started = time.perf_counter()
+                llama = Llama(n_gpu_layers=layers, **init_kwargs, **tuning)
+                offload_note = "GPU" if layers != 0 else "CPU"
+                context.resources.record_load("llm_sum", model_path.name, time.perf_counter() - started, [model_path], device=offload_note.lower())
+                print(f"    [RefineStage] Loaded llama.cpp model '{model_path.name}' on {offload_note}.")
+                return llama, device
+            except Exception as gpu_exc:
+                if layers != 0:
+                    print(f"    [RefineStage] GPU initialisation failed ({gpu_exc}); retrying on CPU.")
+                try:
+                    tuning = context.resources.llama_settings(0, model_path, init_kwargs["n_ctx"])
+                    started = time.perf_counter()
+                    llama = Llama(n_gpu_layers=0, **init_kwargs, **tuning)
+                    context.resources.record_load("llm_sum", model_path.name, time.perf_counter() - started, [model_path], device="cpu")
+                    print(f"    [RefineStage] Loaded llama.cpp model '{model_path.name}' on CPU.")
+                    return llama, "cpu"
+                except Exception as cpu_exc:
+                    print(f"    [RefineStage] Failed to load llama.cpp model on CPU: {cpu_exc}")
+                    return None, "cpu"
+
+        return context.resources.lease_llama("llm_sum", model_path, init_kwargs["n_ctx"], load)
 
     def _summarise_with_llm(
         self,
+        context: StageContext,
         llama: Any,
         system_prompt: str,
         document_type: str,
         source_text: str,
-    ) -> str:
-        """Generate a summary via llama.cpp."""
+        publish: Optional[Callable[[str], None]] = None,
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Generate a summary via llama.cpp.
+
+        Returns the answer text (think blocks removed) together with the
+        token accounting for the run. Answer text is passed to
+        ``publish`` while it is generated.
+        """
         prompt = source_text.strip()
         if len(prompt) > 6000:
             prompt = prompt[:6000]
@@ -211,22 +283,204 @@ class RefineLLMStage(BaseStage):
             "Source text:\n"
             f"{prompt}"
         )
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ]
 
+        think_mode = self._think_mode()
         try:
-            response = llama.create_chat_completion(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_content},
-                ],
-                temperature=0.2,
-                max_tokens=1024,
+            rendered = self._render_prompt(llama, messages, think_mode)
+            prompt_tokens = len(tokenize_prompt(llama, rendered))
+        except Exception as exc:
+            print(f"    [RefineStage] Failed to render chat prompt: {exc}")
+            return "", {}
+        self._prime_prompt_cache(context, llama, system_prompt, think_mode, rendered)
+
+        think_budget = self._think_budget() if think_mode == "budget" else 0
+        answer_budget = self._answer_budget(prompt_tokens, think_budget, context.config.profile)
+        usage: Dict[str, Any] = {
+            "think_mode": think_mode,
+            "prompt_tokens": prompt_tokens,
+            "think_budget": think_budget,
+            "answer_budget": answer_budget,
+            "think_tokens": 0,
+            "answer_tokens": 0,
+            "think_truncated": False,
+        }
+
+        try:
+            content = self._generate_with_think_budget(
+                llama,
+                rendered,
+                think_mode,
+                think_budget,
+                answer_budget,
+                usage,
+                publish or (lambda _text: None),
             )
-            content = (response["choices"][0]["message"]["content"] or "").strip()
         except Exception as exc:
             print(f"    [RefineStage] LLM summary generation failed: {exc}")
-            return ""
+            return "", usage
+
+        print(
+            f"    [RefineStage] Generated {usage['think_tokens']} think token(s) and "
+            f"{usage['answer_tokens']} answer token(s) (mode={think_mode})."
+        )
+        return self._strip_think_tags(content.strip()), usage
+
+    def _render_prompt(self, llama: Any, messages: List[Dict[str, str]], think_mode: str) -> str:
+        """Render the chat prompt, closing the think block when thinking is off."""
+        if think_mode != "off":
+            return render_chat_prompt(llama, messages)
+        rendered = render_chat_prompt(llama, messages, enable_thinking=False)
+        if _THINK_OPEN not in chat_template(llama) or rendered.rstrip().endswith(_THINK_CLOSE):
+            return rendered
+        # Templates that always open a think block (R1 distills, Thinking
+        # releases) ignore enable_thinking; prefill an empty block instead.
+        if rendered.rstrip().endswith(_THINK_OPEN):
+            return rendered + f"\n{_THINK_CLOSE}\n\n"
+        return rendered + f"{_THINK_OPEN}\n\n{_THINK_CLOSE}\n\n"
+
+    def _generate_with_think_budget(
+        self,
+        llama: Any,
+        prompt: str,
+        think_mode: str,
+        think_budget: int,
+        answer_budget: int,
+        usage: Dict[str, Any],
+        publish: Callable[[str], None],
+    ) -> str:
+        """Stream a completion, cutting the think phase short if needed.
+
+        In ``budget`` mode the stream is stopped once ``think_budget``
+        tokens were spent inside the think block. The block is then
+        closed in the prompt and generation resumes; llama.cpp reuses the
+        evaluated prefix so only the closing tag is re-evaluated.
+        """
+        in_think = prompt.rstrip().endswith(_THINK_OPEN)
+        # Room for thinking: the budget, an answer's worth when unbounded, none when off.
+        think_room = {"budget": think_budget, "free": self.MAX_ANSWER_TOKENS}.get(think_mode, 0)
+        max_tokens = answer_budget + think_room
+        # Never ask for more tokens than the context has room for after the prompt.
+        max_tokens = max(1, min(max_tokens, self.N_CTX - int(usage.get("prompt_tokens", 0))))
+        pieces: List[str] = []
+        buffered = ""
+        unpublished = ""
+        stopped_for_budget = False
+
+        def publish_answer(text: str) -> Optional[str]:
+            """Publish answer text, holding back a possible partial ``<think>``.
+
+            Returns the text after ``<think>`` when one opens, else ``None``.
+            """
+            nonlocal unpublished
+            unpublished += text
+            if _THINK_OPEN in unpublished:
+                before, after = unpublished.split(_THINK_OPEN, 1)
+                if before:
+                    publish(before)
+                unpublished = ""
+                return after
+            # A tag split across tokens ("<th" + "ink>") must not reach the clients.
+            hold = len(_THINK_OPEN) - 1
+            if len(unpublished) > hold:
+                publish(unpublished[:-hold])
+                unpublished = unpublished[-hold:]
+            return None
 
-        return self._strip_think_tags(content)
+        for chunk in llama.create_completion(prompt, max_tokens=max_tokens, temperature=0.2, stream=True):
+            text = chunk["choices"][0].get("text") or ""
+            pieces.append(text)
+            if in_think:
+                usage["think_tokens"] += 1
+                buffered += text
+                if _THINK_CLOSE in buffered:
+                    in_think = False
+                    opened = publish_answer(buffered.split(_THINK_CLOSE, 1)[1].lstrip())
+                    if opened is not None:
+                        in_think = True
+                    buffered = opened or ""
+                elif think_mode == "budget" and usage["think_tokens"] >= think_budget:
+                    stopped_for_budget = True
+                    break
+                else:
+                    # Keep just enough text to spot a tag split across tokens.
+                    buffered = buffered[-len(_THINK_CLOSE):]
+            else:
+                usage["answer_tokens"] += 1
+                opened = publish_answer(text)
+                if opened is not None:
+                    in_think = True
+                    buffered = opened
+        if not in_think and unpublished:
+            publish(unpublished)
+
+        generated = "".join(pieces)
+        if not stopped_for_budget:
+            return generated
+
+        usage["think_truncated"] = True
+        print(f"    [RefineStage] Think budget of {think_budget} token(s) reached; resuming for the answer.")
+        resume_prompt = prompt + generated + f"\n{_THINK_CLOSE}\n\n"
+        answer: List[str] = []
+        for chunk in llama.create_completion(resume_prompt, max_tokens=answer_budget, temperature=0.2, stream=True):
+            text = chunk["choices"][0].get("text") or ""
+            answer.append(text)
+            publish(text)
+            usage["answer_tokens"] += 1
+        return "".join(answer)
+
+    def _prime_prompt_cache(
+        self,
+        context: StageContext,
+        llama: Any,
+        system_prompt: str,
+        think_mode: str,
+        rendered: str,
+    ) -> None:
+        """Restore (or build) the cached llama.cpp state for the system prompt."""
+        cache = get_prompt_cache(context.config.root_dir)
+        if cache is None:
+            return
+        try:
+            template_kwargs = {"enable_thinking": False} if think_mode == "off" else {}
+            prefix = render_chat_prefix(llama, system_prompt, **template_kwargs)
+            if not rendered.startswith(prefix):
+                return
+            outcome = cache.prime(llama, prefix)
+            print(f"    [RefineStage] System prompt state: {outcome}.")
+        except Exception as exc:
+            print(f"    [RefineStage] Prompt state cache unavailable ({exc}); evaluating from scratch.")
+            llama.reset()
+
+    def _answer_budget(self, prompt_tokens: int, think_budget: int, profile: Profile) -> int:
+        """Size ``max_tokens`` for the answer from the prompt length and profile."""
+        budget = int(prompt_tokens * profile.summary_ratio)
+        budget = max(self.MIN_ANSWER_TOKENS, min(profile.max_summary_tokens, budget))
+        available = self.N_CTX - prompt_tokens - think_budget - 16
+        return max(1, min(budget, available))
+
+    def _think_mode(self) -> str:
+        """Return the think mode selected through ``REFINE_THINK_MODE``."""
+        env_value = (os.getenv("REFINE_THINK_MODE") or "").strip().lower()
+        if not env_value:
+            return _THINK_MODES[0]
+        if env_value not in _THINK_MODES:
+            print(f"    [RefineStage] Invalid REFINE_THINK_MODE='{env_value}'; using '{_THINK_MODES[0]}'.")
+            return _THINK_MODES[0]
+        return env_value
+
+    def _think_budget(self) -> int:
+        """Return the maximum number of think tokens (``REFINE_THINK_BUDGET``)."""
+        env_value = os.getenv("REFINE_THINK_BUDGET")
+        if env_value:
+            try:
+                return max(0, int(env_value))
+            except ValueError:
+                print(f"    [RefineStage] Invalid REFINE_THINK_BUDGET='{env_value}'; ignoring.")
+        return self.DEFAULT_THINK_BUDGET
 
     def _load_system_prompt(self, context: StageContext, document_type: str) -> str:
         """Load the system prompt for the given document type."""
@@ -375,7 +629,8 @@ class RefineLLMStage(BaseStage):
         return -1
 
     def _release_unused_resources(self, context: StageContext) -> None:
-        """Release heavy resources before loading the LLM."""
-        release_whisper = getattr(context.resources, "release_whisper_model", None)
-        if callable(release_whisper):
-            release_whisper()
+        """Hand the speech models back to the budget before loading the LLM."""
+        for release_name in ("release_whisper_model", "release_diarization_pipeline"):
+            release = getattr(context.resources, release_name, None)
+            if callable(release):
+                release()
@@ -2,31 +2,105 @@
 Speech‑to‑text transcription stage.
 
 This stage transcribes the audio chunks produced by the normalisation
-stage. When the openai Whisper package is available the model size
-specified in the configuration is loaded via the resource manager
+stage. The ASR backend configured in ``ai.config.json``
+(:mod:`apps.ai.asr`; openai-whisper or faster-whisper) is loaded via the
+resource manager with the model size specified in the configuration
 and used to produce time‑aligned transcriptions. Otherwise a
 placeholder transcription is produced for each chunk.
+
+On CPU-only hosts with several chunks the stage can fan the chunks out
+to a process pool (:mod:`apps.ai.pipeline.parallel`). Each worker loads
+its own ASR backend with a fixed number of threads and receives the
+decoded chunk PCM through shared memory. The pool is leased from the
+memory budget like a model (:meth:`apps.ai.resources.Resources.worker_pool`)
+and stays warm between runs. ``STT_WORKERS`` overrides the worker count;
+``1`` keeps the single-process loop.
+
+When ``context.is_korean_only`` is set the language is pinned to Korean,
+which skips Whisper's per-chunk language detection, and the model named
+by ``WHISPER_KO_MODEL`` or ``selected["whisper_ko"]`` in
+``ai.config.json`` (a Korean fine-tune or a smaller size) is used instead
+of ``selected["whisper"]`` when one is configured.
+
+Decoding options (beam size, temperature fallback, conditioning on the
+previous window) come from the run's processing profile
+(:mod:`apps.ai.profiles`).
+
+In-process, the next chunk is decoded on a background thread while the
+current one is transcribed (:mod:`apps.ai.pipeline.prefetch`).
 """
 
 from __future__ import annotations
 
-from typing import List, Dict
+import os
+from typing import Any, Dict, List, Optional
 
 import torch
 from ..base import BaseStage, StageContext, StageResult
+from ..prefetch import prefetch
+from ..parallel import SharedArray, WorkerPool, attach_array, parse_worker_setting
+from ...accel import accel_mode
+from ...asr import SAMPLE_RATE, AsrResult, decode_audio, load_backend
+from ...residency import whisper_footprint
+
+_worker_backend: Any = None
+
+
+def _init_worker(
+    backend: str,
+    model_size: str,
+    compute_type: Optional[str],
+    threads: int,
+    cpu_accel: str,
+) -> None:
+    """Process-pool initialiser: load a private ASR backend on CPU."""
+    global _worker_backend
+    torch.set_num_threads(threads)
+    _worker_backend = load_backend(
+        backend,
+        model_size,
+        "cpu",
+        compute_type=compute_type,
+        threads=threads,
+        cpu_accel=cpu_accel,
+    )
+
+
+def _transcribe_shared_chunk(
+    descriptor: SharedArray,
+    sample_rate: int,
+    language: Optional[str],
+    options: Dict[str, Any],
+) -> AsrResult:
+    return _worker_backend.transcribe(attach_array(descriptor), language=language, **options)
 
 
 class STTStage(BaseStage):
     name = "stt"
+    resource = "gpu"
 
     def run(self, context: StageContext) -> StageResult:
         chunks = context.data.get("chunks") or []
         transcripts: List[Dict[str, float | str]] = []
-        model = context.resources.whisper_model
-        print(f"    [STTStage] Starting transcription for {len(chunks)} chunk(s).")
-        if model is None:
+        model_size = self.model_size(context)
+        language = "ko" if context.is_korean_only else None
+        options = context.config.profile.decoding_options()
+        print(
+            f"    [STTStage] Starting transcription for {len(chunks)} chunk(s) "
+            f"(model={model_size}, language={language or 'auto'}, profile={context.config.profile.name})."
+        )
+        pooled = self._transcribe_in_pool(context, chunks, model_size, language, options)
+        if pooled is not None:
+            for chunk, result in zip(chunks, pooled):
+                transcripts.extend(self._absolute_segments(chunk, result))
+            context.data["stt"] = transcripts
+            print(f"    [STTStage] Completed transcription with {len(transcripts)} segment(s).")
+            return StageResult(name=self.name, success=True, data=transcripts)
+
+        backend = context.resources.load_asr_backend(model_size)
+        if backend is None:
             # Placeholder transcripts
-            print("    [STTStage] Whisper model unavailable; returning placeholder transcripts.")
+            print("    [STTStage] ASR backend unavailable; returning placeholder transcripts.")
             for chunk in chunks:
                 transcripts.append({
                     "start": chunk.start,
@@ -35,59 +109,26 @@ class STTStage(BaseStage):
                     "language": None,
                 })
             context.data["stt"] = transcripts
-            return StageResult(name=self.name, success=False, data=transcripts, message="Whisper model unavailable")
+            return StageResult(name=self.name, success=False, data=transcripts, message="ASR backend unavailable")
+        device = backend.device
+        print(f"    [STTStage] {backend.name} model running on device: {device}.")
+        # Use the backend to transcribe each chunk
         try:
-            device = next(model.parameters()).device  # type: ignore[attr-defined]
-        except (StopIteration, AttributeError):
-            device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"    [STTStage] Whisper model running on device: {device}.")
-        # Use whisper to transcribe each chunk
-        try:
-            for chunk in chunks:
-                fp16 = device.type == "cuda"
-                print(f"    [STTStage] Transcribing chunk {chunk.id} on {device} (fp16={fp16}).")
+            decoded = prefetch(chunks, lambda chunk: decode_audio(backend.name, str(chunk.file_path)))
+            for chunk, audio in decoded:
+                print(f"    [STTStage] Transcribing chunk {chunk.id} on {device}.")
                 try:
-                    result = model.transcribe(str(chunk.file_path), language=None, fp16=fp16)
+                    result = backend.transcribe(audio, language=language, **options)
                 except RuntimeError as exc:
-                    if device.type == "cuda":
+                    if device == "cuda":
                         print(f"    [STTStage] CUDA transcription failed for chunk {chunk.id}: {exc}. Falling back to CPU.")
-                        model.to("cpu")  # type: ignore[attr-defined]
-                        device = torch.device("cpu")
-                        result = model.transcribe(str(chunk.file_path), language=None, fp16=False)
+                        backend.to_cpu()
+                        device = "cpu"
+                        result = backend.transcribe(audio, language=language, **options)
                         print(f"    [STTStage] Successfully transcribed chunk {chunk.id} on CPU fallback.")
                     else:
                         raise
-                segs = result.get("segments") or []
-                chunk_start = getattr(chunk, "start", 0.0)
-                chunk_end = getattr(chunk, "end", chunk_start)
-                has_bounds = chunk_end > chunk_start
-                tolerance = 0.5  # seconds; allow minor drift from ffmpeg/Whisper timing
-                for seg in segs:
-                    raw_start = float(seg.get("start", 0.0))
-                    raw_end = float(seg.get("end", raw_start))
-                    if raw_end <= raw_start:
-                        continue
-                    start = chunk_start + raw_start
-                    end = chunk_start + raw_end
-                    if has_bounds:
-                        if end < chunk_start - tolerance or start > chunk_end + tolerance:
-                            print(
-                                f"    [STTStage] Skipping segment outside chunk '{chunk.id}' bounds: "
-                                f"    start={start:.2f}, end={end:.2f}, chunk_end={chunk_end:.2f}."
-                            )
-                            continue
-                        start = max(start, chunk_start)
-                        end = min(end, chunk_end)
-                        if end - start <= 1e-3:
-                            continue
-                    text = seg.get("text", "").strip()
-                    lang = result.get("language")
-                    transcripts.append({
-                        "start": start,
-                        "end": end,
-                        "text": text,
-                        "language": lang,
-                    })
+                transcripts.extend(self._absolute_segments(chunk, result))
             context.data["stt"] = transcripts
             print(f"    [STTStage] Completed transcription with {len(transcripts)} segment(s).")
             return StageResult(name=self.name, success=True, data=transcripts)
@@ -104,3 +145,125 @@ class STTStage(BaseStage):
                 })
             context.data["stt"] = fallback
             return StageResult(name=self.name, success=False, data=fallback, message=str(e))
+
+    @staticmethod
+    def model_size(context: StageContext) -> Optional[str]:
+        """Whisper model for this run; Korean-only runs may use their own."""
+        selected = context.config.selected_models
+        if context.is_korean_only:
+            korean_model = os.getenv("WHISPER_KO_MODEL") or selected.get("whisper_ko")
+            if korean_model:
+                return korean_model
+        return selected.get("whisper")
+
+    def _transcribe_in_pool(
+        self,
+        context: StageContext,
+        chunks: List[Any],
+        model_size: Optional[str],
+        language: Optional[str],
+        options: Dict[str, Any],
+    ) -> Optional[List[AsrResult]]:
+        """Transcribe chunks in worker processes.
+
+        Returns ``None`` when the pool is not used or fails, in which case
+        the caller falls back to the in-process loop.
+        """
+        if len(chunks) < 2:
+            return None
+        pool = self.worker_pool(context, model_size)
+        if pool is None:
+            return None
+
+        backend = context.config.asr_backend
+        print(
+            f"    [STTStage] Transcribing {len(chunks)} chunk(s) with {pool.workers} {backend} worker(s) "
+            f"x {pool.threads} thread(s)."
+        )
+        try:
+            results = pool.map(
+                chunks,
+                lambda chunk: (decode_audio(backend, str(chunk.file_path)), SAMPLE_RATE),
+                _transcribe_shared_chunk,
+                lambda chunk: (language, options),
+            )
+        except Exception as exc:
+            print(f"    [STTStage] Worker pool failed ({exc}); transcribing in-process.")
+            context.resources.discard("whisper_pool", f"worker pool failed: {exc}")
+            return None
+        context.resources.end_lease("whisper_pool")
+        return results
+
+    @staticmethod
+    def worker_pool(context: StageContext, model_size: Optional[str]) -> Optional[WorkerPool]:
+        """Lease the CPU worker pool for ``model_size``; ``None`` when it does not apply.
+
+        The pool is sized for the host and the RAM budget rather than the
+        run, so every run reuses the same warm pool; :mod:`apps.ai.preload`
+        starts it the same way. The caller ends the ``whisper_pool`` lease.
+        """
+        if not model_size or torch.cuda.is_available():
+            return None
+        env_value = os.getenv("STT_WORKERS")
+        try:
+            requested = parse_worker_setting(env_value)
+        except ValueError:
+            print(f"    [STTStage] Invalid STT_WORKERS='{env_value}'; using automatic sizing.")
+            requested = None
+        backend = context.config.asr_backend
+        compute_type = context.config.asr_compute_type
+        cpu_accel = accel_mode(context.config)
+        worker_footprint = whisper_footprint(model_size, "cpu", compute_type, cpu_accel)
+        workers, threads = context.resources.pool_workers("whisper_pool", requested, worker_footprint)
+        if workers < 2:
+            return None
+        return context.resources.worker_pool(
+            "whisper_pool",
+            f"{backend}:{model_size}",
+            workers,
+            threads,
+            _init_worker,
+            (backend, model_size, compute_type, threads, cpu_accel),
+            worker_footprint,
+        )
+
+    @staticmethod
+    def _absolute_segments(chunk: Any, result: AsrResult) -> List[Dict[str, float | str]]:
+        """Map chunk-relative ASR segments onto the recording timeline.
+
+        Chunks trimmed by the VAD stage are mapped through their
+        ``speech_map`` first.
+        """
+        transcripts: List[Dict[str, float | str]] = []
+        segs = result.get("segments") or []
+        chunk_start = getattr(chunk, "start", 0.0)
+        chunk_end = getattr(chunk, "end", chunk_start)
+        has_bounds = chunk_end > chunk_start
+        tolerance = 0.5  # seconds; allow minor drift from ffmpeg/Whisper timing
+        for seg in segs:
+            raw_start = float(seg.get("start", 0.0))
+            raw_end = float(seg.get("end", raw_start))
+            if raw_end <= raw_start:
+                continue
+            start = chunk_start + chunk.to_original(raw_start)
+            end = chunk_start + chunk.to_original(raw_end, is_end=True)
+            if has_bounds:
+                if end < chunk_start - tolerance or start > chunk_end + tolerance:
+                    print(
+                        f"    [STTStage] Skipping segment outside chunk '{chunk.id}' bounds: "
+                        f"    start={start:.2f}, end={end:.2f}, chunk_end={chunk_end:.2f}."
+                    )
+                    continue
+                start = max(start, chunk_start)
+                end = min(end, chunk_end)
+                if end - start <= 1e-3:
+                    continue
+            text = seg.get("text", "").strip()
+            lang = result.get("language")
+            transcripts.append({
+                "start": start,
+                "end": end,
+                "text": text,
+                "language": lang,
+            })
+        return transcripts
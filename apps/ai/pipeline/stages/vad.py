@@ -0,0 +1,188 @@
+"""
+Voice activity detection stage.
+
+Lectures and meetings contain long breaks that Whisper and pyannote
+would otherwise process second by second. This stage runs a frame
+energy detector over every chunk (vectorised with NumPy), writes the
+speech spans of each chunk back to back into ``vad/<chunk>.wav`` and
+points the chunk at that file. The chunk keeps its original
+``start``/``end`` and gains a ``speech_map`` that downstream stages use
+(:meth:`~apps.ai.types.AudioChunk.to_original`) to report timestamps on
+the original timeline. Chunks without any speech are dropped.
+
+The detector compares each 30 ms frame's energy with an adaptive noise
+floor (the 10th percentile of frame energies) plus ``VAD_MARGIN_DB``,
+capped below the loudest frames so recordings without pauses pass
+through whole. Pauses shorter than ``VAD_MIN_SILENCE`` seconds are
+kept, so only real breaks are removed. ``VAD_MODE=off`` disables the stage.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from ..base import BaseStage, StageContext, StageResult
+from ...types import AudioChunk
+
+_VAD_MODES: tuple[str, ...] = ("energy", "off")
+_SILENCE_DB = -60.0
+
+
+def detect_speech(
+    pcm: np.ndarray,
+    sample_rate: int,
+    *,
+    frame_seconds: float = 0.03,
+    margin_db: float = 12.0,
+    min_silence: float = 1.0,
+    min_speech: float = 0.25,
+    padding: float = 0.3,
+) -> List[Tuple[float, float]]:
+    """Return ``(start, end)`` speech spans in seconds.
+
+    Parameters
+    ----------
+    pcm : np.ndarray
+        Mono samples.
+    sample_rate : int
+        Sample rate of ``pcm``.
+    margin_db : float
+        How far above the noise floor a frame must be to count as speech.
+    min_silence : float
+        Gaps shorter than this are bridged.
+    min_speech : float
+        Speech bursts shorter than this (after bridging) are dropped.
+    padding : float
+        Seconds added on both sides of every span.
+    """
+    duration = len(pcm) / sample_rate
+    frame = max(1, int(sample_rate * frame_seconds))
+    count = len(pcm) // frame
+    if count == 0:
+        return [(0.0, duration)] if len(pcm) else []
+
+    frames = np.asarray(pcm[: count * frame], dtype=np.float32).reshape(count, frame)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    floor, loud = np.percentile(energy_db, [10, 90])
+    # Recordings without pauses have no noise floor to measure; never set
+    # the threshold above the loud frames, and treat digital silence as silence.
+    threshold = max(min(floor + margin_db, loud - margin_db / 2), _SILENCE_DB)
+    speech = energy_db > threshold
+
+    # Run boundaries of the boolean mask, in frames.
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], speech.astype(np.int8), [0]))))
+    starts, ends = edges[0::2], edges[1::2]
+    if starts.size == 0:
+        return []
+    keep_gap = (starts[1:] - ends[:-1]) * frame_seconds >= min_silence
+    starts = np.concatenate((starts[:1], starts[1:][keep_gap]))
+    ends = np.concatenate((ends[:-1][keep_gap], ends[-1:]))
+    long_enough = (ends - starts) * frame_seconds >= min_speech
+    starts, ends = starts[long_enough], ends[long_enough]
+
+    spans: List[Tuple[float, float]] = []
+    for start, end in zip(starts * frame / sample_rate - padding, ends * frame / sample_rate + padding):
+        start, end = max(0.0, float(start)), min(duration, float(end))
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+class VADStage(BaseStage):
+    name = "vad"
+    resource = "cpu"
+
+    # Keep the chunk as is when trimming would save less than this share.
+    MIN_TRIMMED_RATIO = 0.05
+
+    def run(self, context: StageContext) -> StageResult:
+        chunks: List[AudioChunk] = context.data.get("chunks") or []
+        mode = (os.getenv("VAD_MODE") or _VAD_MODES[0]).strip().lower()
+        if mode not in _VAD_MODES:
+            print(f"    [VADStage] Invalid VAD_MODE='{mode}'; using '{_VAD_MODES[0]}'.")
+            mode = _VAD_MODES[0]
+        if mode == "off" or not chunks:
+            print("    [VADStage] Voice activity detection disabled; passing chunks through.")
+            return StageResult(name=self.name, success=True, data=None)
+
+        out_dir = context.base_dir / self.name
+        out_dir.mkdir(parents=True, exist_ok=True)
+        report: List[Dict[str, Any]] = []
+        kept: List[AudioChunk] = []
+        total = speech_total = 0.0
+        for chunk in chunks:
+            try:
+                pcm, sr = sf.read(chunk.file_path, dtype="float32", always_2d=True)
+            except Exception as exc:
+                print(f"    [VADStage] Could not read chunk {chunk.id} ({exc}); keeping it untrimmed.")
+                kept.append(chunk)
+                continue
+            pcm = pcm.mean(axis=1)
+            length = len(pcm) / sr
+            spans = detect_speech(
+                pcm,
+                sr,
+                margin_db=self._env_float("VAD_MARGIN_DB", 12.0),
+                min_silence=self._env_float("VAD_MIN_SILENCE", 1.0),
+            )
+            speech = sum(end - start for start, end in spans)
+            total += length
+            speech_total += speech
+            report.append({"chunk": chunk.id, "seconds": length, "speech_seconds": speech, "spans": spans})
+
+            if not spans:
+                print(f"    [VADStage] No speech in chunk {chunk.id}; dropping it.")
+                continue
+            if length - speech < self.MIN_TRIMMED_RATIO * length:
+                kept.append(chunk)
+                continue
+
+            speech_map: List[Tuple[float, float, float]] = []
+            pieces: List[np.ndarray] = []
+            offset = 0.0
+            for start, end in spans:
+                piece = pcm[int(round(start * sr)):int(round(end * sr))]
+                speech_map.append((start, end, offset))
+                pieces.append(piece)
+                offset += len(piece) / sr
+            trimmed_path = out_dir / f"{chunk.id}.wav"
+            sf.write(trimmed_path, np.concatenate(pieces), sr, subtype="PCM_16")
+            chunk.file_path = trimmed_path
+            chunk.speech_map = speech_map
+            kept.append(chunk)
+            print(f"    [VADStage] Chunk {chunk.id}: kept {speech:.1f}s of {length:.1f}s in {len(spans)} span(s).")
+
+        context.data["chunks"] = kept
+        summary = {
+            "seconds": total,
+            "speech_seconds": speech_total,
+            "removed_ratio": (1.0 - speech_total / total) if total else 0.0,
+            "chunks": report,
+        }
+        try:
+            (out_dir / "vad.json").write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        except Exception as exc:
+            print(f"    [VADStage] Failed to write vad.json: {exc}")
+        print(f"    [VADStage] Removed {summary['removed_ratio']:.0%} of the audio as non-speech.")
+        return StageResult(
+            name=self.name,
+            success=True,
+            data={key: value for key, value in summary.items() if key != "chunks"},
+        )
+
+    @staticmethod
+    def _env_float(name: str, default: float) -> float:
+        env_value = os.getenv(name)
+        if env_value:
+            try:
+                return float(env_value)
+            except ValueError:
+                print(f"    [VADStage] Invalid {name}='{env_value}'; using {default}.")
+        return default
@@ -0,0 +1,228 @@
+"""
+Model preloading and readiness.
+
+The first job after a deploy otherwise pays for every model load in
+sequence. :func:`start_preload` loads the models named in
+``selected["preload"]`` of ``ai.config.json`` (or ``MODEL_PRELOAD``, a
+comma-separated list) on a background thread when the API starts:
+
+``whisper``
+    The ASR backend for ``selected["whisper"]``, or the STT stage's
+    worker pool on CPU-only hosts where the stage uses one.
+``diarization``
+    The pyannote pipeline, or the diarisation stage's worker pool.
+``llm_cat`` / ``llm_sum``
+    The categorisation and summary llama.cpp models.
+
+Every model is leased from the memory budget
+(:mod:`apps.ai.residency`) exactly as a job would, runs one tiny dummy
+inference so kernels are compiled and buffers allocated, and is handed
+back so it stays resident for the first job. All four are preloaded by
+default; ``MODEL_PRELOAD=none`` disables preloading.
+
+:func:`readiness` reports progress; the API exposes it as ``/ready`` so
+load balancers can hold traffic until the node is warm.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from .config import Config
+    from .resources import Resources
+
+PRELOAD_NAMES: tuple[str, ...] = ("whisper", "diarization", "llm_cat", "llm_sum")
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"status": "idle", "models": {}}
+_thread: Optional[threading.Thread] = None
+
+
+def preload_list(config: "Config") -> List[str]:
+    """Models to preload, from ``MODEL_PRELOAD`` or ``selected["preload"]``."""
+    value = os.getenv("MODEL_PRELOAD")
+    if value is not None:
+        names = [] if value.strip().lower() in ("", "0", "none", "off") else value.split(",")
+    else:
+        names = config.selected_models.get("preload", list(PRELOAD_NAMES))
+    resolved: List[str] = []
+    for name in names:
+        name = str(name).strip().lower()
+        if name not in PRELOAD_NAMES:
+            print(f"[Preload] Ignoring unknown model '{name}'; expected one of {', '.join(PRELOAD_NAMES)}.")
+        elif name not in resolved:
+            resolved.append(name)
+    return resolved
+
+
+def _preload_context(resources: "Resources") -> Any:
+    from .pipeline.base import StageContext
+
+    config = resources.config
+    return StageContext(
+        run_id="preload",
+        config=config,
+        resources=resources,
+        base_dir=config.runs_dir / "preload",
+        input_file=config.runs_dir / "preload" / "silence.wav",
+    )
+
+
+def _leased_device(resources: "Resources", kind: str) -> str:
+    for resident in resources.budget_report()["resident"]:
+        if resident["kind"] == kind and resident["leased"]:
+            return resident["device"]
+    return "cpu"
+
+
+def _warm_whisper(resources: "Resources") -> Optional[str]:
+    import numpy as np
+
+    from .asr import SAMPLE_RATE
+    from .pipeline.stages.stt import STTStage
+
+    context = _preload_context(resources)
+    pool = STTStage.worker_pool(context, STTStage.model_size(context))
+    if pool is not None:
+        resources.end_lease("whisper_pool")
+        return f"cpu ({pool.workers} workers)"
+    backend = resources.asr_backend
+    if backend is None:
+        return None
+    backend.transcribe(np.zeros(SAMPLE_RATE, dtype=np.float32), language="ko", temperature=(0.0,))
+    device = backend.device
+    resources.release_whisper_model()
+    return device
+
+
+def _warm_diarization(resources: "Resources") -> Optional[str]:
+    import torch
+
+    from .pipeline.stages.diarize import DiarizeStage, diarize_waveform
+
+    pool = DiarizeStage.worker_pool(_preload_context(resources))
+    if pool is not None:
+        resources.end_lease("diarization_pool")
+        return f"cpu ({pool.workers} workers)"
+    pipeline = resources.diarization_pipeline
+    if pipeline is None:
+        return None
+    # Low-level noise: pure silence can short-circuit segmentation before the embedding model runs.
+    waveform = torch.randn(1, 16000 * 5) * 1e-3
+    diarize_waveform(pipeline, waveform, 16000, "preload")
+    device = _leased_device(resources, "diarization")
+    resources.release_diarization_pipeline()
+    return device
+
+
+def _warm_llama(kind: str) -> Callable[["Resources"], Optional[str]]:
+    def warm(resources: "Resources") -> Optional[str]:
+        from .pipeline.stages import CategorizeLLMStage, RefineLLMStage
+
+        stage = CategorizeLLMStage() if kind == "llm_cat" else RefineLLMStage()
+        llama = stage._load_llama_model(_preload_context(resources))
+        if llama is None:
+            return None
+        llama.create_completion("Hello", max_tokens=1, temperature=0.0)
+        if getattr(llama, "remote", False):
+            return f"server ({llama.url})"
+        device = _leased_device(resources, kind)
+        resources.end_lease(kind)
+        return device
+
+    return warm
+
+
+_WARMERS: Dict[str, Callable[["Resources"], Optional[str]]] = {
+    "whisper": _warm_whisper,
+    "diarization": _warm_diarization,
+    "llm_cat": _warm_llama("llm_cat"),
+    "llm_sum": _warm_llama("llm_sum"),
+}
+
+
+def _set_model(name: str, **fields: Any) -> None:
+    with _lock:
+        _state["models"].setdefault(name, {}).update(fields)
+
+
+def preload_models(config: "Config", names: List[str], profile: Optional[str] = None) -> Dict[str, Any]:
+    """Load, exercise and hand back ``names`` in pipeline order; return :func:`readiness`.
+
+    ``profile`` selects the processing profile whose models are loaded
+    (default: ``AI_PROFILE`` or ``selected["profile"]``).
+    """
+    from .profiles import apply_profile
+    from .resources import Resources
+
+    # Jobs run with a profile applied; preload the same model selection.
+    resources = Resources(apply_profile(config, profile))
+    with _lock:
+        _state["status"] = "warming"
+        _state["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        for name in names:
+            _state["models"][name] = {"status": "pending"}
+    try:
+        for name in names:
+            _set_model(name, status="loading")
+            started = time.perf_counter()
+            try:
+                device = _WARMERS[name](resources)
+            except Exception as exc:
+                print(f"[Preload] {name} failed: {exc}")
+                _set_model(name, status="failed", error=str(exc), seconds=round(time.perf_counter() - started, 2))
+                continue
+            seconds = round(time.perf_counter() - started, 2)
+            if device is None:
+                print(f"[Preload] {name} unavailable; jobs will use the stage fallback.")
+                _set_model(name, status="unavailable", seconds=seconds)
+            else:
+                print(f"[Preload] {name} ready on {device} in {seconds:.1f}s.")
+                _set_model(name, status="ready", device=device, seconds=seconds)
+    finally:
+        resources.close()
+        with _lock:
+            _state["status"] = "ready"
+            _state["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return readiness()
+
+
+def start_preload(config: "Config") -> Optional[threading.Thread]:
+    """Preload the configured models on a daemon thread (once per process)."""
+    global _thread
+    names = preload_list(config)
+    with _lock:
+        if _thread is not None:
+            return _thread
+        if not names:
+            _state["status"] = "ready"
+            return None
+        _thread = threading.Thread(target=preload_models, args=(config, names), name="model-preload", daemon=True)
+        _state["status"] = "warming"
+    _thread.start()
+    return _thread
+
+
+def mark_ready() -> None:
+    """Report ready without preloading (e.g. no ``ai.config.json`` yet)."""
+    with _lock:
+        _state["status"] = "ready"
+
+
+def readiness() -> Dict[str, Any]:
+    """``{"ready": bool, "status": ..., "models": {name: {...}}}``.
+
+    ``ready`` turns true once every preload attempt has finished; models
+    that failed or are unavailable are listed but do not block
+    readiness, since jobs fall back the same way.
+    """
+    with _lock:
+        return {
+            "ready": _state["status"] == "ready",
+            **{key: value for key, value in _state.items() if key != "models"},
+            "models": {name: dict(info) for name, info in _state["models"].items()},
+        }
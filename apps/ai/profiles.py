@@ -0,0 +1,220 @@
+"""
+Speed/quality processing profiles.
+
+The bootstrap picks one set of models for the hardware
+(:func:`apps.ai.bootstrap.resolve.pick_models`). A profile adjusts that
+selection per run so triage material can be processed far more cheaply
+than recordings that are archived:
+
+``fast``
+    Whisper two sizes below the hardware pick, greedy decoding without
+    temperature fallback or conditioning on the previous window, no
+    diarisation, a Q4 summary model and short summaries.
+``balanced``
+    The hardware pick with Whisper's default decoding (the behaviour
+    before profiles existed).
+``accurate``
+    The hardware pick with beam search, a Q8 summary model and longer
+    summaries.
+
+A profile's summary quantisation is only used when that GGUF is already
+in the local Hugging Face cache and is no larger than the bootstrap's
+pick, which was sized for the hardware; otherwise the bootstrap's model
+is kept, so a run never downloads a model or outgrows the memory tier.
+
+The profile comes from the caller (the API passes the job's or
+subject's ``processing_profile``), ``AI_PROFILE`` or ``selected.profile``
+in ``ai.config.json``. Fields of a profile can be overridden under
+``selected.profiles.<name>``, e.g. ``{"fast": {"whisper": "base"}}``.
+"""
+
+from __future__ import annotations
+
+import copy
+import dataclasses
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .config import Config
+
+PROFILE_NAMES: tuple[str, ...] = ("fast", "balanced", "accurate")
+DEFAULT_PROFILE = "balanced"
+
+# openai-whisper sizes from cheapest to most accurate.
+WHISPER_TIERS: tuple[str, ...] = ("tiny", "base", "small", "medium", "large-v3")
+_FALLBACK_TEMPERATURES: Tuple[float, ...] = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Settings applied to one pipeline run.
+
+    Attributes
+    ----------
+    name : str
+        One of :data:`PROFILE_NAMES`.
+    whisper_step : int
+        Whisper size relative to the hardware pick, in :data:`WHISPER_TIERS`.
+    whisper : Optional[str]
+        Explicit Whisper size or checkpoint; overrides ``whisper_step``.
+    beam_size : Optional[int]
+        Beam width; ``None`` decodes greedily.
+    temperature : Tuple[float, ...]
+        Temperatures tried in order when a window fails Whisper's
+        compression/log-probability checks; ``(0.0,)`` disables fallback.
+    condition_on_previous_text : bool
+        Prompt each window with the previous window's text.
+    diarize : bool
+        Run speaker diarisation; otherwise one placeholder speaker is used.
+    llm_sum_allow_pattern : Optional[str]
+        GGUF quantisation pattern for the summary model; ``None`` keeps
+        the bootstrap selection.
+    summary_ratio : float
+        Answer tokens per prompt token for the summary.
+    max_summary_tokens : int
+        Upper bound on answer tokens for the summary.
+    """
+
+    name: str
+    whisper_step: int = 0
+    whisper: Optional[str] = None
+    beam_size: Optional[int] = None
+    temperature: Tuple[float, ...] = _FALLBACK_TEMPERATURES
+    condition_on_previous_text: bool = True
+    diarize: bool = True
+    llm_sum_allow_pattern: Optional[str] = None
+    summary_ratio: float = 0.35
+    max_summary_tokens: int = 1536
+
+    def decoding_options(self) -> Dict[str, Any]:
+        """Keyword arguments for :meth:`apps.ai.asr.AsrBackend.transcribe`."""
+        options: Dict[str, Any] = {
+            "temperature": self.temperature,
+            "condition_on_previous_text": self.condition_on_previous_text,
+        }
+        if self.beam_size:
+            options["beam_size"] = self.beam_size
+        return options
+
+
+PROFILES: Dict[str, Profile] = {
+    "fast": Profile(
+        name="fast",
+        whisper_step=-2,
+        temperature=(0.0,),
+        condition_on_previous_text=False,
+        diarize=False,
+        llm_sum_allow_pattern="*Q4_K_M*",
+        summary_ratio=0.2,
+        max_summary_tokens=768,
+    ),
+    "balanced": Profile(name="balanced"),
+    "accurate": Profile(
+        name="accurate",
+        beam_size=5,
+        llm_sum_allow_pattern="*Q8_0*",
+        summary_ratio=0.5,
+        max_summary_tokens=2048,
+    ),
+}
+
+
+def profile_name(name: Optional[str], selected: Optional[Dict[str, Any]] = None) -> str:
+    """Resolve ``name``, ``AI_PROFILE`` or ``selected.profile`` to a known profile."""
+    selected = selected or {}
+    value = (name or os.getenv("AI_PROFILE") or selected.get("profile") or DEFAULT_PROFILE).strip().lower()
+    if value not in PROFILES:
+        print(f"[Profile] Unknown profile '{value}'; using '{DEFAULT_PROFILE}'.")
+        return DEFAULT_PROFILE
+    return value
+
+
+def get_profile(name: Optional[str] = None, selected: Optional[Dict[str, Any]] = None) -> Profile:
+    """Return the profile called ``name`` with ``selected.profiles`` overrides applied."""
+    selected = selected or {}
+    resolved = profile_name(name, selected)
+    profile = PROFILES[resolved]
+    overrides = dict((selected.get("profiles") or {}).get(resolved) or {})
+    if "temperature" in overrides:
+        value = overrides["temperature"]
+        overrides["temperature"] = tuple(value) if isinstance(value, (list, tuple)) else (float(value),)
+    known = {field.name for field in dataclasses.fields(Profile)} - {"name"}
+    unknown = set(overrides) - known
+    if unknown:
+        print(f"[Profile] Ignoring unknown override(s) for '{resolved}': {', '.join(sorted(unknown))}.")
+    return dataclasses.replace(profile, **{key: value for key, value in overrides.items() if key in known})
+
+
+def step_whisper(model_size: Optional[str], step: int) -> Optional[str]:
+    """Move ``model_size`` ``step`` tiers along :data:`WHISPER_TIERS`.
+
+    Sizes outside the ladder (``turbo``, checkpoint paths) are kept as is.
+    The result never exceeds ``model_size``, which the bootstrap sized
+    for the available memory.
+    """
+    if not model_size or not step:
+        return model_size
+    # "large", "large-v2" and "large-v3" share the top tier.
+    tier_name = "large-v3" if model_size.startswith("large") else model_size
+    if tier_name not in WHISPER_TIERS:
+        return model_size
+    index = WHISPER_TIERS.index(tier_name) + step
+    index = max(0, min(index, WHISPER_TIERS.index(tier_name)))
+    return WHISPER_TIERS[index]
+
+
+def _cached_gguf(repo_id: Optional[str], pattern: Optional[str]) -> Optional[Path]:
+    """The cached GGUF of ``repo_id`` matching ``pattern``, without downloading."""
+    if not repo_id or not pattern:
+        return None
+    try:
+        from huggingface_hub import snapshot_download
+
+        cache_dir = Path(snapshot_download(repo_id=repo_id, allow_patterns=[pattern], local_files_only=True))
+    except Exception:
+        return None
+    matches = sorted(path for path in cache_dir.rglob(pattern) if path.suffix.lower() == ".gguf")
+    return matches[-1] if matches else None
+
+
+def summary_quant_usable(selected: Dict[str, Any], pattern: str) -> bool:
+    """Whether the summary model quantised as ``pattern`` can replace the bootstrap pick.
+
+    It must be cached already and no larger than the cached bootstrap
+    pick, so applying a profile never downloads a model or exceeds the
+    memory tier :func:`~apps.ai.bootstrap.resolve.pick_models` chose.
+    """
+    repo_id = selected.get("llm_sum_repo_id")
+    candidate = _cached_gguf(repo_id, pattern)
+    picked = _cached_gguf(repo_id, selected.get("llm_sum_allow_pattern"))
+    return candidate is not None and picked is not None and candidate.stat().st_size <= picked.stat().st_size
+
+
+def apply_profile(config: "Config", name: Optional[str] = None) -> "Config":
+    """Copy ``config`` with the profile's model choices applied.
+
+    The resolved profile is stored under ``payload["profile"]`` and read
+    back by the stages through :attr:`apps.ai.config.Config.profile`.
+    """
+    profile = get_profile(name, config.selected_models)
+    payload = copy.deepcopy(config.payload)
+    selected = payload.setdefault("selected", {})
+    selected["whisper"] = profile.whisper or step_whisper(selected.get("whisper"), profile.whisper_step)
+    pattern = profile.llm_sum_allow_pattern
+    if pattern and pattern != selected.get("llm_sum_allow_pattern"):
+        if summary_quant_usable(selected, pattern):
+            selected["llm_sum_allow_pattern"] = pattern
+        else:
+            print(
+                f"[Profile] '{profile.name}': summary model '{pattern}' is not cached or is larger than "
+                f"the hardware pick; keeping '{selected.get('llm_sum_allow_pattern')}'."
+            )
+    payload["profile"] = dataclasses.asdict(profile)
+    print(
+        f"[Profile] '{profile.name}': whisper={selected['whisper']}, beam={profile.beam_size or 'greedy'}, "
+        f"diarize={profile.diarize}, summary model={selected.get('llm_sum_allow_pattern')}."
+    )
+    return dataclasses.replace(config, payload=payload)
@@ -0,0 +1,452 @@
+"""
+Memory budget for resident models.
+
+Every job used to load Whisper, pyannote and the llama.cpp models from
+scratch, and only Whisper was released before the LLM stages. The
+:class:`ModelBudget` keeps the models of one process within RAM and VRAM
+ceilings instead:
+
+- before a model is loaded its footprint is estimated
+  (:func:`whisper_footprint`, :func:`gguf_footprint`,
+  :data:`DIARIZATION_FOOTPRINT_GIB`) and least recently used models that
+  no job is using are evicted until it fits;
+- a model that does not fit in VRAM is placed on the CPU instead;
+- when a job is done with a model the model stays resident, so the next
+  job that asks for it skips the load as long as nothing else needed the
+  memory.
+
+A job holds a model through a lease (:meth:`ModelBudget.lease`); a
+leased model is never evicted and is not handed to another job until the
+lease ends, which also keeps llama.cpp instances single-threaded.
+
+Ceilings default to 75 % of RAM and 90 % of VRAM as recorded at
+bootstrap (``config.hardware``) and are overridden with
+``MODEL_RAM_GIB`` / ``MODEL_VRAM_GIB``. ``MODEL_KEEP_WARM=0`` evicts
+every model as soon as its lease ends (the behaviour before the
+budget). Each decision is printed and kept in :meth:`ModelBudget.report`.
+"""
+
+from __future__ import annotations
+
+import gc
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+GIB = 1024 ** 3
+RAM_SHARE = 0.75
+VRAM_SHARE = 0.9
+DIARIZATION_FOOTPRINT_GIB = 0.6
+# Parameters (millions) of the openai-whisper sizes.
+WHISPER_PARAMS_M: Dict[str, int] = {
+    "tiny": 39,
+    "base": 74,
+    "small": 244,
+    "medium": 769,
+    "large": 1550,
+    "turbo": 809,
+}
+# Activations and decoding buffers on top of the weights.
+_RUNTIME_OVERHEAD = 256 * 1024 ** 2
+# fp16 K/V cache per context token for a 7-8B GQA model.
+_KV_BYTES_PER_TOKEN = 128 * 1024
+_DECISION_HISTORY = 200
+
+
+@dataclass(frozen=True)
+class Footprint:
+    """Approximate memory a loaded model occupies."""
+
+    ram_bytes: int = 0
+    vram_bytes: int = 0
+
+    def describe(self) -> str:
+        parts = [f"{self.ram_bytes / GIB:.1f} GiB RAM"]
+        if self.vram_bytes:
+            parts.append(f"{self.vram_bytes / GIB:.1f} GiB VRAM")
+        return ", ".join(parts)
+
+
+def whisper_footprint(model_size: Optional[str], device: str, compute_type: Optional[str] = None, cpu_accel: str = "off") -> Footprint:
+    """Estimate an ASR backend's footprint from its size and precision."""
+    name = (model_size or "").split("/")[-1].lower()
+    tier = "large" if name.startswith("large") else name.split(".")[0]
+    params = WHISPER_PARAMS_M.get(tier)
+    if params is None:
+        path = Path(model_size or "")
+        try:
+            files = [path] if path.is_file() else [p for p in path.rglob("*") if p.is_file()]
+            weight_bytes = sum(p.stat().st_size for p in files)
+        except OSError:
+            weight_bytes = 0
+        # Unknown checkpoint: assume fp16 weights on disk.
+        params = max(weight_bytes // 2 // 1024 ** 2, WHISPER_PARAMS_M["large"])
+    compute = (compute_type or "").lower()
+    if compute.startswith("int8") or (device == "cpu" and cpu_accel == "int8"):
+        bytes_per_param = 1
+    elif "16" in compute or device == "cuda" or cpu_accel == "bf16":
+        bytes_per_param = 2
+    else:
+        bytes_per_param = 4
+    total = params * 1024 ** 2 * bytes_per_param + _RUNTIME_OVERHEAD
+    return Footprint(vram_bytes=total) if device == "cuda" else Footprint(ram_bytes=total)
+
+
+def gguf_footprint(model_path: Path, n_ctx: int, device: str) -> Footprint:
+    """Estimate a llama.cpp model's footprint: weights, K/V cache and scratch."""
+    try:
+        weights = model_path.stat().st_size
+    except OSError:
+        weights = 0
+    total = weights + n_ctx * _KV_BYTES_PER_TOKEN + _RUNTIME_OVERHEAD
+    return Footprint(vram_bytes=total) if device == "cuda" else Footprint(ram_bytes=total)
+
+
+def diarization_footprint(device: str) -> Footprint:
+    total = int(DIARIZATION_FOOTPRINT_GIB * GIB)
+    return Footprint(vram_bytes=total) if device == "cuda" else Footprint(ram_bytes=total)
+
+
+def release_torch_memory() -> None:
+    """Return cached CUDA blocks and collect garbage after dropping a model."""
+    try:
+        import torch  # type: ignore
+
+        if hasattr(torch.cuda, "empty_cache"):
+            torch.cuda.empty_cache()
+    except Exception:
+        pass
+    gc.collect()
+
+
+@dataclass
+class _Resident:
+    kind: str
+    name: str
+    device: str
+    footprint: Footprint
+    release: Optional[Callable[[Any], None]]
+    model: Any = None
+    leased: bool = True
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+def _env_gib(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    if value:
+        try:
+            return float(value) * GIB
+        except ValueError:
+            print(f"[ModelBudget] Invalid {name}='{value}'; ignoring.")
+    return None
+
+
+class ModelBudget:
+    """Load, keep and evict models within RAM and VRAM ceilings.
+
+    Parameters
+    ----------
+    ram_limit : float
+        Bytes of RAM resident models may use.
+    vram_limit : float
+        Bytes of VRAM resident models may use; ``0`` places everything
+        on the CPU.
+    keep_warm : bool
+        Keep models resident after their lease ends.
+    """
+
+    def __init__(self, ram_limit: float, vram_limit: float, keep_warm: bool = True) -> None:
+        self.ram_limit = ram_limit
+        self.vram_limit = vram_limit
+        self.keep_warm = keep_warm
+        self._residents: Dict[Tuple[str, str], _Resident] = {}
+        self._decisions: Deque[Dict[str, Any]] = deque(maxlen=_DECISION_HISTORY)
+        self._changed = threading.Condition()
+
+    @classmethod
+    def from_hardware(cls, hardware: Dict[str, Any]) -> "ModelBudget":
+        """Ceilings from ``MODEL_RAM_GIB`` / ``MODEL_VRAM_GIB`` or the probed hardware."""
+        ram_gib = float(hardware.get("ram_gib") or 0.0)
+        ram_limit = _env_gib("MODEL_RAM_GIB")
+        if ram_limit is None:
+            ram_limit = ram_gib * GIB * RAM_SHARE if ram_gib else float("inf")
+        vram_limit = _env_gib("MODEL_VRAM_GIB")
+        if vram_limit is None:
+            if not hardware.get("gpu_cuda"):
+                vram_limit = 0.0
+            else:
+                vram_gib = float(hardware.get("gpu_vram_gib") or 0.0)
+                vram_limit = vram_gib * GIB * VRAM_SHARE if vram_gib else float("inf")
+        keep_warm = os.getenv("MODEL_KEEP_WARM", "1").strip().lower() not in ("0", "false", "no", "off")
+        return cls(ram_limit, vram_limit, keep_warm)
+
+    # ------------------------------------------------------------------
+    # Leases
+    # ------------------------------------------------------------------
+    def lease(
+        self,
+        kind: str,
+        name: str,
+        load: Callable[[str], Tuple[Any, str]],
+        footprint: Callable[[str], Footprint],
+        prefer_gpu: bool = True,
+        release: Optional[Callable[[Any], None]] = None,
+        over_budget: bool = True,
+    ) -> Optional[Any]:
+        """Return the resident ``kind``/``name`` model, loading it if needed.
+
+        Parameters
+        ----------
+        load : Callable[[str], Tuple[Any, str]]
+            Called with the planned device (``"cuda"`` or ``"cpu"``);
+            returns the model (``None`` on failure) and the device it
+            actually ended up on.
+        footprint : Callable[[str], Footprint]
+            Footprint of the model on a device.
+        prefer_gpu : bool
+            Try VRAM before RAM.
+        release : Optional[Callable[[Any], None]]
+            Frees the model when it is evicted.
+        over_budget : bool
+            Load the model even when it does not fit in RAM after
+            evictions. When false, ``None`` is returned instead and
+            nothing is evicted.
+
+        The caller must :meth:`end_lease` the model when done with it.
+        """
+        key = (kind, name)
+        with self._changed:
+            while key in self._residents and self._residents[key].leased:
+                self._changed.wait()
+            resident = self._residents.get(key)
+            if resident is not None:
+                resident.leased = True
+                resident.last_used = time.time()
+                self._decide("reuse", resident, "already resident")
+                return resident.model
+            device = "cpu"
+            if prefer_gpu and self.vram_limit > 0:
+                if self._make_room(footprint("cuda"), kind, name):
+                    device = "cuda"
+                else:
+                    self._note("cpu_fallback", kind, name, "does not fit in VRAM")
+            if device == "cpu" and not self._make_room(footprint("cpu"), kind, name, force=over_budget):
+                if not over_budget:
+                    self._note("skip", kind, name, "does not fit in RAM even after evictions")
+                    return None
+                self._note("over_budget", kind, name, "does not fit in RAM even after evictions; loading anyway")
+            # Reserve the slot before loading so other jobs wait instead of loading a copy.
+            resident = _Resident(kind=kind, name=name, device=device, footprint=footprint(device), release=release)
+            self._residents[key] = resident
+
+        model, actual_device = None, device
+        try:
+            model, actual_device = load(device)
+        finally:
+            with self._changed:
+                if model is None:
+                    del self._residents[key]
+                else:
+                    resident.model = model
+                    if actual_device != device:
+                        resident.device = actual_device
+                        resident.footprint = footprint(actual_device)
+                    resident.loaded_at = resident.last_used = time.time()
+                    self._decide("load", resident, f"on {actual_device}")
+                self._changed.notify_all()
+        return model
+
+    def end_lease(self, kind: str, name: str) -> None:
+        """Mark ``kind``/``name`` as no longer used by a job."""
+        key = (kind, name)
+        with self._changed:
+            resident = self._residents.get(key)
+            if resident is None or not resident.leased:
+                return
+            resident.leased = False
+            resident.last_used = time.time()
+            if self.keep_warm:
+                self._decide("keep", resident, "kept warm for the next job")
+            else:
+                self._evict(key, "MODEL_KEEP_WARM=0")
+            self._changed.notify_all()
+
+    def evict(self, kind: str, name: str, reason: str) -> bool:
+        """Drop ``kind``/``name`` unless a job is using it."""
+        key = (kind, name)
+        with self._changed:
+            resident = self._residents.get(key)
+            if resident is None or resident.leased:
+                return False
+            self._evict(key, reason)
+            self._changed.notify_all()
+            return True
+
+    def evict_idle(self, reason: str) -> int:
+        """Drop every model no job is using; returns how many were evicted."""
+        with self._changed:
+            idle = [key for key, resident in self._residents.items() if not resident.leased]
+            for key in idle:
+                self._evict(key, reason)
+            self._changed.notify_all()
+            return len(idle)
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+    def used(self) -> Footprint:
+        with self._changed:
+            return self._used()
+
+    def ram_available(self) -> float:
+        """RAM a new model can get: the ceiling minus what leased models use.
+
+        Idle resident models are counted as free since they can be evicted.
+        """
+        with self._changed:
+            leased = sum(r.footprint.ram_bytes for r in self._residents.values() if r.leased)
+            return self.ram_limit - leased
+
+    def _used(self) -> Footprint:
+        ram = sum(r.footprint.ram_bytes for r in self._residents.values())
+        vram = sum(r.footprint.vram_bytes for r in self._residents.values())
+        return Footprint(ram_bytes=ram, vram_bytes=vram)
+
+    def _fits(self, need: Footprint) -> bool:
+        used = self._used()
+        return (
+            used.ram_bytes + need.ram_bytes <= self.ram_limit
+            and used.vram_bytes + need.vram_bytes <= self.vram_limit
+        )
+
+    def _make_room(self, need: Footprint, kind: str, name: str, force: bool = False) -> bool:
+        """Evict idle models, least recently used first, until ``need`` fits.
+
+        When it cannot fit, nothing is evicted unless ``force`` is set, in
+        which case every candidate is evicted to leave as much room as
+        possible.
+        """
+        if self._fits(need):
+            return True
+        # Only idle models holding the kind of memory we are short of are candidates.
+        idle = sorted(
+            (
+                key
+                for key, r in self._residents.items()
+                if not r.leased
+                and ((need.vram_bytes and r.footprint.vram_bytes) or (need.ram_bytes and r.footprint.ram_bytes))
+            ),
+            key=lambda key: self._residents[key].last_used,
+        )
+        freed = Footprint(
+            ram_bytes=sum(self._residents[key].footprint.ram_bytes for key in idle),
+            vram_bytes=sum(self._residents[key].footprint.vram_bytes for key in idle),
+        )
+        used = self._used()
+        if (
+            used.ram_bytes - freed.ram_bytes + need.ram_bytes > self.ram_limit
+            or used.vram_bytes - freed.vram_bytes + need.vram_bytes > self.vram_limit
+        ):
+            for key in idle if force else ():
+                self._evict(key, f"{kind} '{name}' exceeds the budget")
+            return False
+        while not self._fits(need):
+            self._evict(idle.pop(0), f"making room for {kind} '{name}'")
+        return True
+
+    def _evict(self, key: Tuple[str, str], reason: str) -> None:
+        resident = self._residents.pop(key)
+        if resident.release is not None and resident.model is not None:
+            try:
+                resident.release(resident.model)
+            except Exception as exc:
+                print(f"[ModelBudget] Releasing {resident.kind} '{resident.name}' failed: {exc}")
+        resident.model = None
+        release_torch_memory()
+        self._decide("evict", resident, reason)
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def _decide(self, action: str, resident: _Resident, reason: str) -> None:
+        self._note(action, resident.kind, resident.name, reason, resident.device, resident.footprint)
+
+    def _note(
+        self,
+        action: str,
+        kind: str,
+        name: str,
+        reason: str,
+        device: Optional[str] = None,
+        footprint: Optional[Footprint] = None,
+    ) -> None:
+        used = self._used()
+        decision: Dict[str, Any] = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "action": action,
+            "kind": kind,
+            "model": name,
+            "reason": reason,
+            "ram_used_gib": round(used.ram_bytes / GIB, 2),
+            "vram_used_gib": round(used.vram_bytes / GIB, 2),
+        }
+        if device:
+            decision["device"] = device
+        if footprint is not None:
+            decision["ram_gib"] = round(footprint.ram_bytes / GIB, 2)
+            decision["vram_gib"] = round(footprint.vram_bytes / GIB, 2)
+        self._decisions.append(decision)
+        size = f" ({footprint.describe()})" if footprint is not None else ""
+        print(f"[ModelBudget] {action} {kind} '{name}'{size}: {reason}.")
+
+    def report(self) -> Dict[str, Any]:
+        """Ceilings, usage, resident models and recent decisions."""
+
+        def gib(value: float) -> Optional[float]:
+            return None if value == float("inf") else round(value / GIB, 2)
+
+        with self._changed:
+            used = self._used()
+            return {
+                "ram_limit_gib": gib(self.ram_limit),
+                "vram_limit_gib": gib(self.vram_limit),
+                "ram_used_gib": gib(used.ram_bytes),
+                "vram_used_gib": gib(used.vram_bytes),
+                "keep_warm": self.keep_warm,
+                "resident": [
+                    {
+                        "kind": r.kind,
+                        "model": r.name,
+                        "device": r.device,
+                        "ram_gib": gib(r.footprint.ram_bytes),
+                        "vram_gib": gib(r.footprint.vram_bytes),
+                        "leased": r.leased,
+                        "idle_seconds": 0.0 if r.leased else round(time.time() - r.last_used, 1),
+                    }
+                    for r in self._residents.values()
+                ],
+                "decisions": list(self._decisions),
+            }
+
+
+_budget: Optional[ModelBudget] = None
+_budget_lock = threading.Lock()
+
+
+def model_budget(hardware: Dict[str, Any]) -> ModelBudget:
+    """The process-wide budget, created from ``hardware`` on first use."""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = ModelBudget.from_hardware(hardware)
+            report = _budget.report()
+            print(
+                f"[ModelBudget] Ceilings: RAM {report['ram_limit_gib'] or 'unlimited'} GiB, "
+                f"VRAM {report['vram_limit_gib'] if report['vram_limit_gib'] is not None else 'unlimited'} GiB."
+            )
+        return _budget
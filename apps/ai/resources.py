@@ -14,10 +14,15 @@ gracefully (often by emitting placeholder outputs).
 from __future__ import annotations
 
 import importlib
-import gc
-from typing import Any, Optional
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
 
+from .accel import accel_mode, prepare_pyannote
 from .config import Config
+from .residency import Footprint, ModelBudget, diarization_footprint, gguf_footprint, model_budget, whisper_footprint
+from .tuning import configure_torch, describe_llama_settings, hardware_info, llama_settings
+from .warmup import record_model_load, whisper_files
 
 
 class Resources:
@@ -31,9 +36,15 @@ class Resources:
 
     Notes
     -----
-    - Whisper, pyannote and LLM models are loaded the first time
+    - The ASR backend, pyannote and LLM models are loaded the first time
       their respective properties are accessed. Subsequent access
       returns the cached instance.
+    - Whisper, pyannote and the llama.cpp models are leased from the
+      process-wide :class:`~apps.ai.residency.ModelBudget`, which keeps
+      them resident between jobs while they fit. :meth:`close` hands
+      every lease back at the end of a job.
+    - The CPU worker pools of the STT and diarisation stages are leased
+      the same way (:meth:`worker_pool`), with one model per worker.
     - If the required Python package is not available or the model
       cannot be loaded, the property returns ``None``. Consumers
       should check for ``None`` and implement fallback logic.
@@ -41,45 +52,201 @@ class Resources:
 
     def __init__(self, config: Config) -> None:
         self.config: Config = config
-        self._whisper_model: Optional[Any] = None
+        self._asr_backend: Optional[Any] = None
+        self._cpu_accel: Optional[str] = None
         self._diar_pipeline: Optional[Any] = None
         self._llm_cat: Optional[Any] = None
         self._llm_sum: Optional[Any] = None
+        self._hardware: Optional[Dict[str, Any]] = None
+        # kind -> (budget name, model) for the models this job holds.
+        self._leases: Dict[str, Tuple[str, Any]] = {}
 
     # ------------------------------------------------------------------
-    # Whisper ASR model
+    # Hardware tuning
     # ------------------------------------------------------------------
     @property
-    def whisper_model(self) -> Optional[Any]:
-        """Return the loaded Whisper model or ``None`` if unavailable."""
-        if self._whisper_model is None:
-            model_size = self.config.selected_models.get("whisper")
-            if not model_size:
-                return None
+    def hardware(self) -> Dict[str, Any]:
+        """Hardware description used for tuning (:func:`apps.ai.tuning.hardware_info`)."""
+        if self._hardware is None:
+            self._hardware = hardware_info(self.config.hardware)
+        return self._hardware
+
+    def llama_settings(self, gpu_layers: int, model_path: Optional[Path] = None, n_ctx: Optional[int] = None) -> Dict[str, Any]:
+        """Thread, batch and mmap keyword arguments for ``llama_cpp.Llama``."""
+        settings = llama_settings(self.hardware, gpu_layers, model_path, n_ctx)
+        print(f"[Resources] llama.cpp settings: {describe_llama_settings(settings)}.")
+        return settings
+
+    def record_load(self, kind: str, name: str, seconds: float, paths: Sequence[Path] = (), **details: Any) -> None:
+        """Record a model load latency (:func:`apps.ai.warmup.record_model_load`)."""
+        record_model_load(self.config.runs_dir, kind, name, seconds, paths, **details)
+
+    # ------------------------------------------------------------------
+    # CPU acceleration
+    # ------------------------------------------------------------------
+    @property
+    def cpu_accel(self) -> str:
+        """CPU acceleration mode (:mod:`apps.ai.accel`) for in-process models.
+
+        Resolved once, together with the torch thread pool size
+        (:func:`apps.ai.tuning.configure_torch`).
+        """
+        if self._cpu_accel is None:
+            self._cpu_accel = accel_mode(self.config)
             try:
-                whisper = importlib.import_module("whisper")
-                torch = importlib.import_module("torch")
+                threads = configure_torch(self.hardware)
             except ImportError:
-                # openai-whisper is not installed
-                self._whisper_model = None
-                return None
-            try:
-                preferred_device = "cuda" if torch.cuda.is_available() else "cpu"
-                self._whisper_model = whisper.load_model(model_size, device=preferred_device)
-                print(f"[Resources] Loaded Whisper model '{model_size}' on {preferred_device.upper()}.")
-            except Exception as exc:
-                if "cuda" in str(exc).lower() or "gpu" in str(exc).lower():
-                    print(f"[Resources] Failed to load Whisper on CUDA ({exc}); retrying on CPU.")
-                    try:
-                        self._whisper_model = whisper.load_model(model_size, device="cpu")
-                        print(f"[Resources] Loaded Whisper model '{model_size}' on CPU.")
-                    except Exception as cpu_exc:
-                        print(f"[Resources] Failed to load Whisper model '{model_size}' on CPU: {cpu_exc}")
-                        self._whisper_model = None
-                else:
-                    print(f"[Resources] Failed to load Whisper model '{model_size}': {exc}")
-                    self._whisper_model = None
-        return self._whisper_model
+                threads = 0
+            if self._cpu_accel != "off":
+                print(f"[Resources] CPU acceleration '{self._cpu_accel}' enabled with {threads} torch thread(s).")
+        return self._cpu_accel
+
+    # ------------------------------------------------------------------
+    # Memory budget
+    # ------------------------------------------------------------------
+    @property
+    def budget(self) -> ModelBudget:
+        """The process-wide :class:`~apps.ai.residency.ModelBudget`."""
+        return model_budget(self.hardware)
+
+    def _lease(
+        self,
+        kind: str,
+        name: str,
+        load: Callable[[str], Tuple[Any, str]],
+        footprint: Callable[[str], Footprint],
+        prefer_gpu: bool,
+        release: Optional[Callable[[Any], None]] = None,
+        over_budget: bool = True,
+    ) -> Optional[Any]:
+        """Lease ``name`` for this job; one model per ``kind`` at a time."""
+        held = self._leases.get(kind)
+        if held is not None:
+            if held[0] == name:
+                return held[1]
+            self.end_lease(kind)
+        model = self.budget.lease(
+            kind, name, load, footprint, prefer_gpu=prefer_gpu, release=release, over_budget=over_budget
+        )
+        if model is not None:
+            self._leases[kind] = (name, model)
+        return model
+
+    def end_lease(self, kind: str) -> None:
+        """Hand the ``kind`` model back to the budget, which may keep it warm."""
+        held = self._leases.pop(kind, None)
+        if held is not None:
+            self.budget.end_lease(kind, held[0])
+
+    def discard(self, kind: str, reason: str) -> None:
+        """End the ``kind`` lease and evict the model, e.g. after it broke."""
+        held = self._leases.pop(kind, None)
+        if held is not None:
+            self.budget.end_lease(kind, held[0])
+            self.budget.evict(kind, held[0], reason)
+
+    def close(self) -> None:
+        """End every lease this job still holds."""
+        for kind in list(self._leases):
+            self.end_lease(kind)
+        self._asr_backend = None
+        self._diar_pipeline = None
+
+    def budget_report(self) -> Dict[str, Any]:
+        """Ceilings, resident models and recent decisions of the budget."""
+        return self.budget.report()
+
+    # ------------------------------------------------------------------
+    # Speech recognition backend
+    # ------------------------------------------------------------------
+    @property
+    def asr_backend(self) -> Optional[Any]:
+        """Return the configured ASR backend or ``None`` if unavailable."""
+        return self.load_asr_backend(self.config.selected_models.get("whisper"))
+
+    def load_asr_backend(self, model_size: Optional[str]) -> Optional[Any]:
+        """Return an :class:`~apps.ai.asr.AsrBackend` for ``model_size``.
+
+        The engine comes from ``config.asr_backend``. Only one model is
+        leased at a time; asking for a different one hands the current
+        model back to the budget first.
+        """
+        if not model_size:
+            return None
+        try:
+            from .asr import load_backend  # noqa: F401
+            torch = importlib.import_module("torch")
+        except ImportError:
+            self._asr_backend = None
+            return None
+        name = self.config.asr_backend
+        compute_type = self.config.asr_compute_type
+        key = f"{name}:{model_size}" + (f":{compute_type}" if compute_type else "")
+        if self.cpu_accel != "off":
+            key += f":{self.cpu_accel}"
+
+        def footprint(device: str) -> Footprint:
+            effective = compute_type
+            if name == "faster-whisper" and not effective:
+                effective = "float16" if device == "cuda" else "int8"
+            return whisper_footprint(model_size, device, effective, self.cpu_accel)
+
+        self._asr_backend = self._lease(
+            "whisper",
+            key,
+            lambda device: self._load_asr(name, model_size, device, compute_type),
+            footprint,
+            prefer_gpu=torch.cuda.is_available(),
+            release=_release_asr,
+        )
+        return self._asr_backend
+
+    def _load_asr(self, name: str, model_size: str, device: str, compute_type: Optional[str]) -> Tuple[Optional[Any], str]:
+        from .asr import load_backend
+
+        try:
+            started = time.perf_counter()
+            backend = load_backend(
+                name,
+                model_size,
+                device,
+                compute_type=compute_type,
+                cpu_accel=self.cpu_accel,
+            )
+            print(f"[Resources] Loaded {name} model '{model_size}' on {device.upper()}.")
+            self._record_asr_load(name, model_size, started, device)
+            return backend, device
+        except ImportError as exc:
+            print(f"[Resources] ASR backend '{name}' is not installed: {exc}")
+            return None, device
+        except Exception as exc:
+            if device == "cuda" and ("cuda" in str(exc).lower() or "gpu" in str(exc).lower()):
+                print(f"[Resources] Failed to load {name} on CUDA ({exc}); retrying on CPU.")
+                try:
+                    started = time.perf_counter()
+                    backend = load_backend(
+                        name,
+                        model_size,
+                        "cpu",
+                        compute_type=compute_type,
+                        cpu_accel=self.cpu_accel,
+                    )
+                    print(f"[Resources] Loaded {name} model '{model_size}' on CPU.")
+                    self._record_asr_load(name, model_size, started, "cpu")
+                    return backend, "cpu"
+                except Exception as cpu_exc:
+                    print(f"[Resources] Failed to load {name} model '{model_size}' on CPU: {cpu_exc}")
+                    return None, "cpu"
+            print(f"[Resources] Failed to load {name} model '{model_size}': {exc}")
+            return None, device
+
+    def _record_asr_load(self, backend: str, model_size: str, started: float, device: str) -> None:
+        seconds = time.perf_counter() - started
+        try:
+            paths = whisper_files(backend, model_size)
+        except Exception:
+            paths = []
+        self.record_load("whisper", model_size, seconds, paths, backend=backend, device=device)
 
     # ------------------------------------------------------------------
     # Pyannote diarisation pipeline
@@ -92,62 +259,139 @@ class Resources:
             if not repo_id:
                 return None
             try:
-                from pyannote.audio import Pipeline
+                from pyannote.audio import Pipeline  # noqa: F401
                 torch = importlib.import_module("torch")
             except Exception:
                 self._diar_pipeline = None
                 return None
-            # Attempt to load the pipeline; silently ignore errors
-            try:
-                pipeline = Pipeline.from_pretrained(repo_id)
-                preferred_device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-                if hasattr(pipeline, "to"):
-                    try:
-                        pipeline.to(preferred_device)
-                        print(f"[Resources] Loaded diarisation pipeline '{repo_id}' on {preferred_device}.")
-                    except Exception as exc:
-                        if preferred_device.type == "cuda":
-                            print(f"[Resources] Failed to move diarisation pipeline to CUDA ({exc}); retrying on CPU.")
-                            pipeline.to(torch.device("cpu"))
-                            print(f"[Resources] Loaded diarisation pipeline '{repo_id}' on CPU.")
-                        else:
-                            print(f"[Resources] Loaded diarisation pipeline '{repo_id}' on CPU.")
-                self._diar_pipeline = pipeline
-            except Exception as exc:
-                print(f"[Resources] Failed to load diarisation pipeline '{repo_id}': {exc}")
-                self._diar_pipeline = None
+            self._diar_pipeline = self._lease(
+                "diarization",
+                repo_id,
+                lambda device: self._load_diarization(repo_id, device),
+                diarization_footprint,
+                prefer_gpu=torch.cuda.is_available(),
+            )
         return self._diar_pipeline
 
+    def _load_diarization(self, repo_id: str, device: str) -> Tuple[Optional[Any], str]:
+        # Attempt to load the pipeline; silently ignore errors
+        try:
+            started = time.perf_counter()
+            pipeline, loaded_on = load_diarization_pipeline(repo_id, device, self.cpu_accel)
+            self.record_load("diarization", repo_id, time.perf_counter() - started, device=loaded_on)
+            return pipeline, loaded_on
+        except Exception as exc:
+            print(f"[Resources] Failed to load diarisation pipeline '{repo_id}': {exc}")
+            return None, device
+
     # ------------------------------------------------------------------
-    # Resource release helpers
+    # CPU worker pools
     # ------------------------------------------------------------------
-    def release_whisper_model(self) -> None:
-        """Release the Whisper model to free memory."""
-        if self._whisper_model is None:
-            return
-        try:
-            # Attempt to move the model to CPU before releasing to ease CUDA memory pressure.
-            if hasattr(self._whisper_model, "to"):
-                try:
-                    import torch  # type: ignore
+    def pool_workers(self, kind: str, requested: Optional[int], worker_footprint: Footprint) -> Tuple[int, int]:
+        """``(workers, threads)`` for a ``kind`` pool on this host.
 
-                    self._whisper_model.to("cpu")
-                except Exception:
-                    pass
-        except Exception:
-            pass
+        Sized from the physical cores (:func:`~apps.ai.pipeline.parallel.plan_workers`,
+        ``requested`` overrides the count) and capped at the number of
+        workers whose models fit in the RAM budget, leased models aside.
+        Fewer than two workers means the stage should not use a pool.
+        """
+        from .pipeline.parallel import plan_workers
 
-        self._whisper_model = None
+        workers, threads = plan_workers(None, requested)
+        fit = self.budget.ram_available() // max(1, worker_footprint.ram_bytes)
+        if workers > fit:
+            capped = int(max(0, fit))
+            print(f"[Resources] {kind} capped at {capped} of {workers} worker(s) to fit the model RAM budget.")
+            if capped < 2:
+                return capped, threads
+            workers, threads = plan_workers(None, capped)
+        return workers, threads
 
-        try:
-            import torch  # type: ignore
+    def worker_pool(
+        self,
+        kind: str,
+        name: str,
+        workers: int,
+        threads: int,
+        initializer: Callable[..., None],
+        initargs: tuple,
+        worker_footprint: Footprint,
+    ) -> Optional[Any]:
+        """Lease a warm :class:`~apps.ai.pipeline.parallel.WorkerPool` for this job.
 
-            if hasattr(torch.cuda, "empty_cache"):
-                torch.cuda.empty_cache()
-        except Exception:
-            pass
+        ``initializer(*initargs)`` loads the model in every worker, so the
+        pool is budgeted at ``workers`` times ``worker_footprint`` in RAM
+        (size it with :meth:`pool_workers`). The pool stays resident
+        between stage calls while it fits. A pool that does not fit in the
+        budget is never loaded, and one whose workers fail to start is
+        reported as unavailable (``None``) as well.
+        """
+        from .pipeline.parallel import WorkerPool
 
-        gc.collect()
+        def load(device: str) -> Tuple[Optional[Any], str]:
+            started = time.perf_counter()
+            pool = WorkerPool(workers, threads, initializer, initargs)
+            try:
+                pool.warm()
+            except Exception as exc:
+                print(f"[Resources] Failed to start {kind} '{name}' ({workers} worker(s)): {exc}")
+                pool.close()
+                return None, "cpu"
+            self.record_load(kind, name, time.perf_counter() - started, device="cpu", workers=workers, threads=threads)
+            print(f"[Resources] Started {kind} '{name}' with {workers} worker(s) x {threads} thread(s).")
+            return pool, "cpu"
+
+        return self._lease(
+            kind,
+            f"{name}:{workers}x{threads}",
+            load,
+            lambda device: Footprint(ram_bytes=worker_footprint.ram_bytes * workers),
+            prefer_gpu=False,
+            release=_close_pool,
+            over_budget=False,
+        )
+
+    # ------------------------------------------------------------------
+    # llama.cpp models
+    # ------------------------------------------------------------------
+    def lease_llama(
+        self,
+        kind: str,
+        model_path: Path,
+        n_ctx: int,
+        load: Callable[[str], Tuple[Optional[Any], str]],
+    ) -> Optional[Any]:
+        """Lease the llama.cpp model at ``model_path`` for this job.
+
+        ``load`` is called with the device the budget planned
+        (``"cuda"`` or ``"cpu"``) when the model is not resident and
+        returns the model and the device it was loaded on.
+        """
+        return self._lease(
+            kind,
+            f"{model_path.name}:{n_ctx}",
+            load,
+            lambda device: gguf_footprint(model_path, n_ctx, device),
+            prefer_gpu=bool(self.hardware.get("gpu_cuda")),
+            release=_close_llama,
+        )
+
+    # ------------------------------------------------------------------
+    # Resource release helpers
+    # ------------------------------------------------------------------
+    def release_whisper_model(self) -> None:
+        """Hand the ASR backend back to the budget.
+
+        The model stays resident while it fits the budget and is evicted
+        when another model needs the memory.
+        """
+        self.end_lease("whisper")
+        self._asr_backend = None
+
+    def release_diarization_pipeline(self) -> None:
+        """Hand the pyannote pipeline back to the budget."""
+        self.end_lease("diarization")
+        self._diar_pipeline = None
 
     # ------------------------------------------------------------------
     # Categorisation LLM
@@ -196,3 +440,46 @@ class Resources:
             except Exception:
                 self._llm_sum = None
         return self._llm_sum
+
+
+def load_diarization_pipeline(repo_id: str, device: str, cpu_accel: str = "off") -> Tuple[Any, str]:
+    """Load the pyannote pipeline ``repo_id`` on ``device``.
+
+    A pipeline that cannot be moved to CUDA stays on CPU. Returns the
+    pipeline and the device type it ended up on; raises when it cannot be
+    loaded. Used in-process and by the diarisation worker pool.
+    """
+    from pyannote.audio import Pipeline
+    import torch
+
+    pipeline = Pipeline.from_pretrained(repo_id)
+    if pipeline is None:
+        raise RuntimeError(f"Diarisation pipeline '{repo_id}' could not be loaded.")
+    preferred_device = torch.device(device)
+    if hasattr(pipeline, "to"):
+        try:
+            pipeline.to(preferred_device)
+            print(f"[Resources] Loaded diarisation pipeline '{repo_id}' on {preferred_device}.")
+        except Exception as exc:
+            if preferred_device.type == "cuda":
+                print(f"[Resources] Failed to move diarisation pipeline to CUDA ({exc}); retrying on CPU.")
+                pipeline.to(torch.device("cpu"))
+                preferred_device = torch.device("cpu")
+            print(f"[Resources] Loaded diarisation pipeline '{repo_id}' on CPU.")
+    if preferred_device.type == "cpu" and cpu_accel != "off":
+        pipeline = prepare_pyannote(pipeline, cpu_accel)
+    return pipeline, preferred_device.type
+
+
+def _release_asr(backend: Any) -> None:
+    backend.release()
+
+
+def _close_pool(pool: Any) -> None:
+    pool.close()
+
+
+def _close_llama(llama: Any) -> None:
+    close = getattr(llama, "close", None)
+    if callable(close):
+        close()
@@ -0,0 +1,139 @@
+"""
+Cross-chunk speaker linking.
+
+Diarisation runs independently on every audio chunk, so the local label
+``SPEAKER_00`` in chunk 0 and ``SPEAKER_00`` in chunk 1 are unrelated.
+This module clusters the per-chunk speaker embeddings into global
+speakers and returns a relabelling for every ``(chunk, local label)``
+pair.
+
+Clustering is average-linkage agglomerative clustering on cosine
+distance, computed with vectorised NumPy operations. Two local speakers
+from the same chunk are never merged, because the diarisation model
+already decided they are different people.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# pyannote's own clustering threshold for speaker-diarization-3.1.
+DEFAULT_LINK_THRESHOLD = 0.7
+
+
+@dataclass
+class LocalSpeaker:
+    """A speaker as seen by the diarisation of a single chunk.
+
+    Attributes
+    ----------
+    chunk_id : str
+        Identifier of the chunk the speaker was found in.
+    label : str
+        Speaker label assigned by the diarisation model for that chunk.
+    first_start : float
+        Absolute start time of the speaker's first turn; used to number
+        the global speakers in order of appearance.
+    embedding : Optional[np.ndarray]
+        Speaker embedding, or ``None`` when the model did not provide a
+        usable one (such speakers are never merged).
+    """
+
+    chunk_id: str
+    label: str
+    first_start: float
+    embedding: Optional[np.ndarray] = None
+
+
+def save_chunk_embeddings(path: Path, embeddings: Dict[str, np.ndarray]) -> None:
+    """Persist the local speaker embeddings of one chunk."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    labels = sorted(embeddings)
+    matrix = np.stack([np.asarray(embeddings[label], dtype=np.float32) for label in labels]) if labels else np.zeros((0, 0), dtype=np.float32)
+    np.savez(path, labels=np.asarray(labels), embeddings=matrix)
+
+
+def load_chunk_embeddings(path: Path) -> Dict[str, np.ndarray]:
+    """Load embeddings written by :func:`save_chunk_embeddings`."""
+    with np.load(path, allow_pickle=False) as data:
+        labels = [str(label) for label in data["labels"]]
+        matrix = data["embeddings"]
+    return {label: matrix[index] for index, label in enumerate(labels)}
+
+
+def link_speakers(
+    speakers: Sequence[LocalSpeaker],
+    threshold: float = DEFAULT_LINK_THRESHOLD,
+) -> Dict[Tuple[str, str], str]:
+    """Assign global labels to per-chunk speakers.
+
+    Parameters
+    ----------
+    speakers : Sequence[LocalSpeaker]
+        Every local speaker of every chunk.
+    threshold : float
+        Maximum average cosine distance at which two clusters merge.
+
+    Returns
+    -------
+    dict
+        Mapping of ``(chunk_id, local_label)`` to ``SPEAKER_XX`` labels,
+        numbered by first appearance.
+    """
+    if not speakers:
+        return {}
+
+    usable = [
+        index for index, speaker in enumerate(speakers)
+        if speaker.embedding is not None and np.all(np.isfinite(speaker.embedding)) and np.any(speaker.embedding)
+    ]
+    clusters: List[List[int]] = [[index] for index in range(len(speakers)) if index not in set(usable)]
+    if usable:
+        clusters.extend(_cluster(speakers, usable, threshold))
+
+    clusters.sort(key=lambda members: min(speakers[index].first_start for index in members))
+    mapping: Dict[Tuple[str, str], str] = {}
+    for number, members in enumerate(clusters):
+        for index in members:
+            mapping[(speakers[index].chunk_id, speakers[index].label)] = f"SPEAKER_{number:02d}"
+    return mapping
+
+
+def _cluster(speakers: Sequence[LocalSpeaker], indices: Sequence[int], threshold: float) -> List[List[int]]:
+    """Average-linkage clustering with a same-chunk cannot-link constraint."""
+    matrix = np.stack([np.asarray(speakers[index].embedding, dtype=np.float64) for index in indices])
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    distances = 1.0 - matrix @ matrix.T
+
+    chunk_ids = np.asarray([speakers[index].chunk_id for index in indices])
+    conflicts = chunk_ids[:, None] == chunk_ids[None, :]
+    distances[conflicts] = np.inf
+
+    sizes = np.ones(len(indices))
+    active = np.ones(len(indices), dtype=bool)
+    members: List[List[int]] = [[index] for index in indices]
+
+    while active.sum() > 1:
+        masked = np.where(active[:, None] & active[None, :], distances, np.inf)
+        flat = int(np.argmin(masked))
+        i, j = divmod(flat, masked.shape[1])
+        if not np.isfinite(masked[i, j]) or masked[i, j] > threshold:
+            break
+        # Lance-Williams update for average linkage; conflicts stay infinite.
+        merged = (sizes[i] * distances[i] + sizes[j] * distances[j]) / (sizes[i] + sizes[j])
+        merged[np.isinf(distances[i]) | np.isinf(distances[j])] = np.inf
+        distances[i, :] = merged
+        distances[:, i] = merged
+        distances[i, i] = np.inf
+        sizes[i] += sizes[j]
+        active[j] = False
+        distances[j, :] = np.inf
+        distances[:, j] = np.inf
+        members[i].extend(members[j])
+        members[j] = []
+
+    return [group for position, group in enumerate(members) if active[position]]
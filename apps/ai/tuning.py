@@ -0,0 +1,163 @@
+"""
+Hardware-aware thread, batch and memory-mapping settings.
+
+llama.cpp and torch otherwise run with their library defaults, which
+ignore SMT, SIMD width and how much of the model fits in memory. This
+module derives the settings from the hardware description recorded at
+bootstrap (``config.hardware``, see
+:func:`apps.ai.bootstrap.probe.detect_hardware`), filling in anything an
+older ``ai.config.json`` lacks from a live probe.
+
+torch
+    Intra-op threads = physical cores (``TORCH_THREADS``); inter-op
+    threads = 2 (``TORCH_INTEROP_THREADS``).
+llama.cpp
+    ``n_threads`` (token generation, memory bound) = physical cores,
+    ``n_threads_batch`` (prompt evaluation, compute bound) = logical
+    cores; with every layer on the GPU both drop to 4 since the CPU only
+    drives the GPU. ``n_batch`` is 1024 on GPU and on AVX-512/AMX CPUs,
+    512 with AVX2/NEON and 256 otherwise. Models are memory-mapped, and
+    locked in RAM when they take less than a quarter of it on CPU-only
+    runs. Overrides: ``LLAMA_THREADS``, ``LLAMA_THREADS_BATCH``,
+    ``LLAMA_BATCH``, ``LLAMA_MMAP`` and ``LLAMA_MLOCK`` (``0``/``1``).
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+GPU_DRIVER_THREADS = 4
+MLOCK_RAM_SHARE = 0.25
+
+_torch_threads: Optional[int] = None
+
+
+def hardware_info(hardware: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Return ``hardware`` completed with live probe values for missing keys."""
+    info = dict(hardware or {})
+    if not info.get("cpu_physical_cores") or not info.get("cpu_logical_cores") or "ram_gib" not in info:
+        try:
+            from .bootstrap.probe import cpu_info, ram_gib
+
+            for key, value in {**cpu_info(), "ram_gib": ram_gib()}.items():
+                if not info.get(key):
+                    info[key] = value
+        except Exception as exc:
+            print(f"[Tuning] Hardware probe failed ({exc}); using os.cpu_count().")
+            info.setdefault("cpu_logical_cores", os.cpu_count() or 1)
+    if "cpu_simd" not in info:
+        from .bootstrap.probe import cpu_simd_flags
+
+        info["cpu_simd"] = cpu_simd_flags()
+    info["cpu_logical_cores"] = int(info.get("cpu_logical_cores") or os.cpu_count() or 1)
+    info["cpu_physical_cores"] = int(info.get("cpu_physical_cores") or info["cpu_logical_cores"])
+    return info
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    if value:
+        try:
+            return int(value)
+        except ValueError:
+            print(f"[Tuning] Invalid {name}='{value}'; ignoring.")
+    return None
+
+
+def _env_flag(name: str) -> Optional[bool]:
+    value = (os.getenv(name) or "").strip().lower()
+    if not value:
+        return None
+    return value not in ("0", "false", "no", "off")
+
+
+def torch_threads(hardware: Optional[Dict[str, Any]] = None) -> int:
+    """Intra-op torch threads (``TORCH_THREADS`` or physical cores)."""
+    return _env_int("TORCH_THREADS") or hardware_info(hardware)["cpu_physical_cores"]
+
+
+def configure_torch(hardware: Optional[Dict[str, Any]] = None) -> int:
+    """Size the torch thread pools once per process and return the thread count."""
+    global _torch_threads
+    if _torch_threads is not None:
+        return _torch_threads
+    import torch
+
+    threads = torch_threads(hardware)
+    torch.set_num_threads(threads)
+    try:
+        # Only allowed before the first inter-op parallel call.
+        torch.set_num_interop_threads(_env_int("TORCH_INTEROP_THREADS") or 2)
+    except RuntimeError:
+        pass
+    _torch_threads = threads
+    print(f"[Tuning] torch using {threads} thread(s).")
+    return threads
+
+
+def _batch_size(info: Dict[str, Any], on_gpu: bool) -> int:
+    simd = set(info.get("cpu_simd") or ())
+    if on_gpu or simd & {"avx512f", "amx_int8", "amx_bf16"}:
+        return 1024
+    if simd & {"avx2", "asimd", "neon"}:
+        return 512
+    return 256
+
+
+def llama_settings(
+    hardware: Optional[Dict[str, Any]],
+    gpu_layers: int,
+    model_path: Optional[Path] = None,
+    n_ctx: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Keyword arguments for ``llama_cpp.Llama`` besides the model and context.
+
+    Parameters
+    ----------
+    hardware : Optional[Dict[str, Any]]
+        ``config.hardware``.
+    gpu_layers : int
+        ``n_gpu_layers`` the model is loaded with (``-1`` = all).
+    model_path : Optional[Path]
+        GGUF file; its size decides whether the model is locked in RAM.
+    n_ctx : Optional[int]
+        Context length; ``n_batch`` never exceeds it.
+    """
+    info = hardware_info(hardware)
+    on_gpu = gpu_layers != 0 and bool(info.get("gpu_cuda"))
+    full_offload = on_gpu and gpu_layers < 0
+    physical, logical = info["cpu_physical_cores"], info["cpu_logical_cores"]
+
+    n_threads = _env_int("LLAMA_THREADS") or (min(GPU_DRIVER_THREADS, physical) if full_offload else physical)
+    n_threads_batch = _env_int("LLAMA_THREADS_BATCH") or (n_threads if full_offload else logical)
+    n_batch = _env_int("LLAMA_BATCH") or _batch_size(info, on_gpu)
+    if n_ctx:
+        n_batch = min(n_batch, n_ctx)
+
+    use_mmap = _env_flag("LLAMA_MMAP")
+    use_mlock = _env_flag("LLAMA_MLOCK")
+    if use_mlock is None:
+        use_mlock = False
+        ram_bytes = float(info.get("ram_gib") or 0.0) * 1024 ** 3
+        if not on_gpu and model_path is not None and ram_bytes:
+            try:
+                use_mlock = model_path.stat().st_size < MLOCK_RAM_SHARE * ram_bytes
+            except OSError:
+                pass
+    return {
+        "n_threads": n_threads,
+        "n_threads_batch": n_threads_batch,
+        "n_batch": n_batch,
+        "use_mmap": True if use_mmap is None else use_mmap,
+        "use_mlock": use_mlock,
+    }
+
+
+def describe_llama_settings(settings: Dict[str, Any]) -> str:
+    """One-line summary for stage logs."""
+    return (
+        f"threads={settings['n_threads']}/{settings['n_threads_batch']}, batch={settings['n_batch']}, "
+        f"mmap={settings['use_mmap']}, mlock={settings['use_mlock']}"
+    )
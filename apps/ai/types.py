@@ -8,9 +8,10 @@ that intermediate results can be persisted to JSON if required.
 
 from __future__ import annotations
 
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 
 @dataclass
@@ -29,6 +30,11 @@ class AudioChunk:
     end : float
         End time (in seconds) of this chunk relative to the original
         recording.
+    speech_map : Optional[List[Tuple[float, float, float]]]
+        Set when ``file_path`` holds only the speech spans of the chunk
+        (see :class:`~apps.ai.pipeline.stages.vad.VADStage`). Each entry
+        is ``(original_start, original_end, file_start)`` in seconds
+        relative to ``start``.
     """
 
     id: str
@@ -38,6 +44,20 @@ class AudioChunk:
     # Speaker label and transcript may be filled in by later stages
     speaker: Optional[str] = None
     transcript: Optional[str] = None
+    speech_map: Optional[List[Tuple[float, float, float]]] = None
+
+    def to_original(self, t: float, is_end: bool = False) -> float:
+        """Map a time in ``file_path`` to a time relative to ``start``.
+
+        Times on the boundary between two speech spans belong to the
+        later span, or to the earlier one when ``is_end`` is set.
+        """
+        if not self.speech_map:
+            return t
+        file_starts = [span[2] for span in self.speech_map]
+        index = (bisect_left if is_end else bisect_right)(file_starts, t) - 1
+        original_start, _, file_start = self.speech_map[max(index, 0)]
+        return original_start + (t - file_start)
 
 
 @dataclass
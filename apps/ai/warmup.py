@@ -0,0 +1,200 @@
+"""
+Page-cache warming and model load latency records.
+
+Short jobs spend much of their time reading multi-GB GGUF files and
+Whisper checkpoints from disk. :func:`start_warmup` pre-faults the
+configured model files into the OS page cache on a background thread
+when the API (or a worker) starts, so the first load is served from
+memory. llama.cpp memory-maps GGUF files (``use_mmap``, see
+:mod:`apps.ai.tuning`), so every process loading the same file shares
+those cached pages instead of holding a private copy.
+
+Files are warmed in pipeline order (Whisper, categorisation LLM,
+summary LLM) until ``MODEL_WARMUP_GIB`` (default: 80 % of the memory
+available at startup) is used up; ``MODEL_WARMUP=0`` disables warming.
+
+Every model load is recorded with :func:`record_model_load`: the
+latency and whether the file had been warmed first are printed and
+appended to ``apps/ai/output/model_loads.jsonl``, so cold and warm
+loads can be compared.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+_READ_BLOCK = 8 * 1024 * 1024
+_WARMUP_MEMORY_SHARE = 0.8
+
+_lock = threading.Lock()
+_warmed: Dict[str, float] = {}
+_thread: Optional[threading.Thread] = None
+
+
+def warmup_enabled() -> bool:
+    """``MODEL_WARMUP=0/false/off`` disables warming."""
+    return os.getenv("MODEL_WARMUP", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _gguf_file(repo_id: Optional[str], pattern: Optional[str]) -> Optional[Path]:
+    """Cached GGUF for ``repo_id``, chosen the way the LLM stages choose it."""
+    if not repo_id:
+        return None
+    from huggingface_hub import snapshot_download
+
+    patterns = [pattern] if isinstance(pattern, str) else list(pattern or [])
+    cache_dir = Path(snapshot_download(repo_id=repo_id, allow_patterns=patterns or None, local_files_only=True))
+    candidates: List[Path] = []
+    for item in patterns:
+        candidates.extend(cache_dir.rglob(item))
+    if not candidates:
+        candidates = list(cache_dir.rglob("*.gguf"))
+    candidates = [path for path in candidates if path.suffix.lower() == ".gguf"]
+    return sorted(candidates)[-1] if candidates else None
+
+
+def whisper_files(backend: str, model_size: Optional[str]) -> List[Path]:
+    """Files of a cached Whisper model for ``backend``."""
+    if not model_size:
+        return []
+    if Path(model_size).exists():
+        path = Path(model_size)
+        return sorted(p for p in path.rglob("*") if p.is_file()) if path.is_dir() else [path]
+    if backend == "faster-whisper":
+        from faster_whisper import download_model
+
+        model_dir = Path(download_model(model_size, local_files_only=True))
+        return sorted(p for p in model_dir.iterdir() if p.is_file())
+    import whisper
+
+    url = whisper._MODELS.get(model_size)
+    if not url:
+        return []
+    cache_root = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return [Path(cache_root) / "whisper" / os.path.basename(url)]
+
+
+def model_files(config: Any) -> List[Tuple[str, Path]]:
+    """Return ``(kind, path)`` for every locally cached model file, in load order.
+
+    Models that are not cached or whose package is missing are skipped.
+    """
+    selected = config.selected_models
+    resolvers = [
+        ("whisper", lambda: whisper_files(config.asr_backend, selected.get("whisper"))),
+        ("llm_cat", lambda: [_gguf_file(selected.get("llm_cat_repo_id"), selected.get("llm_cat_allow_pattern"))]),
+        ("llm_sum", lambda: [_gguf_file(selected.get("llm_sum_repo_id"), selected.get("llm_sum_allow_pattern"))]),
+    ]
+    files: List[Tuple[str, Path]] = []
+    seen: set[Path] = set()
+    for kind, resolve in resolvers:
+        try:
+            paths = resolve()
+        except Exception as exc:
+            print(f"[Warmup] Skipping {kind}: {exc}")
+            continue
+        for path in paths:
+            if path is not None and path.is_file() and path not in seen:
+                seen.add(path)
+                files.append((kind, path))
+    return files
+
+
+def prefault(path: Path) -> float:
+    """Read ``path`` once so its pages are in the page cache; return seconds taken."""
+    started = time.perf_counter()
+    buffer = bytearray(_READ_BLOCK)
+    with open(path, "rb", buffering=0) as handle:
+        if hasattr(os, "posix_fadvise"):
+            # Ask for aggressive read-ahead before streaming through the file.
+            os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        while handle.readinto(buffer):
+            pass
+    seconds = time.perf_counter() - started
+    with _lock:
+        _warmed[str(path)] = time.time()
+    return seconds
+
+
+def _budget_bytes() -> float:
+    env_value = os.getenv("MODEL_WARMUP_GIB")
+    if env_value:
+        try:
+            return float(env_value) * 1024 ** 3
+        except ValueError:
+            print(f"[Warmup] Invalid MODEL_WARMUP_GIB='{env_value}'; using available memory.")
+    try:
+        import psutil
+
+        return psutil.virtual_memory().available * _WARMUP_MEMORY_SHARE
+    except Exception:
+        return float("inf")
+
+
+def warm_files(files: Sequence[Tuple[str, Path]]) -> List[Dict[str, Any]]:
+    """Pre-fault ``files`` in order within the memory budget and return a report."""
+    budget = _budget_bytes()
+    report: List[Dict[str, Any]] = []
+    for kind, path in files:
+        size = path.stat().st_size
+        if size > budget:
+            print(f"[Warmup] Skipping {kind} '{path.name}' ({size / 1024 ** 3:.1f} GiB): over the warm-up budget.")
+            report.append({"kind": kind, "file": str(path), "bytes": size, "skipped": True})
+            continue
+        seconds = prefault(path)
+        budget -= size
+        print(f"[Warmup] Cached {kind} '{path.name}' ({size / 1024 ** 3:.1f} GiB) in {seconds:.1f}s.")
+        report.append({"kind": kind, "file": str(path), "bytes": size, "seconds": round(seconds, 2)})
+    return report
+
+
+def start_warmup(config: Any) -> Optional[threading.Thread]:
+    """Warm the configured models on a daemon thread (once per process)."""
+    global _thread
+    if not warmup_enabled():
+        return None
+    with _lock:
+        if _thread is not None:
+            return _thread
+        _thread = threading.Thread(target=lambda: warm_files(model_files(config)), name="model-warmup", daemon=True)
+    _thread.start()
+    return _thread
+
+
+def is_warmed(paths: Sequence[Path]) -> bool:
+    """``True`` when every file in ``paths`` was pre-faulted by this process."""
+    with _lock:
+        return bool(paths) and all(str(path) in _warmed for path in paths)
+
+
+def record_model_load(
+    log_dir: Path,
+    kind: str,
+    name: str,
+    seconds: float,
+    paths: Sequence[Path] = (),
+    **details: Any,
+) -> Dict[str, Any]:
+    """Print and append one model load to ``log_dir/model_loads.jsonl``."""
+    entry = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "pid": os.getpid(),
+        "kind": kind,
+        "model": name,
+        "seconds": round(seconds, 3),
+        "warmed": is_warmed(paths),
+        **details,
+    }
+    print(f"[Warmup] {kind} '{name}' loaded in {seconds:.2f}s (page cache warmed: {'yes' if entry['warmed'] else 'no'}).")
+    try:
+        log_dir.mkdir(parents=True, exist_ok=True)
+        with _lock, open(log_dir / "model_loads.jsonl", "a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as exc:
+        print(f"[Warmup] Failed to record model load: {exc}")
+    return entry
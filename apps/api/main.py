@@ -4,13 +4,16 @@ import os
 import shutil
 import time
 import json
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from fastapi import (
     FastAPI, Depends, HTTPException, UploadFile, File, Form, 
     BackgroundTasks, Response
 )
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pathlib import Path
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
 from typing import List, Optional
@@ -24,12 +27,43 @@ from .database import SessionLocal, engine
 # --- 설정 (Configurations) ---
 
 models.Base.metadata.create_all(bind=engine)
+
+
+# create_all은 기존 테이블에 컬럼을 추가하지 않으므로, 나중에 추가된 컬럼은 여기서 보충
+ADDED_COLUMNS = [
+    ("source_materials", "is_draft", "BOOLEAN NOT NULL DEFAULT FALSE"),
+    ("subjects", "processing_profile", "VARCHAR(20) NOT NULL DEFAULT 'balanced'"),
+    ("summary_jobs", "processing_profile", "VARCHAR(20)"),
+]
+
+
+def _ensure_added_columns():
+    """기존 DB에 ADDED_COLUMNS의 컬럼이 없으면 추가합니다."""
+    inspector = inspect(engine)
+    for table, column, ddl in ADDED_COLUMNS:
+        columns = {existing["name"] for existing in inspector.get_columns(table)}
+        if column not in columns:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+            print(f"INFO: {table}.{column} 컬럼 추가")
+
+
+_ensure_added_columns()
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 PROJECTS_BASE_DIR = PROJECT_ROOT / "apps" / "projects"
 AI_OUTPUT_DIR = PROJECT_ROOT / "apps" / "ai" / "output"
 ALLOWED_EXTENSIONS = {".mp3", ".aac", ".m4a", ".wav",".flac",".ogg",".opus",".webm"}
 MAX_FILES = 10
 MAX_FILE_SIZE_BYTES = 10 * 1024 * 1024 * 1024 # 10GB
+SUMMARY_STREAM_POLL_SECONDS = 15.0  # SSE keep-alive 간격
+# 전체 처리 전에 초안 요약을 먼저 만들지 여부 (AI_PREVIEW_ENABLED=0 으로 끔)
+AI_PREVIEW_ENABLED = os.getenv("AI_PREVIEW_ENABLED", "1").strip().lower() not in ("0", "false", "no", "off")
+# 한 작업의 파일을 동시에 몇 개까지 파이프라인에 넣을지. 스테이지 게이트(STAGE_SLOTS_*)가 GPU/CPU 과점유를 막으므로
+# 파일들이 단계별로 겹쳐 진행됩니다 (예: 2번 파일 정규화 중에 1번 파일 STT). 1이면 예전처럼 순차 처리
+try:
+    AI_MATERIAL_PARALLELISM = max(1, int(os.getenv("AI_MATERIAL_PARALLELISM", "3")))
+except ValueError:
+    AI_MATERIAL_PARALLELISM = 3
 
 # --- AI 모듈 import 안정화 ---
 AI_MODULE_PATH = PROJECT_ROOT / "apps" / "ai"
@@ -38,7 +72,11 @@ if str(AI_MODULE_PATH) not in sys.path:
 
 try:
     # apps/ai/main.py에서 run_ai_pipeline 상대 import
-    from ..ai.main import run_ai_pipeline
+    from ..ai.main import run_ai_pipeline, run_ai_preview
+    from ..ai.io import stream as summary_stream
+    from ..ai.config import Config as AIConfig
+    from ..ai.warmup import start_warmup
+    from ..ai.preload import mark_ready, readiness, start_preload
     print(f"INFO: run_ai_pipeline successfully imported from: {AI_MODULE_PATH}")
 except ImportError as e:
     print(f"ERROR: run_ai_pipeline import 실패 - {e}")
@@ -50,6 +88,31 @@ app = FastAPI()
 
 app.mount("/web", StaticFiles(directory="apps/web", html=True), name="static")
 
+
+@app.on_event("startup")
+def warm_ai_models():
+    """
+    첫 작업의 모델 로딩이 디스크 대신 페이지 캐시에서 읽히도록 모델 파일을 백그라운드로 미리 읽고,
+    preload 목록의 모델을 백그라운드로 로드해 둡니다. 진행 상황은 /ready 로 확인합니다.
+    """
+    try:
+        config = AIConfig.load(PROJECT_ROOT)
+    except FileNotFoundError:
+        print("INFO: ai.config.json이 아직 없어 모델 워밍업을 건너뜁니다.")
+        mark_ready()
+        return
+    if start_warmup(config) is not None:
+        print("INFO: 모델 파일 워밍업 시작 (MODEL_WARMUP=0 으로 끔)")
+    if start_preload(config) is not None:
+        print("INFO: 모델 사전 로드 시작 (MODEL_PRELOAD=none 으로 끔)")
+
+
+@app.get("/ready")
+def read_readiness():
+    """모델 사전 로드가 끝났으면 200, 아직이면 503을 반환합니다 (로드 밸런서 헬스 체크용)."""
+    state = readiness()
+    return JSONResponse(status_code=200 if state["ready"] else 503, content=state)
+
 # --- 의존성 (Dependencies) ---
 def get_db():
     db = SessionLocal()
@@ -59,16 +122,16 @@ def get_db():
         db.close()
 
 # --- AI 파트 함수 ---
-def call_ai_model(file_path: Path, is_korean_only: bool, run_id: str) -> dict:
+def call_ai_model(file_path: Path, is_korean_only: bool, run_id: str, profile: Optional[str] = None) -> dict:
     """
     백엔드에서 정한 run_id를 그대로 AI에 전달하고,
     동일 run_id로 산출물을 읽어 반환합니다.
     """
-    print(f"INFO: [AI] '{file_path.name}' 파이프라인 실행 (run_id={run_id}, ko_only={is_korean_only})")
+    print(f"INFO: [AI] '{file_path.name}' 파이프라인 실행 (run_id={run_id}, ko_only={is_korean_only}, profile={profile})")
 
     # 1) AI 파이프라인 실행
     try:
-        run_ai_pipeline(str(file_path.resolve()), run_id=run_id, is_korean_only=is_korean_only)
+        run_ai_pipeline(str(file_path.resolve()), job_id=run_id, is_korean_only=is_korean_only, profile=profile)
     except Exception as e:
         print(f"ERROR: [AI] run_ai_pipeline 실행 실패. 에러: {e}")
         raise HTTPException(status_code=500, detail=f"AI pipeline failed for {file_path.name}: {e}")
@@ -115,7 +178,29 @@ def call_ai_model(file_path: Path, is_korean_only: bool, run_id: str) -> dict:
         print(f"ERROR: [AI] 산출물 파일 읽기 실패: {e}")
         raise HTTPException(status_code=500, detail=f"AI output file reading failed: {e}")
 
+def call_ai_preview(file_path: Path, is_korean_only: bool, run_id: str) -> Optional[str]:
+    """
+    녹음 일부(앞부분 + 고르게 뽑은 구간)만 작은 모델로 처리해 초안 요약을 반환합니다.
+    실패해도 전체 처리는 계속되어야 하므로 예외를 올리지 않고 None을 반환합니다.
+    """
+    print(f"INFO: [AI] '{file_path.name}' 미리보기 실행 (run_id={run_id})")
+    try:
+        summary = run_ai_preview(str(file_path.resolve()), job_id=run_id, is_korean_only=is_korean_only)
+    except Exception as e:
+        print(f"WARN: [AI] 미리보기 실패, 전체 처리로 진행: {e}")
+        return None
+    return summary or None
+
 # --- 백그라운드 작업 ---
+def preview_material_ai(file_path: Path, is_korean_only: bool, run_id: str, events: queue.Queue) -> None:
+    """
+    워커 스레드에서 파일 하나의 미리보기를 전체 파이프라인과 동시에 실행합니다.
+    DB 세션은 스레드 간에 공유할 수 없으므로 초안 요약은 events 큐로 넘기고, 저장은 작업 스레드가 합니다.
+    """
+    draft_summary = call_ai_preview(file_path, is_korean_only=is_korean_only, run_id=run_id)
+    if draft_summary:
+        events.put((run_id, draft_summary))
+
 def run_ai_processing(job_id: int):
     """백그라운드에서 실행될 AI 처리 전체 과정"""
     print(f"INFO: [백그라운드 작업 시작] Job ID: {job_id}")
@@ -135,6 +220,7 @@ def run_ai_processing(job_id: int):
 
         # --- 1. Subject에서 is_korean_only 플래그 가져오기 ---
         is_korean_flag = False  # 기본값
+        processing_profile = job.processing_profile  # 작업 지정 프로필이 우선
         subject_name_for_path = "default_subject"
         workspace_name_for_path = "default_workspace"
 
@@ -142,6 +228,7 @@ def run_ai_processing(job_id: int):
             subject = db.query(models.Subject).filter(models.Subject.id == job.subject_id).first()
             if subject:
                 is_korean_flag = bool(getattr(subject, "is_korean_only", False))
+                processing_profile = processing_profile or subject.processing_profile
                 subject_name_for_path = subject.name
 
                 if subject.workspace:
@@ -151,7 +238,7 @@ def run_ai_processing(job_id: int):
                     if workspace:
                         workspace_name_for_path = workspace.name
 
-        print(f"INFO: [AI] 작업 {job_id}의 한국어 특화 모델 사용 여부: {is_korean_flag}")
+        print(f"INFO: [AI] 작업 {job_id}의 한국어 특화 모델 사용 여부: {is_korean_flag}, 처리 프로필: {processing_profile or '기본값'}")
 
         job.status = models.JobStatus.PROCESSING
         job.started_at = datetime.now(timezone.utc)
@@ -171,7 +258,8 @@ def run_ai_processing(job_id: int):
         db.add_all([transcribe_log, summarize_log])
         db.commit()
 
-        # 파일(material) 단위 처리
+        # 파일(material) 단위 준비: 경로 확인과 run_id 기록은 작업 스레드에서
+        pending = []
         for material in job.source_materials:
             # 2. call_ai_model로 플래그 값 + 고유 run_id 전달
             dynamic_input_dir = PROJECTS_BASE_DIR / workspace_name_for_path / subject_name_for_path
@@ -185,26 +273,71 @@ def run_ai_processing(job_id: int):
             # 파일 단위 고유 run_id (디렉터리 충돌 방지)
             per_material_run_id = f"{run_id_base}-{job_id}-{material.id}"
 
-            ai_results = call_ai_model(
-                full_file_path,
-                material.source_type,
-                is_korean_only=is_korean_flag,
-                run_id=per_material_run_id,
-            )
-
-            for seg_data in ai_results["transcription_segments"]:
-                segment = models.SpeakerAttributedSegment(
-                    material_id=material.id,
-                    **seg_data,
-                )
-                db.add(segment)
+            # 요약 스트리밍(/summary/stream)에서 run_id를 찾을 수 있도록 먼저 기록
+            material.output_artifacts = {"run_id": per_material_run_id}
+            material.status = models.MaterialStatus.TRANSCRIBING
+            pending.append((material, full_file_path, per_material_run_id))
+        db.commit()
 
-            material.individual_summary = ai_results["individual_summary"]
-            material.output_artifacts = ai_results["output_artifacts"]
-            # SUMMARIZING 단계를 건너뛰고 바로 COMPLETED로 표시
-            material.status = models.MaterialStatus.COMPLETED
+        # AI 처리는 워커 스레드에서 파일들을 겹쳐 실행하고, 끝나는 순서대로 결과를 저장
+        events: queue.Queue = queue.Queue()
+        materials_by_run_id = {run_id: material for material, _, run_id in pending}
+        workers = max(1, min(AI_MATERIAL_PARALLELISM, len(pending)))
+        print(f"INFO: [AI] 작업 {job_id}: 파일 {len(pending)}개를 최대 {workers}개씩 동시에 처리")
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{job_id}")
+        # 미리보기는 별도 스레드에서 전체 처리와 동시에 실행 (초안이 전체 결과를 늦추지 않도록)
+        preview_executor = None
+        if AI_PREVIEW_ENABLED:
+            preview_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"job-{job_id}-preview")
+        try:
+            if preview_executor is not None:
+                for material, path, run_id in pending:
+                    preview_executor.submit(preview_material_ai, path, is_korean_flag, run_id, events)
+            futures = {
+                executor.submit(
+                    call_ai_model, path, is_korean_only=is_korean_flag, run_id=run_id, profile=processing_profile
+                ): material
+                for material, path, run_id in pending
+            }
+            remaining = set(futures)
+            while remaining:
+                done, remaining = wait(remaining, timeout=1.0, return_when=FIRST_COMPLETED)
+
+                # 초안 요약을 먼저 저장해 두면 클라이언트가 전체 처리 완료 전에 볼 수 있음
+                while not events.empty():
+                    draft_run_id, draft_summary = events.get_nowait()
+                    draft_material = materials_by_run_id[draft_run_id]
+                    if draft_material.status != models.MaterialStatus.COMPLETED:
+                        draft_material.individual_summary = draft_summary
+                        draft_material.is_draft = True
+                db.commit()
+
+                for future in done:
+                    material = futures[future]
+                    # 실패하면 기존과 같이 작업 전체를 실패 처리; 남은 파일은 finally에서 정리
+                    ai_results = future.result()
+
+                    for seg_data in ai_results["transcription_segments"]:
+                        segment = models.SpeakerAttributedSegment(
+                            material_id=material.id,
+                            **seg_data,
+                        )
+                        db.add(segment)
+
+                    material.individual_summary = ai_results["individual_summary"]
+                    material.is_draft = False
+                    material.output_artifacts = ai_results["output_artifacts"]
+                    # SUMMARIZING 단계를 건너뛰고 바로 COMPLETED로 표시
+                    material.status = models.MaterialStatus.COMPLETED
+                    db.commit()
+        finally:
+            # 실패 시 아직 시작하지 않은 파일은 취소하고, 실행 중인 파일은 기다리지 않고 바로 작업을 실패 처리
+            # (진행 중인 파이프라인은 백그라운드에서 끝나며 결과는 저장되지 않음)
+            executor.shutdown(wait=False, cancel_futures=True)
+            if preview_executor is not None:
+                # 전체 결과가 먼저 끝나면 남은 초안은 필요 없음; 완료된 파일의 요약은 초안으로 덮어쓰지 않음
+                preview_executor.shutdown(wait=False, cancel_futures=True)
 
-        # 모든 파일 처리 후 1회 커밋
         db.commit()
 
         transcribe_log.status = models.JobStatus.COMPLETED
@@ -376,6 +509,7 @@ async def create_summary_job_with_files(
     background_tasks: BackgroundTasks,
     title: str = Form(...),
     subject_id: Optional[int] = Form(None),
+    processing_profile: Optional[schemas.ProcessingProfile] = Form(None),  # 없으면 Subject의 프로필 사용
     # is_korean_only 파라미터는 여기서 제거 (Subject의 플래그를 사용)
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
@@ -432,7 +566,7 @@ async def create_summary_job_with_files(
             raise HTTPException(status_code=400, detail=f"Invalid subject_id: {subject_id}. Subject not found.")
 
     # --- SummaryJob 생성 ---
-    summary_job = models.SummaryJob(title=title, subject_id=subject_id)
+    summary_job = models.SummaryJob(title=title, subject_id=subject_id, processing_profile=processing_profile)
     db.add(summary_job)
     db.commit()
     db.refresh(summary_job)
@@ -510,6 +644,80 @@ def download_individual_summary(material_id: int, db: Session = Depends(get_db))
         }
     )
 
+def _sse_event(event: str, payload: dict) -> str:
+    """SSE 이벤트 한 건을 직렬화합니다."""
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _material_summary_state(material_id: int) -> tuple[Optional[models.MaterialStatus], Optional[str]]:
+    """스트림 대기 중 DB에서 Material 상태와 최종 요약을 다시 읽습니다."""
+    db = SessionLocal()
+    try:
+        material = db.query(models.SourceMaterial).filter(models.SourceMaterial.id == material_id).first()
+        if not material:
+            return None, None
+        return material.status, material.individual_summary
+    finally:
+        db.close()
+
+
+def _summary_event_stream(material_id: int, run_id: str):
+    """요약 생성 버퍼를 SSE 이벤트로 변환하는 제너레이터"""
+    offset = 0
+    while True:
+        stream = summary_stream.get_stream(run_id)
+        if stream is None:
+            # 아직 요약 단계에 도달하지 않았거나, 다른 프로세스에서 처리 중
+            status, summary = _material_summary_state(material_id)
+            if status in (models.MaterialStatus.COMPLETED, models.MaterialStatus.FAILED, None):
+                if summary:
+                    yield _sse_event("token", {"text": summary})
+                yield _sse_event("done", {"status": status.value if status else "UNKNOWN"})
+                return
+            yield ": waiting\n\n"
+            time.sleep(1.0)
+            continue
+
+        text, finished = stream.read(offset, timeout=SUMMARY_STREAM_POLL_SECONDS)
+        if finished and stream.replaced:
+            # 최종 요약이 스트리밍된 내용과 달라진 경우(fallback 등) 전체를 다시 전송
+            yield _sse_event("replace", {"text": stream.text()})
+        elif text:
+            offset += len(text)
+            yield _sse_event("token", {"text": text})
+        elif not finished:
+            status, _ = _material_summary_state(material_id)
+            if status == models.MaterialStatus.FAILED:
+                yield _sse_event("done", {"status": status.value})
+                return
+            yield ": keep-alive\n\n"
+        if finished:
+            yield _sse_event("done", {"status": "COMPLETED"})
+            return
+
+
+@app.get("/source-materials/{material_id}/summary/stream")
+def stream_individual_summary(material_id: int, db: Session = Depends(get_db)):
+    """
+    개별 파일(SourceMaterial)의 요약을 생성되는 대로 SSE(text/event-stream)로 전달합니다.
+    - event: token   → {"text": "..."} 새로 생성된 텍스트
+    - event: replace → {"text": "..."} 최종 요약으로 전체 교체 (fallback 요약 등)
+    - event: done    → {"status": "..."} 스트림 종료
+    """
+    material = db.query(models.SourceMaterial).filter(models.SourceMaterial.id == material_id).first()
+    if not material:
+        raise HTTPException(status_code=404, detail=f"Source material with id {material_id} not found.")
+
+    run_id = (material.output_artifacts or {}).get("run_id")
+    if not run_id:
+        raise HTTPException(status_code=409, detail="Processing for this material has not started yet.")
+
+    return StreamingResponse(
+        _summary_event_stream(material_id, run_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @app.delete("/summary-jobs/{job_id}", status_code=200)
 def delete_summary_job(job_id: int, db: Session = Depends(get_db)):
     job = db.query(models.SummaryJob).filter(models.SummaryJob.id == job_id).first()
@@ -41,6 +41,8 @@ class Subject(Base):
     description = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     is_korean_only = Column(Boolean, nullable=False, default=False)
+    # 처리 프로필 (fast / balanced / accurate) - 속도와 품질의 균형
+    processing_profile = Column(String(20), nullable=False, default="balanced", server_default="balanced")
     
     workspace = relationship("Workspace", back_populates="subjects")
     summary_jobs = relationship("SummaryJob", back_populates="subject", cascade="all, delete-orphan")
@@ -51,6 +53,8 @@ class SummaryJob(Base):
     subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=True) 
     title = Column(String(255), nullable=False)
     status = Column(SQLAlchemyEnum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    # 작업 단위 프로필 지정 (없으면 Subject의 processing_profile 사용)
+    processing_profile = Column(String(20), nullable=True)
  
     error_message = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -76,6 +80,8 @@ class SourceMaterial(Base):
     storage_path = Column(Text, nullable=False)
     file_size_bytes = Column(BigInteger)
     individual_summary = Column(Text) 
+    # 미리보기 초안 요약이 들어 있으면 True, 전체 파이프라인 결과로 교체되면 False
+    is_draft = Column(Boolean, nullable=False, default=False, server_default="false")
     status = Column(SQLAlchemyEnum(MaterialStatus), nullable=False, default=MaterialStatus.UPLOADED)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
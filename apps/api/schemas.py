@@ -1,10 +1,13 @@
 # schemas.py
 from pydantic import BaseModel, ConfigDict
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Literal
 from datetime import datetime
 from decimal import Decimal
 from .models import JobStatus, MaterialStatus
 
+# 처리 프로필: fast(저비용) / balanced(기본) / accurate(고품질)
+ProcessingProfile = Literal["fast", "balanced", "accurate"]
+
 # --- Base Schemas ---
 class WorkspaceBase(BaseModel):
     name: str
@@ -14,10 +17,12 @@ class SubjectBase(BaseModel):
     name: str
     description: Optional[str] = None
     is_korean_only: bool = False # 기본값은 False
+    processing_profile: ProcessingProfile = "balanced"
 
 class SummaryJobBase(BaseModel):
     title: str
     subject_id: Optional[int] = None
+    processing_profile: Optional[ProcessingProfile] = None # 없으면 Subject 설정을 따름
 
 class SpeakerAttributedSegmentBase(BaseModel):
     speaker_label: Optional[str] = None
@@ -35,6 +40,7 @@ class SourceMaterialBase(BaseModel):
     storage_path: str
     file_size_bytes: Optional[int] = None
     individual_summary: Optional[str] = None
+    is_draft: bool = False # individual_summary가 미리보기 초안이면 True
     output_artifacts: Optional[Any] = None # JSONB 타입, Optional
 
 # --- Create Schemas ---